@@ -1,6 +1,40 @@
 from django.contrib import admin
+from django.http import QueryDict
+from django.utils.translation import gettext_lazy as _
 
-from durin import models
+from durin import models, sharding
+
+
+class ShardListFilter(admin.SimpleListFilter):
+    """
+    Selects the shard whose tokens are listed
+    when :mod:`durin.sharding` is enabled.
+
+    .. versionadded:: 1.2.0
+    """
+
+    title = _("shard")
+    parameter_name = "shard"
+
+    def lookups(self, request, model_admin):
+        return [(alias, alias) for alias in sharding.get_shard_databases()]
+
+    def queryset(self, request, queryset):
+        # already applied by ``AuthTokenAdmin.get_queryset``
+        return queryset
+
+    def choices(self, changelist):
+        # there is no "All" choice, the first shard is selected by default
+        shards = [lookup for lookup, _title in self.lookup_choices]
+        selected = self.value() if self.value() in shards else shards[0]
+        for lookup, title in self.lookup_choices:
+            yield {
+                "selected": lookup == selected,
+                "query_string": changelist.get_query_string(
+                    {self.parameter_name: lookup}
+                ),
+                "display": title,
+            }
 
 
 @admin.register(models.AuthToken)
@@ -23,6 +57,50 @@ class AuthTokenAdmin(admin.ModelAdmin):
 
     readonly_fields = ("token", "expiry", "created", "expires_in")
 
+    @staticmethod
+    def get_shard(request) -> str:
+        """
+        The shard selected with :class:`ShardListFilter`,
+        defaults to the first one.
+
+        :meta private:
+        """
+        shards = sharding.get_shard_databases()
+        shard = request.GET.get(ShardListFilter.parameter_name)
+        if shard is None:
+            # object views carry the changelist's filters along
+            filters = QueryDict(request.GET.get("_changelist_filters", ""))
+            shard = filters.get(ShardListFilter.parameter_name)
+        return shard if shard in shards else shards[0]
+
+    def get_queryset(self, request):
+        """
+        :meta private:
+        """
+        qs = super().get_queryset(request)
+        if sharding.is_enabled():
+            qs = qs.using(self.get_shard(request))
+        return qs
+
+    def get_list_filter(self, request):
+        """
+        :meta private:
+        """
+        if sharding.is_enabled():
+            # clients can't be joined with the tokens on the shards
+            return (ShardListFilter, "client", "user")
+        return super().get_list_filter(request)
+
+    def get_list_select_related(self, request):
+        """
+        :meta private:
+        """
+        if sharding.is_enabled():
+            # related rows can't be joined, an empty tuple disables
+            # admin's implicit ``select_related()``
+            return ()
+        return super().get_list_select_related(request)
+
     def get_fieldsets(self, request, obj=None):
         """
         Hook for specifying fieldsets.
@@ -82,4 +160,6 @@ class ClientAdmin(admin.ModelAdmin):
         "name",
         "token_ttl",
         "throttle_rate",
+        "max_concurrent_requests",
+        "priority",
     )
@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class DurinConfig(AppConfig):
     name = "durin"
     default_auto_field = "django.db.models.BigAutoField"
+
+    def ready(self):
+        from durin.settings import durin_settings
+
+        if durin_settings.EXPIRED_TOKEN_SWEEPER:
+            from durin.sweeper import sweeper
+
+            sweeper.start()
@@ -1,8 +1,16 @@
+import hashlib
+import time
+
+from django.contrib.auth import get_user_model
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from rest_framework import exceptions
 from rest_framework.authentication import BaseAuthentication, get_authorization_header
 
+from durin import sharding
+from durin.cache import cache
 from durin.models import AuthToken
+from durin.principals import AuthTokenPrincipal
 from durin.settings import durin_settings
 from durin.signals import token_expired
 
@@ -33,8 +41,58 @@ class TokenAuthentication(BaseAuthentication):
 
     model = AuthToken
 
+    #: Class of the lightweight ``request.auth``,
+    #: see ``LIGHTWEIGHT_AUTH_PRINCIPAL``.
+    #:
+    #: .. versionadded:: 1.2.0
+    principal_class = AuthTokenPrincipal
+
     def authenticate(self, request):
-        auth = get_authorization_header(request).split()
+        header = get_authorization_header(request)
+        results = self.get_request_results(request)
+        if header in results:
+            # already authenticated during this request
+            result = results[header]
+            if isinstance(result, exceptions.AuthenticationFailed):
+                raise result
+            return result
+
+        self.check_pre_auth_throttle(request)
+        try:
+            result = self.authenticate_authorization_header(header)
+        except exceptions.AuthenticationFailed as e:
+            results[header] = e
+            raise
+        results[header] = result
+        return result
+
+    @staticmethod
+    def get_request_results(request) -> dict:
+        """
+        Returns the results of the authentications made during the given request,
+        keyed by ``Authorization`` header, so that a token is looked up at most once
+        per request, even if it is authenticated several times
+        (e.g. by :class:`durin.middleware.TokenAuthenticationMiddleware`
+        and then DRF, or by nested views).
+
+        The results are kept on the underlying ``HttpRequest``.
+
+        .. versionadded:: 1.2.0
+        """
+        http_request = getattr(request, "_request", request)
+        results = getattr(http_request, "_durin_auth_results", None)
+        if results is None:
+            results = http_request._durin_auth_results = {}
+        return results
+
+    def authenticate_authorization_header(self, header: bytes):
+        """
+        Authenticates the given ``Authorization`` header, returns ``None``
+        if it doesn't hold a token with the ``AUTH_HEADER_PREFIX``.
+
+        .. versionadded:: 1.2.0
+        """
+        auth = header.split()
         prefix = durin_settings.AUTH_HEADER_PREFIX.encode()
 
         if not auth or auth[0].lower() != prefix.lower():
@@ -48,6 +106,22 @@ class TokenAuthentication(BaseAuthentication):
 
         return self.authenticate_credentials(auth[1])
 
+    @staticmethod
+    def check_pre_auth_throttle(request) -> None:
+        """
+        Checks the ``PRE_AUTH_THROTTLE_CLASS`` throttle, if any,
+        before the token is looked up in the database.
+
+        .. versionadded:: 1.2.0
+        """
+        throttle_class = durin_settings.PRE_AUTH_THROTTLE_CLASS
+        if throttle_class is None:
+            return
+        throttle = throttle_class()
+        view = (getattr(request, "parser_context", None) or {}).get("view")
+        if not throttle.allow_request(request, view):
+            raise exceptions.Throttled(throttle.wait())
+
     @classmethod
     def authenticate_credentials(cls, token):
         """
@@ -55,16 +129,17 @@ class TokenAuthentication(BaseAuthentication):
         """
         token_str = token.decode("utf-8")
         try:
-            # read settings
-            to_select = durin_settings.AUTHTOKEN_SELECT_RELATED_LIST
-
             # get AuthToken object
-            if isinstance(to_select, list):
-                auth_token = AuthToken.objects.select_related(*to_select).get(
-                    token=token_str
+            try:
+                auth_token = cls.lookup_token(token_str)
+            except AuthToken.DoesNotExist:
+                # the read replica may be lagging behind the primary,
+                # so retry the lookup on the primary before giving up
+                if not durin_settings.READ_REPLICA_DATABASES or sharding.is_enabled():
+                    raise
+                auth_token = cls.lookup_token(
+                    token_str, using=durin_settings.PRIMARY_DATABASE
                 )
-            else:
-                auth_token = AuthToken.objects.get(token=token_str)
 
             # validate token
             if cls._cleanup_token(auth_token):
@@ -77,6 +152,48 @@ class TokenAuthentication(BaseAuthentication):
             msg = _("Invalid token.")
             raise exceptions.AuthenticationFailed(msg)
 
+    @classmethod
+    def lookup_token(cls, token_str: str, using=None):
+        """
+        Returns a :class:`durin.principals.AuthTokenPrincipal` if
+        ``LIGHTWEIGHT_AUTH_PRINCIPAL`` is enabled (and :mod:`durin.sharding` isn't),
+        otherwise the :class:`durin.models.AuthToken` from :py:meth:`get_auth_token`.
+
+        .. versionadded:: 1.2.0
+        """
+        if (
+            cls.principal_class is not None
+            and durin_settings.LIGHTWEIGHT_AUTH_PRINCIPAL
+            and not sharding.is_enabled()
+        ):
+            return cls.principal_class.get(token_str, using=using)
+        return cls.get_auth_token(token_str, using=using)
+
+    @staticmethod
+    def get_auth_token(token_str: str, using=None) -> AuthToken:
+        """
+        Fetch the :class:`durin.models.AuthToken` instance for the given token string
+        from the ``using`` database alias
+        (or the one chosen by the database routers if ``None``).
+
+        If :mod:`durin.sharding` is enabled, the token is looked up
+        on the shard encoded in it instead.
+        """
+        # read settings
+        to_select = durin_settings.AUTHTOKEN_SELECT_RELATED_LIST
+
+        if sharding.is_enabled():
+            using = sharding.get_shard_for_token(token_str)
+            if using is None:
+                raise AuthToken.DoesNotExist()
+            # related rows live on the primary, so they can't be joined
+            to_select = None
+
+        queryset = AuthToken.objects.using(using)
+        if isinstance(to_select, list):
+            queryset = queryset.select_related(*to_select)
+        return queryset.get(token=token_str)
+
     @staticmethod
     def validate_user(auth_token: AuthToken):
         if not auth_token.user.is_active:
@@ -97,22 +214,35 @@ class TokenAuthentication(BaseAuthentication):
         return False
 
 
-# if memoize is available, create another token authentication class
-# which uses django-memoize for caching
+# if django-cache-memoize is installed, create another token authentication
+# class which caches the lookups (it isn't used for storage anymore, but still
+# tells whether the cached backend was opted in)
 if memoize:
 
     class CachedTokenAuthentication(TokenAuthentication):
         """
-        Similar to ``TokenAuthentication`` but uses
-        `django-cache-memoize <https://github.com/peterbe/django-cache-memoize>`__
-        as cache backend for faster lookups.
+        Similar to ``TokenAuthentication`` but caches the token lookups
+        in :py:data:`durin.cache.cache` for faster authentication.
 
         The cache timeout is configurable by setting the
         ``REST_DURIN["TOKEN_CACHE_TIMEOUT"]`` under your app's ``settings.py``.
 
+        Instead of the pickled ``User`` and ``AuthToken`` instances, a compact
+        record of plain values (see :py:meth:`to_cache_record`) is cached
+        and lightweight instances are rebuilt from it on each cache hit.
+        It's stored with the serializer of the cache backend.
+
+        On a cache miss, only one request per token queries the database while
+        concurrent ones wait for its result (see ``TOKEN_CACHE_LOCK_TIMEOUT``).
+        Optionally, a record older than ``TOKEN_CACHE_TIMEOUT`` keeps being served
+        for ``TOKEN_CACHE_STALE_TIMEOUT`` more seconds while a single request
+        refreshes it.
+
         **How To Enable:**
 
-        1. Install django-cache-memoize
+        1. Install django-cache-memoize. It's no longer used for the
+           lookups, but this class is still only defined when it's installed,
+           so that existing installs keep opting in the same way.
 
         .. parsed-literal::
             pip install django-cache-memoize
@@ -121,10 +251,199 @@ if memoize:
            instead of ``TokenAuthentication``.
         """
 
+        #: Version of the record format stored in the cache,
+        #: records of any other version are treated as cache misses.
+        #:
+        #: .. versionadded:: 1.2.0
+        cache_record_version = 1
+
+        #: Seconds to sleep between two reads of the cache, while waiting
+        #: for another request to compute the record of the same token.
+        #:
+        #: .. versionadded:: 1.2.0
+        lock_poll_interval = 0.05
+
+        #: The cached records already hold lightweight instances.
+        principal_class = None
+
         @classmethod
-        @memoize(timeout=int(durin_settings.TOKEN_CACHE_TIMEOUT))
         def authenticate_credentials(cls, token):
-            return super().authenticate_credentials(token)
+            cache_key = cls.get_cache_key(token)
+            record = cache.get(cache_key)
+            if not isinstance(record, tuple) or record[0] != cls.cache_record_version:
+                record = cls._compute_cache_record(token, cache_key)
+            elif record[1] <= time.time() and cls._acquire_lock(cache_key):
+                # stale, refreshed by this request while others keep serving it
+                try:
+                    record = cls._refresh_cache_record(token, cache_key)
+                finally:
+                    cls._release_lock(cache_key)
+            user, auth_token = cls.from_cache_record(record)
+            if auth_token.has_expired:
+                # never served from the cache, the database tells whether
+                # it was renewed meanwhile or has expired (and cleans it up)
+                cache.delete(cache_key)
+                record = cls._refresh_cache_record(token, cache_key)
+                return cls.from_cache_record(record)
+            return (user, auth_token)
+
+        @classmethod
+        def _refresh_cache_record(cls, token: bytes, cache_key: str) -> tuple:
+            """
+            Computes the record from the database and caches it
+            through :py:data:`durin.cache.cache`.
+            """
+            user, auth_token = super().authenticate_credentials(token)
+            record = cls.to_cache_record(user, auth_token)
+            timeout = cls._get_cache_timeout(auth_token)
+            if timeout > 0:
+                cache.set(cache_key, record, timeout)
+            return record
+
+        @staticmethod
+        def _get_cache_timeout(auth_token: AuthToken) -> int:
+            """
+            ``TOKEN_CACHE_TIMEOUT`` plus ``TOKEN_CACHE_STALE_TIMEOUT``,
+            capped so that the cache entry doesn't outlive the token's expiry.
+            """
+            return min(
+                int(durin_settings.TOKEN_CACHE_TIMEOUT)
+                + int(durin_settings.TOKEN_CACHE_STALE_TIMEOUT),
+                int((auth_token.expiry - timezone.now()).total_seconds()),
+            )
+
+        @classmethod
+        def get_cache_key(cls, token: bytes) -> str:
+            """
+            Key under which the record of the given token is cached.
+
+            .. versionadded:: 1.2.0
+            """
+            return "durin_auth_token_{0}".format(hashlib.sha256(token).hexdigest())
+
+        @classmethod
+        def _compute_cache_record(cls, token: bytes, cache_key: str) -> tuple:
+            """
+            Single-flight computation of the record on a cache miss:
+            only the request holding the lock queries the database,
+            concurrent ones wait for its result to land in the cache.
+            """
+            deadline = time.monotonic() + int(durin_settings.TOKEN_CACHE_LOCK_TIMEOUT)
+            while not cls._acquire_lock(cache_key):
+                if time.monotonic() >= deadline:
+                    # lock holder is too slow (or died), don't wait any longer
+                    return cls._refresh_cache_record(token, cache_key)
+                time.sleep(cls.lock_poll_interval)
+                record = cache.get(cache_key)
+                if isinstance(record, tuple) and record[0] == cls.cache_record_version:
+                    return record
+            try:
+                return cls._refresh_cache_record(token, cache_key)
+            finally:
+                cls._release_lock(cache_key)
+
+        @staticmethod
+        def _acquire_lock(cache_key: str) -> bool:
+            timeout = int(durin_settings.TOKEN_CACHE_LOCK_TIMEOUT)
+            return cache.add(cache_key + ".lock", True, timeout)
+
+        @staticmethod
+        def _release_lock(cache_key: str) -> None:
+            cache.delete(cache_key + ".lock")
+
+        @staticmethod
+        def _get_user_fields() -> list:
+            """
+            Attribute names of the user's fields stored in the cache record:
+            primary key, ``USERNAME_FIELD``, ``is_active`` and
+            the ones set in ``TOKEN_CACHE_USER_FIELDS``.
+            """
+            User = get_user_model()
+            wanted = {User._meta.pk.name, User.USERNAME_FIELD, "is_active"}
+            wanted.update(durin_settings.TOKEN_CACHE_USER_FIELDS or ())
+            # ordered as the model's fields, which is what ``from_db`` expects
+            return [
+                f.attname
+                for f in User._meta.concrete_fields
+                if f.name in wanted or f.attname in wanted
+            ]
+
+        @classmethod
+        def to_cache_record(cls, user, auth_token: AuthToken) -> tuple:
+            """
+            Compact, versioned tuple of plain values which is cached instead of
+            the pickled ``User`` and ``AuthToken`` instances.
+            It also holds the timestamp until which it is fresh.
+
+            .. versionadded:: 1.2.0
+            """
+            token_fields = [f.attname for f in AuthToken._meta.concrete_fields]
+            user_fields = cls._get_user_fields()
+            return (
+                cls.cache_record_version,
+                time.time() + int(durin_settings.TOKEN_CACHE_TIMEOUT),
+                auth_token._state.db,
+                tuple(getattr(auth_token, name) for name in token_fields),
+                user._state.db,
+                tuple(user_fields),
+                tuple(getattr(user, name) for name in user_fields),
+            )
+
+        @classmethod
+        def from_cache_record(cls, record: tuple) -> tuple:
+            """
+            Rebuilds the ``(user, auth_token)`` tuple from a cache record.
+            The user only has the cached fields loaded,
+            others are fetched from the database on access.
+
+            .. versionadded:: 1.2.0
+            """
+            (
+                _,
+                _,
+                token_db,
+                token_values,
+                user_db,
+                user_fields,
+                user_values,
+            ) = record
+            token_fields = [f.attname for f in AuthToken._meta.concrete_fields]
+            auth_token = AuthToken.from_db(token_db, token_fields, token_values)
+            user = get_user_model().from_db(user_db, user_fields, user_values)
+            AuthToken._meta.get_field("user").set_cached_value(auth_token, user)
+            return (user, auth_token)
+
+        @classmethod
+        def cache_credentials(cls, auth_token: AuthToken) -> None:
+            """
+            Writes the authentication result for the given token into the cache,
+            exactly as :py:meth:`authenticate_credentials` would cache it.
+
+            The cache entry doesn't outlive the token's expiry.
+
+            .. versionadded:: 1.2.0
+            """
+            timeout = cls._get_cache_timeout(auth_token)
+            if timeout <= 0:
+                return
+            try:
+                record = cls.to_cache_record(*cls.validate_user(auth_token))
+            except exceptions.AuthenticationFailed:
+                return
+            cache.set(cls.get_cache_key(auth_token.token.encode()), record, timeout)
 
         def __repr__(self):
             return self.__class__.__name__
+
+
+def warm_token_cache(auth_token: AuthToken) -> None:
+    """
+    Writes the authentication result for a freshly issued or renewed token
+    into the cache of :class:`CachedTokenAuthentication`
+    if the ``TOKEN_CACHE_WARM_UP`` setting is ``True``,
+    so that the first request authenticated with it is a cache hit.
+
+    .. versionadded:: 1.2.0
+    """
+    if memoize and durin_settings.TOKEN_CACHE_WARM_UP:
+        CachedTokenAuthentication.cache_credentials(auth_token)
@@ -0,0 +1,184 @@
+"""
+All of durin's cache calls (:class:`durin.auth.CachedTokenAuthentication`
+and the classes in :mod:`durin.throttling`) go through :py:data:`cache`,
+which can be guarded by an *opt-in* circuit breaker, so that a slow or
+unavailable cache server doesn't turn into a full API outage.
+
+When ``CACHE_CIRCUIT_BREAKER`` is enabled, each cache call that raises an error
+or takes longer than ``CACHE_LATENCY_BUDGET`` seconds counts as a failure.
+After ``CACHE_FAILURE_THRESHOLD`` consecutive failures the circuit *opens*:
+the cache is bypassed and calls are served by the fallback cache instead, i.e.
+
+- authentication falls back to database lookups,
+- throttling fails open, or is local to each process if ``CACHE_FALLBACK_ALIAS``
+  is set to a ``LocMemCache``.
+
+Every ``CACHE_RECOVERY_TIMEOUT`` seconds, a background thread probes the cache
+and closes the circuit once it answers within budget again.
+
+Example ``settings.py``::
+
+        #...snip...
+        CACHES = {
+            "default": {...},
+            "local": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+        }
+        REST_DURIN = {
+            "CACHE_CIRCUIT_BREAKER": True,
+            "CACHE_LATENCY_BUDGET": 0.05,
+            "CACHE_FALLBACK_ALIAS": "local",
+        }
+        #...snip...
+
+.. Note:: A cache call can't be interrupted, so the budget only decides
+    whether a call counts as a failure. Set the socket timeouts
+    of your cache backend to bound the latency of a single call.
+"""
+
+import functools
+import logging
+import threading
+import time
+
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.cache.backends.dummy import DummyCache
+
+from durin.settings import durin_settings
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreakerCache:
+    """
+    Proxy of the Django cache ``alias`` guarded by a circuit breaker.
+    Without ``CACHE_CIRCUIT_BREAKER``, calls go straight to the cache.
+
+    The state of the circuit is kept per process.
+
+    .. versionadded:: 1.2.0
+    """
+
+    #: Cache methods guarded by the circuit breaker.
+    guarded_methods = frozenset(
+        (
+            "add",
+            "get",
+            "set",
+            "touch",
+            "delete",
+            "get_many",
+            "set_many",
+            "delete_many",
+            "incr",
+            "decr",
+        )
+    )
+
+    #: Key read by the background probe.
+    probe_key = "durin_cache_circuit_breaker_probe"
+
+    def __init__(self, alias: str = DEFAULT_CACHE_ALIAS):
+        self.alias = alias
+        self._lock = threading.Lock()
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    @property
+    def backend(self):
+        return caches[self.alias]
+
+    @property
+    def fallback(self):
+        alias = durin_settings.CACHE_FALLBACK_ALIAS
+        if alias:
+            return caches[alias]
+        # fail open: every read is a miss and every write is dropped
+        return DummyCache("durin-fallback", {})
+
+    @property
+    def is_open(self) -> bool:
+        """
+        ``True`` while the cache is bypassed.
+        """
+        if self.opened_at is None:
+            return False
+        recovery_timeout = float(durin_settings.CACHE_RECOVERY_TIMEOUT)
+        if time.monotonic() - self.opened_at >= recovery_timeout:
+            self._start_probe()
+        return True
+
+    def __getattr__(self, name):
+        attr = getattr(self.backend, name)
+        if name not in self.guarded_methods or not durin_settings.CACHE_CIRCUIT_BREAKER:
+            return attr
+        return functools.partial(self._call, name)
+
+    def _call(self, name, *args, **kwargs):
+        if self.is_open:
+            return getattr(self.fallback, name)(*args, **kwargs)
+        start = time.monotonic()
+        try:
+            result = getattr(self.backend, name)(*args, **kwargs)
+        except ValueError:
+            # ``incr``/``decr`` of a missing key, not a failure of the cache
+            self._record_success()
+            raise
+        except Exception:
+            logger.warning("cache %s() failed", name, exc_info=True)
+            self._record_failure()
+            return getattr(self.fallback, name)(*args, **kwargs)
+        if time.monotonic() - start > float(durin_settings.CACHE_LATENCY_BUDGET):
+            self._record_failure()
+        else:
+            self._record_success()
+        return result
+
+    def _record_success(self) -> None:
+        self.failures = 0
+
+    def _record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.opened_at is None and self.failures >= int(
+                durin_settings.CACHE_FAILURE_THRESHOLD
+            ):
+                logger.warning("cache %r bypassed by circuit breaker", self.alias)
+                self.opened_at = time.monotonic()
+
+    def _start_probe(self) -> None:
+        with self._lock:
+            if self.probing:
+                return
+            self.probing = True
+        threading.Thread(target=self._probe, daemon=True).start()
+
+    def _probe(self) -> None:
+        try:
+            start = time.monotonic()
+            self.backend.get(self.probe_key)
+            recovered = time.monotonic() - start <= float(
+                durin_settings.CACHE_LATENCY_BUDGET
+            )
+        except Exception:
+            recovered = False
+        with self._lock:
+            if recovered:
+                logger.info("cache %r recovered", self.alias)
+                self.failures = 0
+                self.opened_at = None
+            else:
+                self.opened_at = time.monotonic()
+            self.probing = False
+
+    def reset(self) -> None:
+        """
+        Closes the circuit.
+        """
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+
+#: The cache used by durin.
+cache = CircuitBreakerCache()
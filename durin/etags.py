@@ -0,0 +1,106 @@
+"""
+Durin provides *opt-in* conditional ``GET`` requests for endpoints that are
+polled often, i.e. the ``list`` of :class:`durin.views.TokenSessionsViewSet`
+and ``GET`` on :class:`durin.views.APIAccessTokenView`.
+
+When ``CONDITIONAL_GET`` is enabled, durin keeps a *version stamp* of each user's
+tokens in :py:data:`durin.cache.cache`, which is replaced whenever one of
+their tokens is created, saved (e.g. renewed) or deleted. The responses of
+these views carry an ``ETag`` built from it, and a request whose
+``If-None-Match`` header holds the current one is answered with
+``304 Not Modified``, without querying the tokens or serializing them.
+
+Example ``settings.py``::
+
+        #...snip...
+        REST_DURIN = {
+            "CONDITIONAL_GET": True,
+        }
+        #...snip...
+
+.. Note::
+    - The ``ETag`` also encodes the earliest expiry of the listed tokens, so
+      that ``has_expired`` is never served stale. ``expires_in_str`` however
+      is as of the last ``200`` response.
+    - Changes made with ``QuerySet.update()``, ``bulk_create()``
+      or cascading deletes (e.g. of a ``Client``) don't replace the version stamp.
+    - If the cache is unavailable, responses simply have no ``ETag``.
+"""
+
+import uuid
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.http import parse_etags, quote_etag
+
+from durin.cache import cache
+from durin.settings import durin_settings
+
+
+def is_enabled() -> bool:
+    """
+    ``True`` if ``CONDITIONAL_GET`` is set.
+    """
+    return bool(durin_settings.CONDITIONAL_GET)
+
+
+def get_cache_key(user_pk) -> str:
+    return "durin_token_version_{0}".format(user_pk)
+
+
+def get_user_version(user_pk) -> str:
+    """
+    Returns the version stamp of the given user's tokens, or ``None`` if
+    ``CONDITIONAL_GET`` is disabled or the cache can't store one.
+    """
+    if not is_enabled():
+        return None
+    cache_key = get_cache_key(user_pk)
+    version = cache.get(cache_key)
+    if version is None:
+        # on a race, the version stored first wins
+        cache.add(cache_key, uuid.uuid4().hex)
+        version = cache.get(cache_key)
+    return version
+
+
+def bump_user_versions(user_pks, using=None) -> None:
+    """
+    Replaces the version stamps of the given users' tokens, once
+    the current transaction of the ``using`` database alias commits.
+    """
+    if not is_enabled():
+        return
+    cache_keys = [get_cache_key(user_pk) for user_pk in set(user_pks)]
+    if cache_keys:
+        transaction.on_commit(lambda: cache.delete_many(cache_keys), using=using)
+
+
+def make_etag(version: str, ident="", deadline=None) -> str:
+    """
+    Returns the quoted ``ETag`` for the given version stamp, ``ident`` of the
+    representation and ``deadline`` (the earliest expiry of the tokens in it).
+    """
+    timestamp = int(deadline.timestamp()) if deadline is not None else ""
+    return quote_etag("{0}.{1}.{2}".format(version, ident, timestamp))
+
+
+def get_matching_etag(request, version: str, ident="") -> str:
+    """
+    Returns the ``ETag`` of the ``If-None-Match`` header of the request
+    built from the given version stamp and ``ident`` if it's still fresh,
+    i.e. if the request can be answered with ``304 Not Modified``, otherwise ``None``.
+    """
+    if version is None:
+        return None
+    now = int(timezone.now().timestamp())
+    for etag in parse_etags(request.META.get("HTTP_IF_NONE_MATCH", "")):
+        # weak comparison, as for any If-None-Match header
+        if etag.startswith("W/"):
+            etag = etag[2:]
+        parts = etag.strip('"').rsplit(".", 2)
+        if len(parts) != 3 or parts[:2] != [version, str(ident)]:
+            continue
+        if not parts[2] or (parts[2].isdigit() and int(parts[2]) > now):
+            return etag
+    return None
@@ -0,0 +1,105 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.translation import gettext_lazy as _
+
+from durin.models import AuthToken
+
+#: Name of the covering index.
+INDEX_NAME = "durin_authtoken_token_covering"
+
+#: Columns included in the index, besides the token: all the ones selected
+#: by the token lookups, so that they don't need to fetch the rows.
+INCLUDED_FIELDS = ("id", "user", "client", "created", "expiry")
+
+
+def get_create_sql(connection) -> str:
+    quote_name = connection.ops.quote_name
+    return (
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({token}) "
+        "INCLUDE ({included})".format(
+            name=quote_name(INDEX_NAME),
+            table=quote_name(AuthToken._meta.db_table),
+            token=quote_name(AuthToken._meta.get_field("token").column),
+            included=", ".join(
+                quote_name(AuthToken._meta.get_field(name).column)
+                for name in INCLUDED_FIELDS
+            ),
+        )
+    )
+
+
+def get_drop_sql(connection) -> str:
+    return "DROP INDEX CONCURRENTLY IF EXISTS {name}".format(
+        name=connection.ops.quote_name(INDEX_NAME)
+    )
+
+
+def is_index_invalid(cursor) -> bool:
+    """
+    ``True`` if an index of that name exists but is ``INVALID``, i.e. left
+    by a failed (or interrupted) concurrent build, which ``IF NOT EXISTS``
+    would take for the index.
+    """
+    cursor.execute(
+        "SELECT i.indisvalid FROM pg_index i "
+        "JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = %s",
+        [INDEX_NAME],
+    )
+    row = cursor.fetchone()
+    return row is not None and not row[0]
+
+
+class Command(BaseCommand):
+    help = (
+        "Creates an index of AuthToken.token which includes the other columns "
+        "(PostgreSQL 11+ only), so that the token lookup made on "
+        "each authenticated request can be served from the index alone. "
+        "It's built concurrently, without locking the table, and isn't tracked by "
+        "the migrations, which keep the unique constraint of the column. "
+        "An invalid index left by a failed build is dropped and rebuilt."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--database",
+            default=DEFAULT_DB_ALIAS,
+            help=_("Database alias to create the index on."),
+        )
+        parser.add_argument(
+            "--drop",
+            action="store_true",
+            help=_("Drop the index instead."),
+        )
+        parser.add_argument(
+            "--sql",
+            action="store_true",
+            help=_("Only print the SQL statement, e.g. to run it yourself."),
+        )
+
+    def handle(self, *args, **options):
+        connection = connections[options["database"]]
+        sql = (
+            get_drop_sql(connection) if options["drop"] else get_create_sql(connection)
+        )
+        if options["sql"]:
+            self.stdout.write(sql + ";")
+            return
+        if connection.vendor != "postgresql" or connection.pg_version < 110000:
+            raise CommandError("Covering indexes require PostgreSQL 11+.")
+        # ``CONCURRENTLY`` can't run in a transaction
+        with connection.cursor() as cursor:
+            if not options["drop"] and is_index_invalid(cursor):
+                self.stderr.write(
+                    "Dropping the invalid index {0} left by a failed build.".format(
+                        INDEX_NAME
+                    )
+                )
+                cursor.execute(get_drop_sql(connection))
+            cursor.execute(sql)
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Index {0} {1}.".format(
+                    INDEX_NAME, "dropped" if options["drop"] else "created"
+                )
+            )
+        )
@@ -20,6 +20,23 @@ class Command(BaseCommand):
                 "Format: <code>DAYS HH:MM:SS</code>."
             ),
         )
+        parser.add_argument(
+            "--token-ttl-jitter",
+            type=str,
+            default=None,
+            help=_(
+                "Tokens expire up to this much earlier, at random. "
+                "Format: <code>DAYS HH:MM:SS</code>."
+            ),
+        )
+        parser.add_argument(
+            "--token-ttl-jitter-percent",
+            type=int,
+            default=None,
+            help=_(
+                "Tokens expire up to this percentage of the TTL earlier, at random."
+            ),
+        )
         parser.add_argument(
             "--throttle-rate",
             type=str,
@@ -31,13 +48,35 @@ class Command(BaseCommand):
                 "Example: '100/h' implies 100 requests each hour."
             ),
         )
+        parser.add_argument(
+            "--max-concurrent-requests",
+            type=int,
+            default=None,
+            help=_(
+                "Maximum number of in-flight requests authed with this client. "
+                "Unlimited by default."
+            ),
+        )
+        parser.add_argument(
+            "--priority",
+            type=int,
+            default=0,
+            help=_(
+                "Priority of requests authed with this client, higher is more "
+                "important. Used to scale throttle rates when the service is degraded."
+            ),
+        )
 
     def handle(self, *args, **options):
         client = ClientSerializer(
             data={
                 "name": options["name"],
                 "token_ttl": options["token_ttl"],
+                "token_ttl_jitter": options["token_ttl_jitter"],
+                "token_ttl_jitter_percent": options["token_ttl_jitter_percent"],
                 "throttle_rate": options["throttle_rate"],
+                "max_concurrent_requests": options["max_concurrent_requests"],
+                "priority": options["priority"],
             }
         )
         if client.is_valid():
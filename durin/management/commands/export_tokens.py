@@ -0,0 +1,178 @@
+import argparse
+import csv
+import json
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.translation import gettext_lazy as _
+
+from durin import sharding
+from durin.models import AuthToken, Client
+
+#: Exported columns, in order. The token strings themselves are never exported.
+COLUMNS = ("id", "user_id", "client", "created", "expiry")
+
+
+def parse_created(value: str) -> datetime:
+    """
+    Parses an ISO 8601 date or datetime, dates meaning midnight
+    and naive datetimes being in the current time zone.
+    """
+    try:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            parsed_date = parse_date(value)
+            if parsed_date is not None:
+                parsed = datetime.combine(parsed_date, time.min)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise argparse.ArgumentTypeError(
+            "invalid date: {0!r}, expected ISO 8601 format.".format(value)
+        )
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class Echo:
+    """
+    File-like object returning what's written, so that ``csv.writer``
+    formats a single row at a time.
+    """
+
+    def write(self, value):
+        return value
+
+
+class Command(BaseCommand):
+    help = (
+        "Streams the tokens as CSV or NDJSON (one JSON object per line) to stdout, "
+        "reading them in chunks."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--format",
+            choices=("csv", "ndjson"),
+            default="csv",
+            help=_("Output format."),
+        )
+        parser.add_argument(
+            "--client",
+            action="append",
+            dest="clients",
+            default=[],
+            help=_("Only export the tokens of this client. Can be repeated."),
+        )
+        parser.add_argument(
+            "--status",
+            choices=("all", "active", "expired"),
+            default="all",
+            help=_("Only export the active or expired tokens."),
+        )
+        parser.add_argument(
+            "--created-after",
+            type=parse_created,
+            default=None,
+            help=_("Only export the tokens created at or after this ISO 8601 date."),
+        )
+        parser.add_argument(
+            "--created-before",
+            type=parse_created,
+            default=None,
+            help=_("Only export the tokens created before this ISO 8601 date."),
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help=_("Number of rows fetched from the database at a time."),
+        )
+
+    @staticmethod
+    def get_databases() -> list:
+        """
+        Returns the database aliases to export from, i.e. all the shards if
+        :mod:`durin.sharding` is enabled, otherwise ``[None]`` (routed).
+        """
+        if sharding.is_enabled():
+            return sharding.get_shard_databases()
+        return [None]
+
+    @staticmethod
+    def get_client_names(names: list) -> dict:
+        """
+        Returns ``{client_pk: name}`` of the given client names, or of all clients.
+        """
+        queryset = Client.objects.all()
+        if names:
+            queryset = queryset.filter(name__in=names)
+        client_names = dict(queryset.values_list("pk", "name"))
+        unknown = set(names) - set(client_names.values())
+        if unknown:
+            raise CommandError(
+                "Unknown client(s): {0}".format(", ".join(sorted(unknown)))
+            )
+        return client_names
+
+    @staticmethod
+    def get_queryset(using, client_ids=None, status="all", after=None, before=None):
+        """
+        Returns the ``values_list`` queryset of the tokens to export.
+
+        The client's name is resolved by the caller, so that
+        the rows are read from the token table alone (which may be sharded).
+        """
+        queryset = AuthToken.objects.db_manager(using).all()
+        if client_ids is not None:
+            queryset = queryset.filter(client_id__in=client_ids)
+        if status == "active":
+            queryset = queryset.filter(expiry__gte=timezone.now())
+        elif status == "expired":
+            queryset = queryset.filter(expiry__lt=timezone.now())
+        if after is not None:
+            queryset = queryset.filter(created__gte=after)
+        if before is not None:
+            queryset = queryset.filter(created__lt=before)
+        return queryset.order_by("pk").values_list(
+            "pk", "user_id", "client_id", "created", "expiry"
+        )
+
+    def handle(self, *args, **options):
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be a positive integer.")
+        client_names = self.get_client_names(options["clients"])
+        client_ids = list(client_names) if options["clients"] else None
+
+        if options["format"] == "csv":
+            writer = csv.writer(Echo())
+            format_row = writer.writerow
+            self.stdout.write(format_row(COLUMNS), ending="")
+        else:
+
+            def format_row(row):
+                return json.dumps(dict(zip(COLUMNS, row))) + "\n"
+
+        count = 0
+        for using in self.get_databases():
+            rows = self.get_queryset(
+                using,
+                client_ids=client_ids,
+                status=options["status"],
+                after=options["created_after"],
+                before=options["created_before"],
+            ).iterator(chunk_size=options["chunk_size"])
+            for pk, user_id, client_id, created, expiry in rows:
+                row = (
+                    pk,
+                    user_id,
+                    client_names.get(client_id),
+                    created.isoformat(),
+                    expiry.isoformat(),
+                )
+                self.stdout.write(format_row(row), ending="")
+                count += 1
+        self.stderr.write("Exported {0} token(s).".format(count))
@@ -0,0 +1,131 @@
+"""
+Django middlewares provided by durin.
+"""
+
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.utils.functional import SimpleLazyObject
+from rest_framework import exceptions
+from rest_framework.authentication import get_authorization_header
+
+from durin.auth import TokenAuthentication
+from durin.settings import durin_settings
+from durin.throttling import ClientConcurrencyThrottle, LoadMonitor
+
+
+class ConcurrencyLimitMiddleware:
+    """
+    Releases the slots acquired by :class:`durin.throttling.ClientConcurrencyThrottle`
+    once the response is returned.
+
+    .. Note:: For streaming responses, the slot is released once the view returns,
+        not when the whole content has been sent.
+
+    .. versionadded:: 1.2.0
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request._durin_concurrency_leases = []
+        try:
+            return self.get_response(request)
+        finally:
+            ClientConcurrencyThrottle.release(request._durin_concurrency_leases)
+
+
+class LoadMonitorMiddleware:
+    """
+    Records the latency and errors (``5xx`` responses) of each request
+    in the :class:`durin.throttling.LoadMonitor` used by
+    :class:`durin.throttling.AdaptiveUserClientRateThrottle`.
+
+    .. versionadded:: 1.2.0
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.monotonic()
+        error = True
+        try:
+            response = self.get_response(request)
+            error = response.status_code >= 500
+            return response
+        finally:
+            LoadMonitor.record(time.monotonic() - start, error)
+
+
+class RateLimitHeadersMiddleware:
+    """
+    Adds the ``RateLimit-Limit``, ``RateLimit-Remaining`` and ``RateLimit-Reset``
+    headers to responses, describing the quota of the most restrictive of
+    :class:`durin.throttling.UserClientRateThrottle` (and its subclasses),
+    :class:`durin.throttling.CompositeRateThrottle` and
+    :class:`durin.throttling.PreAuthTokenRateThrottle` for the request.
+
+    They are computed from the state the throttles already read,
+    without any extra cache call.
+
+    .. versionadded:: 1.2.0
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        rate_limit = getattr(request, "_durin_rate_limit", None)
+        if rate_limit is not None:
+            limit, remaining, reset = rate_limit
+            response.setdefault("RateLimit-Limit", str(limit))
+            response.setdefault("RateLimit-Remaining", str(remaining))
+            response.setdefault("RateLimit-Reset", str(reset))
+        return response
+
+
+class TokenAuthenticationMiddleware:
+    """
+    Authenticates the requests carrying a durin token for plain Django views
+    and templates: ``request.user`` and ``request.auth`` (the
+    :class:`durin.models.AuthToken`, or ``None``) are resolved lazily, on first access.
+
+    The token is looked up at most once per request, the result being shared with
+    the authentication classes of DRF views (see
+    :meth:`durin.auth.TokenAuthentication.get_request_results`).
+    An invalid or expired token yields an ``AnonymousUser``.
+
+    Requests without a durin token are left as they are, so it should come after
+    Django's ``AuthenticationMiddleware``.
+
+    Set :py:attr:`authentication_class` in a subclass to use
+    :class:`durin.auth.CachedTokenAuthentication` instead.
+
+    .. versionadded:: 1.2.0
+    """
+
+    #: Authentication class used to resolve the token.
+    authentication_class = TokenAuthentication
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def authenticate(self, request) -> tuple:
+        if not hasattr(request, "_durin_auth"):
+            try:
+                result = self.authentication_class().authenticate(request)
+            except (exceptions.AuthenticationFailed, exceptions.Throttled):
+                result = None
+            request._durin_auth = result or (AnonymousUser(), None)
+        return request._durin_auth
+
+    def __call__(self, request):
+        auth = get_authorization_header(request).split()
+        prefix = durin_settings.AUTH_HEADER_PREFIX.encode()
+        if auth and auth[0].lower() == prefix.lower():
+            request.user = SimpleLazyObject(lambda: self.authenticate(request)[0])
+            request.auth = SimpleLazyObject(lambda: self.authenticate(request)[1])
+        return self.get_response(request)
@@ -0,0 +1,13 @@
+from django.db import migrations
+
+from durin.operations import DropShardForeignKeys
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("durin", "0003_alter_client_token_ttl"),
+    ]
+
+    operations = [
+        DropShardForeignKeys(),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.30 on 2026-10-19 11:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("durin", "0004_authtoken_shard_foreign_keys"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="client",
+            name="max_concurrent_requests",
+            field=models.PositiveIntegerField(
+                blank=True,
+                help_text="Maximum number of in-flight requests authed with this client.\n            Leave empty for no limit.\n            ",
+                null=True,
+                verbose_name="Maximum concurrent requests authed with this client",
+            ),
+        ),
+    ]
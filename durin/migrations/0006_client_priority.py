@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-19 11:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("durin", "0005_client_max_concurrent_requests"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="client",
+            name="priority",
+            field=models.PositiveSmallIntegerField(
+                default=0,
+                help_text="Higher is more important. When the service is degraded,\n            throttle rates of lower priority clients are scaled down the most.\n            ",
+                verbose_name="Priority of requests authed with this client",
+            ),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-19 11:26
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("durin", "0006_client_priority"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="client",
+            name="token_ttl_jitter",
+            field=models.DurationField(
+                blank=True,
+                help_text="Tokens expire up to this much earlier, at random.\n            Format: <code>DAYS HH:MM:SS</code>.\n            ",
+                null=True,
+                verbose_name="Token TTL jitter",
+            ),
+        ),
+        migrations.AddField(
+            model_name="client",
+            name="token_ttl_jitter_percent",
+            field=models.PositiveSmallIntegerField(
+                blank=True,
+                help_text="Tokens expire up to this percentage of the TTL earlier, at random.\n            ",
+                null=True,
+                validators=[django.core.validators.MaxValueValidator(100)],
+                verbose_name="Token TTL jitter (%)",
+            ),
+        ),
+    ]
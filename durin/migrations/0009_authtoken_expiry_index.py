@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-19 12:41
+
+from django.db import migrations, models
+
+from durin.operations import DropShardForeignKeys
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("durin", "0008_client_token_ttl_jitter"),
+    ]
+
+    operations = [
+        # undoing the rebuild of the table restores the constraints on the shards
+        DropShardForeignKeys(on_backwards=True),
+        migrations.AlterField(
+            model_name="authtoken",
+            name="expiry",
+            field=models.DateTimeField(db_index=True),
+        ),
+        # SQLite rebuilds the table, restoring the constraints on the shards
+        DropShardForeignKeys(),
+    ]
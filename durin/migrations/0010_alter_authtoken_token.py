@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-19 12:59
+
+from django.db import migrations, models
+
+from durin.operations import DropShardForeignKeys
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("durin", "0009_authtoken_expiry_index"),
+    ]
+
+    operations = [
+        # undoing the rebuild of the table restores the constraints on the shards
+        DropShardForeignKeys(on_backwards=True),
+        migrations.AlterField(
+            model_name="authtoken",
+            name="token",
+            field=models.CharField(
+                help_text="Token is auto-generated on save.", max_length=64, unique=True
+            ),
+        ),
+        # SQLite rebuilds the table, restoring the constraints on the shards
+        DropShardForeignKeys(),
+    ]
@@ -1,25 +1,58 @@
 import binascii
+import random
+from datetime import timedelta
 from os import urandom
 
-import humanize
 from django.conf import settings
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.core.validators import MaxValueValidator
+from django.db import models, transaction
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+from durin import etags, sharding
+from durin.cache import cache
 from durin.settings import durin_settings
 from durin.signals import token_renewed
-from durin.throttling import UserClientRateThrottle
 
 User = settings.AUTH_USER_MODEL
 
 
+def validate_client_throttle_rate(rate):
+    """
+    Used for validating the :attr:`Client.throttle_rate` field.
+
+    *For internal use only.*
+
+    .. versionadded:: 1.2.0
+    """
+    TIME_PERIODS_MAP = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+    try:
+        num, period = rate.split("/")
+        return int(num), TIME_PERIODS_MAP[period]
+    except KeyError:
+        raise ValidationError("invalid period '{0}'.".format(period))
+    except Exception as e:
+        raise ValidationError(e)
+
+
 def _create_token_string() -> str:
     return binascii.hexlify(
         urandom(int(durin_settings.TOKEN_CHARACTER_LENGTH / 2))
     ).decode()
 
 
+def _warm_token_cache(auth_token: "AuthToken") -> None:
+    # imported here since ``durin.auth`` depends on this module
+    from durin.auth import warm_token_cache
+
+    # once committed, so that a rolled back token is never cached
+    transaction.on_commit(
+        lambda: warm_token_cache(auth_token), using=auth_token._state.db
+    )
+
+
 def get_DEFAULT_TOKEN_TTL():
     """Default token TTL value."""
     return durin_settings.DEFAULT_TOKEN_TTL
@@ -55,6 +88,37 @@ class Client(models.Model):
         ),
     )
 
+    #: Fixed spread of the random jitter subtracted from :py:attr:`token_ttl`
+    #: when a token is issued or renewed, so that tokens issued at the same time
+    #: don't all expire at the same time. See :py:meth:`get_token_ttl`.
+    #:
+    #: .. versionadded:: 1.2.0
+    token_ttl_jitter = models.DurationField(
+        null=True,
+        blank=True,
+        verbose_name=_("Token TTL jitter"),
+        help_text=_(
+            """Tokens expire up to this much earlier, at random.
+            Format: <code>DAYS HH:MM:SS</code>.
+            """
+        ),
+    )
+
+    #: Same as :py:attr:`token_ttl_jitter` but as a percentage of :py:attr:`token_ttl`.
+    #: The larger of both spreads is used.
+    #:
+    #: .. versionadded:: 1.2.0
+    token_ttl_jitter_percent = models.PositiveSmallIntegerField(
+        null=True,
+        blank=True,
+        validators=[MaxValueValidator(100)],
+        verbose_name=_("Token TTL jitter (%)"),
+        help_text=_(
+            """Tokens expire up to this percentage of the TTL earlier, at random.
+            """
+        ),
+    )
+
     #: Throttle rate for requests authed with this client.
     #:
     #: **Format**: ``number_of_requests/period``
@@ -76,27 +140,131 @@ class Client(models.Model):
             Example: '100/h' implies 100 requests each hour.
             """
         ),
-        validators=[UserClientRateThrottle.validate_client_throttle_rate],
+        validators=[validate_client_throttle_rate],
+    )
+
+    #: Maximum number of concurrent (in-flight) requests authed with this client,
+    #: enforced by :class:`durin.throttling.ClientConcurrencyThrottle`.
+    #: ``null`` means unlimited.
+    #:
+    #: .. versionadded:: 1.2.0
+    max_concurrent_requests = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name=_("Maximum concurrent requests authed with this client"),
+        help_text=_(
+            """Maximum number of in-flight requests authed with this client.
+            Leave empty for no limit.
+            """
+        ),
+    )
+
+    #: Priority of the requests authed with this client, higher is more important.
+    #: Used by :class:`durin.throttling.AdaptiveUserClientRateThrottle`
+    #: to decide how much to scale down this client's throttle rate
+    #: when the service is degraded.
+    #:
+    #: .. versionadded:: 1.2.0
+    priority = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name=_("Priority of requests authed with this client"),
+        help_text=_(
+            """Higher is more important. When the service is degraded,
+            throttle rates of lower priority clients are scaled down the most.
+            """
+        ),
     )
 
+    def get_token_ttl(self) -> timedelta:
+        """
+        Returns the :py:attr:`token_ttl` shortened by a random amount
+        within the larger of :py:attr:`token_ttl_jitter`
+        and :py:attr:`token_ttl_jitter_percent`, if any.
+
+        Tokens never outlive the :py:attr:`token_ttl`.
+
+        .. versionadded:: 1.2.0
+        """
+        spread = self.token_ttl_jitter or timedelta(0)
+        if self.token_ttl_jitter_percent:
+            spread = max(spread, self.token_ttl * self.token_ttl_jitter_percent / 100)
+        spread = min(spread, self.token_ttl)
+        if not spread:
+            return self.token_ttl
+        return self.token_ttl - spread * random.random()
+
+    @staticmethod
+    def get_pk_cache_key(name: str) -> str:
+        """
+        Cache key of the primary key of the client with the given name,
+        see :class:`durin.views.APIAccessTokenView`.
+
+        .. versionadded:: 1.2.0
+        """
+        return "durin_client_pk_{0}".format(name)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # the name the client's primary key may be cached under, see ``save``
+        instance._loaded_name = instance.__dict__.get("name")
+        return instance
+
+    def _invalidate_pk_cache(self) -> None:
+        names = {self.name, getattr(self, "_loaded_name", None)} - {None}
+        cache.delete_many([self.get_pk_cache_key(name) for name in names])
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # on a rename, the primary key cached under the previous name goes too
+        self._invalidate_pk_cache()
+        self._loaded_name = self.name
+
+    def delete(self, *args, **kwargs):
+        self._invalidate_pk_cache()
+        return super().delete(*args, **kwargs)
+
     def __str__(self):
+        import humanize
+
         td = humanize.naturaldelta(self.token_ttl)
         rate = self.throttle_rate or "null"
         return "({0}: {1}, {2})".format(self.name, td, rate)
 
 
-class AuthTokenManager(models.Manager):
+class AuthTokenQuerySet(models.QuerySet):
+    def delete(self):
+        # replace the version stamps of the owners, see ``durin.etags``
+        user_ids = []
+        if etags.is_enabled():
+            user_ids = list(self.values_list("user_id", flat=True).distinct())
+        result = super().delete()
+        etags.bump_user_versions(user_ids, using=self.db)
+        return result
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
+class AuthTokenManager(models.Manager.from_queryset(AuthTokenQuerySet)):
     def create(self, user, client, delta_ttl=None):
         token = _create_token_string()
 
         if delta_ttl is not None:
             expiry = timezone.now() + delta_ttl
         else:
-            expiry = timezone.now() + client.token_ttl
+            expiry = timezone.now() + client.get_token_ttl()
+
+        manager = self
+        if sharding.is_enabled():
+            # store the token on the user's shard and encode it in the token
+            token = sharding.encode_token(token, user.pk)
+            manager = self.db_manager(sharding.get_shard_for_user(user.pk))
 
-        instance = super(AuthTokenManager, self).create(
+        instance = super(AuthTokenManager, manager).create(
             token=token, user=user, client=client, expiry=expiry
         )
+        _warm_token_cache(instance)
         return instance
 
 
@@ -119,7 +287,6 @@ class AuthToken(models.Model):
         max_length=durin_settings.TOKEN_CHARACTER_LENGTH,
         null=False,
         blank=False,
-        db_index=True,
         unique=True,
         help_text=_("Token is auto-generated on save."),
     )
@@ -142,17 +309,29 @@ class AuthToken(models.Model):
     #: Created time
     created = models.DateTimeField(auto_now_add=True)
     #: Expiry time
-    expiry = models.DateTimeField(null=False)
+    expiry = models.DateTimeField(null=False, db_index=True)
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        etags.bump_user_versions([self.user_id], using=self._state.db)
+
+    def delete(self, *args, **kwargs):
+        user_id, using = self.user_id, self._state.db
+        result = super().delete(*args, **kwargs)
+        etags.bump_user_versions([user_id], using=using)
+        return result
 
     def renew_token(self, request=None) -> "timezone.datetime":
         """
         Utility function to renew the token.
 
-        Updates the :py:attr:`~expiry` attribute by ``Client.token_ttl``.
+        Updates the :py:attr:`~expiry` attribute by ``Client.token_ttl``
+        (see :py:meth:`Client.get_token_ttl`).
         """
-        new_expiry = timezone.now() + self.client.token_ttl
+        new_expiry = timezone.now() + self.client.get_token_ttl()
         self.expiry = new_expiry
         self.save(update_fields=("expiry",))
+        _warm_token_cache(self)
         token_renewed.send(
             sender=self,
             request=request,
@@ -169,6 +348,8 @@ class AuthToken(models.Model):
         Uses `humanize package <https://github.com/jmoiron/humanize>`__.
         """
         if self.expiry:
+            import humanize
+
             td = self.expiry - self.created
             return humanize.naturaldelta(td)
         return "N/A"
@@ -182,9 +363,14 @@ class AuthToken(models.Model):
         return timezone.now() > self.expiry
 
     def __repr__(self) -> str:
-        return "({0}, {1}/{2})".format(
-            self.token, self.user.get_username(), self.client.name
-        )
+        # don't fetch the related rows just to log the token
+        user = self.user_id
+        if self._meta.get_field("user").is_cached(self):
+            user = self.user.get_username()
+        client = self.client_id
+        if self._meta.get_field("client").is_cached(self):
+            client = self.client.name
+        return "({0}, {1}/{2})".format(self.token, user, client)
 
     def __str__(self) -> str:
         return self.token
@@ -0,0 +1,110 @@
+"""
+Migration operations of durin.
+"""
+
+import copy
+
+from django.db import connections
+from django.db.migrations.operations.base import Operation
+from django.db.migrations.state import StateApps
+
+
+class DropShardForeignKeys(Operation):
+    """
+    Drops the foreign key constraints of the ``AuthToken`` table (on the ``User``
+    and :class:`durin.models.Client` rows) on the databases listed in
+    ``AUTHTOKEN_SHARD_DATABASES``, which don't hold these rows
+    (see :mod:`durin.sharding`). It's a no-op on any other database.
+
+    Only the database schema is altered, the migration state keeps the
+    constraints. So any later migration rebuilding the ``AuthToken`` table
+    (e.g. altering one of its fields on SQLite) restores them and has to
+    run this operation again: after its other operations, and first with
+    ``on_backwards=True``, which drops them once the migration is unapplied.
+
+    .. versionadded:: 1.2.0
+    """
+
+    reversible = True
+    reduces_to_sql = False
+
+    #: Foreign keys of the ``AuthToken`` model.
+    fields = ("user", "client")
+
+    def __init__(self, on_backwards=False):
+        self.on_backwards = on_backwards
+
+    def state_forwards(self, app_label, state):
+        pass
+
+    def _alter_constraints(self, app_label, schema_editor, state, db_constraint):
+        from durin.settings import durin_settings
+
+        shards = durin_settings.AUTHTOKEN_SHARD_DATABASES or ()
+        if schema_editor.connection.alias not in shards:
+            return
+        # render a throwaway copy of the model, whose fields can be updated one
+        # after the other (SQLite rebuilds the table from the model's fields)
+        # without altering the migration state
+        apps = StateApps(state.real_apps, state.models)
+        model = apps.get_model(app_label, "authtoken")
+        # only the constraints not in the wanted state yet are altered, as the
+        # table may or may not have been rebuilt by the previous operations
+        existing = self._get_constrained_columns(schema_editor.connection, model)
+        fields = [model._meta.get_field(field_name) for field_name in self.fields]
+        for field in fields:
+            field.db_constraint = field.column in existing
+        for field in fields:
+            if field.db_constraint == db_constraint:
+                continue
+            old_field = copy.copy(field)
+            field.db_constraint = db_constraint
+            schema_editor.alter_field(model, old_field, field)
+
+    @staticmethod
+    def _get_constrained_columns(connection, model) -> set:
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(
+                cursor, model._meta.db_table
+            )
+        return {
+            column
+            for constraint in constraints.values()
+            if constraint["foreign_key"]
+            for column in constraint["columns"]
+        }
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if not self.on_backwards:
+            self._alter_constraints(app_label, schema_editor, to_state, False)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        self._alter_constraints(
+            app_label, schema_editor, to_state, not self.on_backwards
+        )
+
+    def describe(self):
+        if self.on_backwards:
+            return (
+                "Drop the foreign key constraints of AuthToken on the shards "
+                "when unapplied"
+            )
+        return "Drop the foreign key constraints of AuthToken on the shards"
+
+
+def drop_shard_foreign_keys(using: str) -> None:
+    """
+    Runs :class:`DropShardForeignKeys` on the given database alias, e.g. if
+    a migration rebuilding the ``AuthToken`` table restored the constraints::
+
+        >>> from durin.operations import drop_shard_foreign_keys
+        >>> drop_shard_foreign_keys("tokens1")
+
+    .. versionadded:: 1.2.0
+    """
+    from django.db.migrations.loader import MigrationLoader
+
+    connection = connections[using]
+    state = MigrationLoader(connection).project_state()
+    with connection.schema_editor() as schema_editor:
+        DropShardForeignKeys().database_forwards("durin", schema_editor, state, state)
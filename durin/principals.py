@@ -0,0 +1,215 @@
+"""
+Durin provides an *opt-in* lightweight authentication result:
+when ``LIGHTWEIGHT_AUTH_PRINCIPAL`` is ``True``,
+:class:`durin.auth.TokenAuthentication` sets ``request.auth`` to an
+:class:`AuthTokenPrincipal` and ``request.user`` to a :class:`UserPrincipal`
+instead of model instances.
+
+They are built from a single query reading only the handful of columns
+most views need, i.e. the token's ``user_id``, ``client_id``, ``created``
+and ``expiry``, the user's ``is_active`` flag and the client's ``name``,
+``throttle_rate``, ``max_concurrent_requests`` and ``priority``, which is enough for
+:mod:`durin.permissions` and :mod:`durin.throttling`.
+
+Accessing any other attribute (or method) loads the actual model instance
+from the database, once, and reads it from there. So
+:class:`durin.views.RefreshView`, :class:`durin.views.LogoutView` and the like
+keep working, at the cost of that extra query.
+
+Example ``settings.py``::
+
+        #...snip...
+        REST_DURIN = {
+            "LIGHTWEIGHT_AUTH_PRINCIPAL": True,
+        }
+        #...snip...
+
+.. Note::
+    - ``isinstance(request.user, User)`` and ``request.user.__class__`` behave
+      as for the model instance (like Django's ``SimpleLazyObject``), so signal
+      receivers connected to the user model keep receiving ``user_logged_out``.
+    - It is ignored by :class:`durin.auth.CachedTokenAuthentication`, which
+      already rebuilds lightweight instances from its cache, and while
+      :mod:`durin.sharding` is enabled, since the related rows can't be joined.
+"""
+
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from durin.models import AuthToken, Client
+
+
+class LazyPrincipal:
+    """
+    Base class of the principals: ``__slots__`` holding a few fields of a model
+    instance, which is loaded lazily on access of any other attribute.
+
+    .. versionadded:: 1.2.0
+    """
+
+    __slots__ = ("pk", "_db", "_instance")
+
+    def __init__(self, pk, db=None):
+        self.pk = pk
+        self._db = db
+        self._instance = None
+
+    @classmethod
+    def get_model(cls):
+        raise NotImplementedError()
+
+    @property
+    def __class__(self):
+        return self.get_model()
+
+    @property
+    def _meta(self):
+        return self.get_model()._meta
+
+    def get_instance(self):
+        """
+        Returns the model instance, loaded from the database on first call.
+        """
+        if self._instance is None:
+            manager = self.get_model()._default_manager.db_manager(self._db)
+            self._instance = manager.get(pk=self.pk)
+        return self._instance
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return getattr(self.get_instance(), name)
+
+    def __eq__(self, other):
+        if not hasattr(other, "_meta") or other._meta.concrete_model is not (
+            self._meta.concrete_model
+        ):
+            return NotImplemented
+        return self.pk == other.pk
+
+    def __hash__(self):
+        return hash(self.pk)
+
+    def __str__(self):
+        return str(self.get_instance())
+
+    def __repr__(self):
+        return "<{0}: {1}>".format(type(self).__name__, self.pk)
+
+
+class UserPrincipal(LazyPrincipal):
+    """
+    Lightweight ``request.user``.
+
+    .. versionadded:: 1.2.0
+    """
+
+    __slots__ = ("is_active",)
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, pk, is_active, db=None):
+        super().__init__(pk, db)
+        self.is_active = is_active
+
+    @classmethod
+    def get_model(cls):
+        return get_user_model()
+
+
+class ClientPrincipal(LazyPrincipal):
+    """
+    Lightweight :class:`durin.models.Client`.
+
+    .. versionadded:: 1.2.0
+    """
+
+    __slots__ = ("name", "throttle_rate", "max_concurrent_requests", "priority")
+
+    def __init__(
+        self, pk, name, throttle_rate, max_concurrent_requests, priority, db=None
+    ):
+        super().__init__(pk, db)
+        self.name = name
+        self.throttle_rate = throttle_rate
+        self.max_concurrent_requests = max_concurrent_requests
+        self.priority = priority
+
+    @classmethod
+    def get_model(cls):
+        return Client
+
+
+class AuthTokenPrincipal(LazyPrincipal):
+    """
+    Lightweight ``request.auth``.
+
+    .. versionadded:: 1.2.0
+    """
+
+    __slots__ = ("token", "user_id", "client_id", "created", "expiry", "user", "client")
+
+    #: Columns read by :py:meth:`get`, in the order of the constructor's arguments.
+    fields = (
+        "pk",
+        "token",
+        "created",
+        "expiry",
+        "user_id",
+        "user__is_active",
+        "client_id",
+        "client__name",
+        "client__throttle_rate",
+        "client__max_concurrent_requests",
+        "client__priority",
+    )
+
+    def __init__(
+        self,
+        pk,
+        token,
+        created,
+        expiry,
+        user_id,
+        user_is_active,
+        client_id,
+        client_name,
+        client_throttle_rate,
+        client_max_concurrent_requests,
+        client_priority,
+        db=None,
+    ):
+        super().__init__(pk, db)
+        self.token = token
+        self.created = created
+        self.expiry = expiry
+        self.user_id = user_id
+        self.client_id = client_id
+        self.user = UserPrincipal(user_id, user_is_active)
+        self.client = ClientPrincipal(
+            client_id,
+            client_name,
+            client_throttle_rate,
+            client_max_concurrent_requests,
+            client_priority,
+        )
+
+    @classmethod
+    def get_model(cls):
+        return AuthToken
+
+    @classmethod
+    def get(cls, token_str: str, using=None) -> "AuthTokenPrincipal":
+        """
+        Looks up the given token string in a single query.
+
+        :raises durin.models.AuthToken.DoesNotExist
+        """
+        queryset = AuthToken.objects.using(using).filter(token=token_str)
+        values = queryset.values_list(*cls.fields).get()
+        return cls(*values, db=queryset.db)
+
+    @property
+    def has_expired(self) -> bool:
+        return timezone.now() > self.expiry
@@ -0,0 +1,70 @@
+"""
+Durin provides a database router which sends the read queries made for
+:class:`durin.models.AuthToken` and :class:`durin.models.Client`
+to one or more read replicas while all writes stay on the primary database.
+
+Example ``settings.py``::
+
+        #...snip...
+        DATABASES = {
+            "default": {...},
+            "replica1": {...},
+            "replica2": {...},
+        }
+        DATABASE_ROUTERS = ["durin.routers.DurinReplicaRouter"]
+        REST_DURIN = {
+            "PRIMARY_DATABASE": "default",
+            "READ_REPLICA_DATABASES": ["replica1", "replica2"],
+        }
+        #...snip...
+
+Since replicas may lag behind the primary (for example, right after a login),
+:class:`durin.auth.TokenAuthentication` retries the token lookup
+on the ``PRIMARY_DATABASE`` when it misses on a replica.
+"""
+
+import random
+
+from durin.settings import durin_settings
+
+
+class DurinReplicaRouter:
+    """
+    Routes reads of durin's models to a randomly chosen alias
+    from ``READ_REPLICA_DATABASES`` and writes to ``PRIMARY_DATABASE``.
+
+    Models of other apps are left for the next router
+    in ``DATABASE_ROUTERS`` (or Django's default routing) to decide.
+
+    .. versionadded:: 1.2.0
+    """
+
+    #: App labels whose models are routed by this router.
+    route_app_labels = ("durin",)
+
+    def _is_routed(self, model) -> bool:
+        return model._meta.app_label in self.route_app_labels
+
+    def db_for_read(self, model, **hints):
+        if not self._is_routed(model):
+            return None
+        replicas = durin_settings.READ_REPLICA_DATABASES
+        if not replicas:
+            return durin_settings.PRIMARY_DATABASE
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        if not self._is_routed(model):
+            return None
+        return durin_settings.PRIMARY_DATABASE
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """
+        Relations are allowed between objects loaded from
+        the primary or any of the replicas.
+        """
+        db_set = {durin_settings.PRIMARY_DATABASE}
+        db_set.update(durin_settings.READ_REPLICA_DATABASES or ())
+        if obj1._state.db in db_set and obj2._state.db in db_set:
+            return True
+        return None
@@ -1,4 +1,5 @@
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError, router, transaction
 from rest_framework import serializers as rfs
 
 from .models import AuthToken, Client
@@ -103,13 +104,44 @@ class APIAccessTokenSerializer(rfs.ModelSerializer):
         :meta private:
         """
         user = self.context["request"].user
-        client_name = self.context["client_name"]
-        if AuthToken.objects.filter(user=user, client__name=client_name).exists():
+        client = validated_data.get("client") or Client.objects.get(
+            name=self.context["client_name"]
+        )
+        # a single insert, relying on the unique constraint of the user-client pair
+        # instead of checking for an existing token first. The router sends it
+        # to the user's shard (if any).
+        using = router.db_for_write(AuthToken, instance=user)
+        try:
+            if not transaction.get_connection(using).in_atomic_block:
+                return AuthToken.objects.create(user, client)
+            # a failed insert would break the outer transaction
+            with transaction.atomic(using=using):
+                return AuthToken.objects.create(user, client)
+        except IntegrityError:
             raise rfs.ValidationError("An API token was already issued to you.")
 
-        validated_data["user"] = user
-        validated_data["client"] = Client.objects.get(name=client_name)
-        return super().create(validated_data)
+
+class TokenIntrospectionSerializer(rfs.Serializer):
+    """
+    Used in :class:`durin.views.TokenIntrospectionView`.
+
+    .. versionadded:: 1.2.0
+    """
+
+    tokens = rfs.ListField(child=rfs.CharField())
+
+    def validate_tokens(self, tokens: list) -> list:
+        """
+        :meta private:
+        """
+        if not tokens:
+            raise rfs.ValidationError("This list may not be empty.")
+        max_tokens = int(durin_settings.INTROSPECTION_MAX_TOKENS)
+        if len(tokens) > max_tokens:
+            raise rfs.ValidationError(
+                "Ensure this list has at most {0} tokens.".format(max_tokens)
+            )
+        return tokens
 
 
 class ClientSerializer(rfs.ModelSerializer):
@@ -122,5 +154,9 @@ class ClientSerializer(rfs.ModelSerializer):
         fields = [
             "name",
             "token_ttl",
+            "token_ttl_jitter",
+            "token_ttl_jitter_percent",
             "throttle_rate",
+            "max_concurrent_requests",
+            "priority",
         ]
@@ -1,7 +1,7 @@
 from datetime import timedelta
 
 from django.conf import settings
-from django.test.signals import setting_changed
+from django.core.signals import setting_changed
 from rest_framework.settings import APISettings, api_settings
 
 USER_SETTINGS = getattr(settings, "REST_DURIN", None)
@@ -13,15 +13,46 @@ DEFAULTS = {
     "AUTH_HEADER_PREFIX": "Token",
     "EXPIRY_DATETIME_FORMAT": api_settings.DATETIME_FORMAT,
     "TOKEN_CACHE_TIMEOUT": 60,
+    "TOKEN_CACHE_WARM_UP": False,
+    "TOKEN_CACHE_USER_FIELDS": (),
+    "TOKEN_CACHE_STALE_TIMEOUT": 0,
+    "TOKEN_CACHE_LOCK_TIMEOUT": 5,
+    "PRE_AUTH_THROTTLE_CLASS": None,
+    "LOGIN_THROTTLE_CLASS": None,
+    "LOGIN_THROTTLE_FAILURES": 5,
+    "LOGIN_THROTTLE_LOCKOUT": 60,
+    "LOGIN_THROTTLE_MAX_LOCKOUT": 3600,
+    "CONCURRENCY_LEASE_TIMEOUT": 60,
+    "ADAPTIVE_THROTTLE_WINDOW": 60,
+    "ADAPTIVE_THROTTLE_LATENCY_TARGET": 0.5,
+    "ADAPTIVE_THROTTLE_ERROR_RATE_TARGET": 0.05,
+    "CACHE_CIRCUIT_BREAKER": False,
+    "CACHE_LATENCY_BUDGET": 0.05,
+    "CACHE_FAILURE_THRESHOLD": 5,
+    "CACHE_RECOVERY_TIMEOUT": 30,
+    "CACHE_FALLBACK_ALIAS": None,
     "REFRESH_TOKEN_ON_LOGIN": False,
     "AUTHTOKEN_SELECT_RELATED_LIST": ["user"],
+    "LIGHTWEIGHT_AUTH_PRINCIPAL": False,
     "API_ACCESS_CLIENT_NAME": None,
     "API_ACCESS_EXCLUDE_FROM_SESSIONS": False,
     "API_ACCESS_RESPONSE_INCLUDE_TOKEN": False,
+    "PRIMARY_DATABASE": "default",
+    "READ_REPLICA_DATABASES": None,
+    "AUTHTOKEN_SHARD_DATABASES": None,
+    "INTROSPECTION_MAX_TOKENS": 100,
+    "CONDITIONAL_GET": False,
+    "VERIFIER_AUTHENTICATION_CLASS": "durin.auth.TokenAuthentication",
+    "EXPIRED_TOKEN_SWEEPER": False,
+    "EXPIRED_TOKEN_SWEEP_INTERVAL": 300,
+    "EXPIRED_TOKEN_SWEEP_BATCH_SIZE": 500,
 }
 
 IMPORT_STRINGS = {
     "USER_SERIALIZER",
+    "PRE_AUTH_THROTTLE_CLASS",
+    "LOGIN_THROTTLE_CLASS",
+    "VERIFIER_AUTHENTICATION_CLASS",
 }
 
 durin_settings = APISettings(USER_SETTINGS, DEFAULTS, IMPORT_STRINGS)
@@ -0,0 +1,175 @@
+"""
+Durin provides an *opt-in* sharding layer which spreads the
+:class:`durin.models.AuthToken` rows over several database aliases,
+keyed deterministically by the user's primary key.
+Each user's tokens live on exactly one shard, while the ``User`` and
+:class:`durin.models.Client` rows stay on the ``PRIMARY_DATABASE``.
+
+The index of the shard is encoded in the first two (hex) characters of every
+token issued while sharding is enabled, so that
+:class:`durin.auth.TokenAuthentication` can find the right shard
+without a fan-out query.
+
+Example ``settings.py``::
+
+        #...snip...
+        DATABASES = {
+            "default": {...},
+            "tokens1": {...},
+            "tokens2": {...},
+        }
+        DATABASE_ROUTERS = ["durin.sharding.AuthTokenShardRouter"]
+        REST_DURIN = {
+            "AUTHTOKEN_SHARD_DATABASES": ["tokens1", "tokens2"],
+        }
+        #...snip...
+
+Then apply the migrations on each shard, with ``AUTHTOKEN_SHARD_DATABASES`` set::
+
+        $ python manage.py migrate --database=tokens1
+        $ python manage.py migrate --database=tokens2
+
+.. Warning::
+    - Tokens issued before enabling sharding (or before changing the list of shards)
+      won't be found anymore, so all users will have to login again.
+    - Since the shards don't hold the ``User`` and ``Client`` rows, the foreign key
+      constraints of the ``AuthToken`` table are dropped on them
+      (see :class:`durin.operations.DropShardForeignKeys`) and deleting
+      a user or a client doesn't cascade to its tokens on the shards.
+      Such tokens fail authentication and are removed once they expire.
+    - ``select_related`` can't join across databases, so
+      ``AUTHTOKEN_SELECT_RELATED_LIST`` is ignored while sharding is enabled.
+"""
+
+import zlib
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from durin.settings import durin_settings
+
+#: Number of leading characters of a token which encode its shard index.
+SHARD_PREFIX_LENGTH = 2
+
+#: Maximum number of shards that can be encoded in :py:data:`SHARD_PREFIX_LENGTH`.
+MAX_SHARDS = 16**SHARD_PREFIX_LENGTH
+
+
+def get_shard_databases() -> list:
+    """
+    Returns the list of database aliases set in ``AUTHTOKEN_SHARD_DATABASES``.
+    """
+    shards = list(durin_settings.AUTHTOKEN_SHARD_DATABASES or ())
+    if len(shards) > MAX_SHARDS:
+        raise ImproperlyConfigured(
+            "`AUTHTOKEN_SHARD_DATABASES` can't have more than {0} aliases.".format(
+                MAX_SHARDS
+            )
+        )
+    return shards
+
+
+def is_enabled() -> bool:
+    """
+    ``True`` if ``AUTHTOKEN_SHARD_DATABASES`` is set.
+    """
+    return bool(durin_settings.AUTHTOKEN_SHARD_DATABASES)
+
+
+def get_shard_index(user_pk) -> int:
+    """
+    Deterministically maps the given user primary key to a shard index.
+    """
+    num_shards = len(get_shard_databases())
+    if isinstance(user_pk, int):
+        return user_pk % num_shards
+    return zlib.crc32(str(user_pk).encode()) % num_shards
+
+
+def get_shard_for_user(user_pk) -> str:
+    """
+    Returns the database alias holding the tokens of the given user,
+    or ``None`` if sharding is not enabled.
+    """
+    if not is_enabled():
+        return None
+    return get_shard_databases()[get_shard_index(user_pk)]
+
+
+def get_shard_for_token(token_str: str) -> str:
+    """
+    Decodes the database alias from the given token string,
+    or returns ``None`` if the token doesn't encode a valid shard.
+    """
+    shards = get_shard_databases()
+    try:
+        index = int(token_str[:SHARD_PREFIX_LENGTH], 16)
+    except ValueError:
+        return None
+    if index >= len(shards):
+        return None
+    return shards[index]
+
+
+def encode_token(token_str: str, user_pk) -> str:
+    """
+    Overwrites the prefix of the given token string with
+    the shard index of the given user.
+    """
+    prefix = "{0:0{1}x}".format(get_shard_index(user_pk), SHARD_PREFIX_LENGTH)
+    return prefix + token_str[SHARD_PREFIX_LENGTH:]
+
+
+class AuthTokenShardRouter:
+    """
+    Routes queries for :class:`durin.models.AuthToken` to the
+    shard of the user they belong to, whenever the user is known from the hints
+    (e.g. ``user.auth_token_set`` related manager or saving/deleting a token).
+
+    Related objects (``User``, ``Client``) accessed from a token loaded from
+    a shard are read from the ``PRIMARY_DATABASE``.
+
+    Should be listed first in ``DATABASE_ROUTERS``.
+
+    .. versionadded:: 1.2.0
+    """
+
+    @staticmethod
+    def _is_authtoken(model) -> bool:
+        return model._meta.label_lower == "durin.authtoken"
+
+    @staticmethod
+    def _is_user(model) -> bool:
+        return model._meta.label_lower == settings.AUTH_USER_MODEL.lower()
+
+    def _db_for_model(self, model, **hints):
+        if not is_enabled():
+            return None
+        instance = hints.get("instance")
+        if instance is None:
+            return None
+        if self._is_authtoken(model):
+            if self._is_authtoken(instance):
+                return instance._state.db or get_shard_for_user(instance.user_id)
+            if self._is_user(instance):
+                return get_shard_for_user(instance.pk)
+        elif self._is_authtoken(instance) and instance._state.db in (
+            get_shard_databases()
+        ):
+            # shards don't hold any other rows
+            return durin_settings.PRIMARY_DATABASE
+        return None
+
+    def db_for_read(self, model, **hints):
+        return self._db_for_model(model, **hints)
+
+    def db_for_write(self, model, **hints):
+        return self._db_for_model(model, **hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """
+        Tokens on the shards may relate to users and clients on the primary.
+        """
+        if is_enabled() and (self._is_authtoken(obj1) or self._is_authtoken(obj2)):
+            return True
+        return None
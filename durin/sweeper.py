@@ -0,0 +1,182 @@
+"""
+Durin provides an *opt-in* background sweeper which deletes expired
+:class:`durin.models.AuthToken` rows, for deployments that don't run
+a task scheduler. Otherwise, an expired token is only deleted when it is
+presented again.
+
+The sweeper is a daemon thread started by :class:`durin.app.DurinConfig`
+in each process. Every ``EXPIRED_TOKEN_SWEEP_INTERVAL`` seconds (jittered),
+the processes race for a lock in the cache and only the winner sweeps,
+deleting expired tokens in batches of ``EXPIRED_TOKEN_SWEEP_BATCH_SIZE``
+rows with a short random pause in between.
+
+Example ``settings.py``::
+
+        #...snip...
+        INSTALLED_APPS = (
+            #...snip...
+            "durin.app.DurinConfig",
+        )
+        REST_DURIN = {
+            "EXPIRED_TOKEN_SWEEPER": True,
+            "EXPIRED_TOKEN_SWEEP_INTERVAL": 300,
+            "EXPIRED_TOKEN_SWEEP_BATCH_SIZE": 500,
+        }
+        #...snip...
+
+.. Note:: The lock is only shared by the processes using the same cache server,
+    so use a shared cache backend (e.g. Memcached or Redis) in production.
+"""
+
+import logging
+import random
+import threading
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.utils import timezone
+
+from durin import sharding
+from durin.cache import cache
+from durin.models import AuthToken
+from durin.settings import durin_settings
+from durin.signals import token_expired
+
+logger = logging.getLogger(__name__)
+
+
+class ExpiredTokenSweeper:
+    """
+    Periodically deletes the expired tokens, see :mod:`durin.sweeper`.
+
+    .. versionadded:: 1.2.0
+    """
+
+    #: Cache key of the lock electing the process which sweeps.
+    lock_key = "durin_expired_token_sweeper"
+
+    #: Maximum fraction by which the interval is randomly shortened or lengthened.
+    interval_jitter = 0.1
+
+    #: Maximum number of seconds to pause between two batches.
+    batch_pause = 1.0
+
+    def __init__(self):
+        self.ident = uuid.uuid4().hex
+        self._stopped = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def get_databases() -> list:
+        """
+        Returns the database aliases to sweep, i.e. all the shards if
+        :mod:`durin.sharding` is enabled, otherwise ``[None]`` (routed).
+        """
+        if sharding.is_enabled():
+            return sharding.get_shard_databases()
+        return [None]
+
+    def get_interval(self) -> float:
+        interval = float(durin_settings.EXPIRED_TOKEN_SWEEP_INTERVAL)
+        spread = interval * self.interval_jitter
+        return interval + random.uniform(-spread, spread)
+
+    def elect(self) -> bool:
+        """
+        Returns ``True`` if this process holds the lock for the current interval.
+        The lock expires by itself, so a crashed process doesn't block the others.
+        """
+        if cache.is_open:
+            # the fallback cache can't elect a single process
+            return False
+        timeout = int(durin_settings.EXPIRED_TOKEN_SWEEP_INTERVAL)
+        return bool(cache.add(self.lock_key, self.ident, timeout))
+
+    def sweep(self, using=None) -> int:
+        """
+        Deletes the expired tokens of the ``using`` database alias in batches
+        and returns their number.
+        """
+        batch_size = int(durin_settings.EXPIRED_TOKEN_SWEEP_BATCH_SIZE)
+        deleted = 0
+        while not self._stopped.is_set():
+            expired = list(
+                AuthToken.objects.db_manager(using)
+                .filter(expiry__lt=timezone.now())
+                .values_list("pk", "user_id")[:batch_size]
+            )
+            if not expired:
+                break
+            AuthToken.objects.db_manager(using).filter(
+                pk__in=[pk for pk, _ in expired]
+            ).delete()
+            deleted += len(expired)
+            self.send_token_expired([user_id for _, user_id in expired])
+            if len(expired) < batch_size:
+                break
+            self._stopped.wait(random.uniform(0, self.batch_pause))
+        return deleted
+
+    def send_token_expired(self, user_ids: list) -> None:
+        if not token_expired.has_listeners(self.__class__):
+            return
+        User = get_user_model()
+        usernames = {
+            user.pk: user.get_username()
+            for user in User._default_manager.filter(pk__in=set(user_ids))
+        }
+        for user_id in user_ids:
+            token_expired.send(
+                sender=self.__class__,
+                username=usernames.get(user_id),
+                source="sweeper",
+            )
+
+    def run_once(self) -> int:
+        """
+        Sweeps every database if elected and returns the number of deleted tokens.
+        """
+        if not self.elect():
+            return 0
+        deleted = 0
+        for using in self.get_databases():
+            deleted += self.sweep(using)
+        if deleted:
+            logger.info("deleted %d expired tokens", deleted)
+        return deleted
+
+    def run(self) -> None:
+        while not self._stopped.wait(self.get_interval()):
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("expired token sweep failed")
+            finally:
+                # don't hold the connections of this thread until the next run
+                connections.close_all()
+
+    def start(self) -> None:
+        """
+        Starts the sweeper in a daemon thread.
+        """
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self.run, name="durin-expired-token-sweeper", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = None) -> None:
+        """
+        Stops the sweeper and waits for its thread to end.
+        """
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+#: The sweeper started by :class:`durin.app.DurinConfig`.
+sweeper = ExpiredTokenSweeper()
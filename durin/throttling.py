@@ -20,10 +20,50 @@ Example ``settings.py``::
 
     The rate defined here serves as the default rate incase the
     ``throttle_rate`` field on :class:`durin.models.Client` is ``null``.
+
+.. data:: "pre_auth_token"
+
+    ``scope`` for the :class:`PreAuthTokenRateThrottle` class.
+
+.. data:: "client"
+
+    ``scope`` of the per-client (all users together) policy
+    of the :class:`CompositeRateThrottle` class.
 """
 
-from django.core.exceptions import ValidationError as DjValidationError
-from rest_framework.throttling import UserRateThrottle
+import hashlib
+import math
+import threading
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.authentication import get_authorization_header
+from rest_framework.exceptions import Throttled
+from rest_framework.throttling import BaseThrottle, SimpleRateThrottle, UserRateThrottle
+
+from durin.cache import cache as durin_cache
+from durin.models import validate_client_throttle_rate
+from durin.settings import durin_settings
+
+
+def record_rate_limit(request, num_requests, duration, history, now) -> None:
+    """
+    Keeps the quota of the most restrictive throttle of the request,
+    computed from the throttle's own ``history`` (no extra cache read),
+    for :class:`durin.middleware.RateLimitHeadersMiddleware`.
+
+    .. versionadded:: 1.2.0
+    """
+    remaining = max(num_requests - len(history), 0)
+    reset = duration - (now - history[-1]) if history else duration
+    http_request = getattr(request, "_request", request)
+    current = getattr(http_request, "_durin_rate_limit", None)
+    if current is None or remaining < current[1]:
+        http_request._durin_rate_limit = (
+            num_requests,
+            remaining,
+            int(math.ceil(reset)),
+        )
 
 
 class UserClientRateThrottle(UserRateThrottle):  # lgtm [py/missing-call-to-init]
@@ -36,6 +76,8 @@ class UserClientRateThrottle(UserRateThrottle):  # lgtm [py/missing-call-to-init
     .. versionadded:: 0.2
     """
 
+    cache = durin_cache
+
     #: Same as the default
     cache_format = "throttle_%(scope)s_%(ident)s"
 
@@ -59,7 +101,12 @@ class UserClientRateThrottle(UserRateThrottle):  # lgtm [py/missing-call-to-init
 
         self.num_requests, self.duration = self.parse_rate(self.rate)
 
-        return super().allow_request(request, view)
+        allowed = super().allow_request(request, view)
+        if hasattr(self, "history"):
+            record_rate_limit(
+                request, self.num_requests, self.duration, self.history, self.now
+            )
+        return allowed
 
     def get_cache_key(self, request, view) -> str:
         if request.user.is_authenticated:
@@ -83,20 +130,550 @@ class UserClientRateThrottle(UserRateThrottle):  # lgtm [py/missing-call-to-init
         ident = "user-{0}.client-{1}".format(user_pk, client_pk)
         return ident
 
+    #: Kept for the migrations referencing it,
+    #: see :func:`durin.models.validate_client_throttle_rate`.
+    validate_client_throttle_rate = staticmethod(validate_client_throttle_rate)
+
+
+class PreAuthTokenRateThrottle(SimpleRateThrottle):
+    """
+    Throttles requests by the token they present, *before* it is looked up
+    in the database. Requests without a token are identified by their IP address.
+
+    Since DRF checks throttles only after authentication, this class isn't meant
+    for ``DEFAULT_THROTTLE_CLASSES`` but for the ``PRE_AUTH_THROTTLE_CLASS`` setting,
+    which :class:`durin.auth.TokenAuthentication` checks (using only the cache)
+    before hitting the database. Over-limit requests get a ``429`` response
+    with a ``Retry-After`` header.
+
+    Example ``settings.py``::
+
+        #...snip...
+        REST_FRAMEWORK = {
+            "DEFAULT_THROTTLE_RATES": {"pre_auth_token": "100/s"},
+        }
+        REST_DURIN = {
+            "PRE_AUTH_THROTTLE_CLASS": "durin.throttling.PreAuthTokenRateThrottle",
+        }
+        #...snip...
+
+    .. versionadded:: 1.2.0
+    """
+
+    cache = durin_cache
+
+    #: Scope for this throttle
+    scope = "pre_auth_token"
+
+    def allow_request(self, request, view):
+        allowed = super().allow_request(request, view)
+        if hasattr(self, "history"):
+            record_rate_limit(
+                request, self.num_requests, self.duration, self.history, self.now
+            )
+        return allowed
+
+    def get_cache_key(self, request, view) -> str:
+        token = self._get_presented_token(request)
+        if token:
+            # don't store the tokens themselves as cache keys
+            ident = "token-{0}".format(hashlib.sha256(token).hexdigest())
+        else:
+            ident = self.get_ident(request)
+
+        return self.cache_format % {"scope": self.scope, "ident": ident}
+
     @staticmethod
-    def validate_client_throttle_rate(rate):
+    def _get_presented_token(request) -> bytes:
+        """
+        The token string from the ``Authorization`` header, if any.
+        """
+        auth = get_authorization_header(request).split()
+        prefix = durin_settings.AUTH_HEADER_PREFIX.encode()
+        if len(auth) == 2 and auth[0].lower() == prefix.lower():
+            return auth[1]
+        return None
+
+
+class CompositeRateThrottle(SimpleRateThrottle):  # lgtm [py/missing-call-to-init]
+    """
+    Evaluates several throttling policies at once, in a single
+    ``cache.get_many`` and ``cache.set_many`` round trip
+    (instead of a ``get`` and a ``set`` per throttle class):
+
+    - ``"user_per_client"``: the *authed* **user-client pair**,
+      same as :class:`UserClientRateThrottle`.
+    - ``"client"``: all the requests authed with the same
+      :class:`durin.models.Client`, if a rate is set for this scope.
+    - the view's ``throttle_scope``, same as DRF's ``ScopedRateThrottle``.
+
+    A request is allowed only if all policies allow it,
+    and then it is counted by each of them.
+
+    Example ``settings.py``::
+
+        #...snip...
+        REST_FRAMEWORK = {
+            "DEFAULT_THROTTLE_CLASSES": ["durin.throttling.CompositeRateThrottle"],
+            "DEFAULT_THROTTLE_RATES": {
+                "user_per_client": "10/min",
+                "client": "1000/min",
+                "uploads": "5/hour",
+            },
+        }
+        #...snip...
+
+    Override :py:meth:`get_policies` to add your own.
+
+    .. versionadded:: 1.2.0
+    """
+
+    cache = durin_cache
+
+    def __init__(self):
+        # lgtm [py/missing-call-to-init]
+        self.waits = []
+
+    def get_policies(self, request, view) -> list:
+        """
+        List of ``(scope, ident, rate)`` tuples to evaluate for the request.
+        Policies without a rate are skipped.
+        """
+        if request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+
+        policies = []
+        if request.user.is_authenticated and hasattr(request, "_auth"):
+            client = request._auth.client
+            user_client_ident = "user-{0}.client-{1}".format(ident, client.pk)
+            rate = client.throttle_rate or self.get_scope_rate("user_per_client")
+            policies.append(("user_per_client", user_client_ident, rate))
+            policies.append(
+                (
+                    "client",
+                    "client-{0}".format(client.pk),
+                    self.get_scope_rate("client"),
+                )
+            )
+        else:
+            policies.append(
+                ("user_per_client", ident, self.get_scope_rate("user_per_client"))
+            )
+
+        view_scope = getattr(view, "throttle_scope", None)
+        if view_scope:
+            policies.append((view_scope, ident, self.get_scope_rate(view_scope)))
+
+        return [policy for policy in policies if policy[2]]
+
+    def get_scope_rate(self, scope) -> str:
+        """
+        Rate set for the given scope in ``DEFAULT_THROTTLE_RATES``, if any.
+        """
+        return self.THROTTLE_RATES.get(scope)
+
+    def allow_request(self, request, view):
+        limits = {}
+        for scope, ident, rate in self.get_policies(request, view):
+            key = self.cache_format % {"scope": scope, "ident": ident}
+            limits[key] = self.parse_rate(rate)
+        if not limits:
+            return True
+
+        histories = self.cache.get_many(list(limits))
+        self.now = self.timer()
+        self.waits = []
+        for key, (num_requests, duration) in limits.items():
+            history = histories.get(key, [])
+            # drop any requests which have now passed the throttle duration
+            while history and history[-1] <= self.now - duration:
+                history.pop()
+            if len(history) >= num_requests:
+                self.waits.append(duration - (self.now - history[-1]))
+            histories[key] = history
+
+        allowed = not self.waits
+        if allowed:
+            for history in histories.values():
+                history.insert(0, self.now)
+            timeout = max(duration for _, duration in limits.values())
+            self.cache.set_many(histories, timeout)
+
+        for key, (num_requests, duration) in limits.items():
+            record_rate_limit(request, num_requests, duration, histories[key], self.now)
+        return allowed
+
+    def wait(self):
+        """
+        Seconds until every exceeded policy allows a request again.
+        """
+        return max(self.waits, default=None)
+
+
+class LoginThrottle(BaseThrottle):
+    """
+    Locks out login attempts after repeated failures, *before* the credentials
+    are validated (and the password hashed) by :class:`durin.views.LoginView`.
+
+    Failures are counted (with atomic ``cache.incr``) per **username**
+    and per **IP**, regardless of the (not yet validated) ``client`` of the attempt,
+    so that rotating it doesn't reset the counters.
+    Once either reaches ``LOGIN_THROTTLE_FAILURES``,
+    it is locked out for ``LOGIN_THROTTLE_LOCKOUT`` seconds, doubling with each
+    further failure up to ``LOGIN_THROTTLE_MAX_LOCKOUT``.
+    Locked out attempts are rejected with a ``429`` response at the cost of a
+    single ``cache.get_many``. A successful login resets its username's failures.
+
+    Example ``settings.py``::
+
+        #...snip...
+        REST_DURIN = {
+            "LOGIN_THROTTLE_CLASS": "durin.throttling.LoginThrottle",
+        }
+        #...snip...
+
+    .. versionadded:: 1.2.0
+    """
+
+    cache = durin_cache
+
+    cache_format = "throttle_login_%(ident)s_%(suffix)s"
+
+    def get_idents(self, request) -> list:
+        """
+        Identifiers of the login attempt whose failures are counted.
+        """
+        username = str(request.data.get("username", "")).lower()
+        # don't store the usernames themselves as cache keys
+        username_hash = hashlib.sha256(username.encode()).hexdigest()
+        return [
+            "user-{0}".format(username_hash),
+            "ip-{0}".format(self.get_ident(request)),
+        ]
+
+    def _get_key(self, ident: str, suffix: str) -> str:
+        return self.cache_format % {"ident": ident, "suffix": suffix}
+
+    def check(self, request) -> None:
+        """
+        :raises rest_framework.exceptions.Throttled: if the attempt is locked out.
+        """
+        keys = [self._get_key(ident, "lock") for ident in self.get_idents(request)]
+        now = time.time()
+        wait = max(self.cache.get_many(keys).values(), default=now) - now
+        if wait > 0:
+            raise Throttled(wait)
+
+    def record_failure(self, request) -> None:
+        max_lockout = int(durin_settings.LOGIN_THROTTLE_MAX_LOCKOUT)
+        threshold = int(durin_settings.LOGIN_THROTTLE_FAILURES)
+        for ident in self.get_idents(request):
+            key = self._get_key(ident, "failures")
+            try:
+                failures = self.cache.incr(key)
+            except ValueError:
+                failures = 1
+                if not self.cache.add(key, failures, max_lockout):
+                    failures = self.cache.incr(key)
+            if failures >= threshold:
+                lockout = min(
+                    int(durin_settings.LOGIN_THROTTLE_LOCKOUT)
+                    * 2 ** (failures - threshold),
+                    max_lockout,
+                )
+                self.cache.set(
+                    self._get_key(ident, "lock"), time.time() + lockout, lockout
+                )
+
+    def record_success(self, request) -> None:
+        ident = self.get_idents(request)[0]
+        self.cache.delete_many(
+            [self._get_key(ident, "failures"), self._get_key(ident, "lock")]
+        )
+
+
+class ClientConcurrencyThrottle(BaseThrottle):
+    """
+    Limits the number of concurrent (in-flight) requests authed with a
+    :class:`durin.models.Client` to its ``max_concurrent_requests``,
+    so that a single client can't monopolize the workers with slow requests.
+    Excess requests fail fast with a ``429`` response.
+
+    The requests in flight are counted per client and per period of
+    ``CONCURRENCY_LEASE_TIMEOUT`` seconds, with atomic ``cache.incr``/``cache.decr``
+    calls on the counter of the period they started in. A request takes a slot
+    if the counts of the current and the previous period, which it incremented,
+    don't exceed the limit, and otherwise gives it back at once. Slots are
+    released by :class:`durin.middleware.ConcurrencyLimitMiddleware` once
+    the response is returned.
+
+    So a slot which is never released (e.g. if the worker crashed) stops
+    counting after one to two lease timeouts, however busy the client is.
+
+    Example ``settings.py``::
+
+        #...snip...
+        MIDDLEWARE = [
+            #...snip...
+            "durin.middleware.ConcurrencyLimitMiddleware",
+        ]
+        REST_FRAMEWORK = {
+            "DEFAULT_THROTTLE_CLASSES": ["durin.throttling.ClientConcurrencyThrottle"],
+        }
+        #...snip...
+
+    .. versionadded:: 1.2.0
+    """
+
+    cache = durin_cache
+
+    cache_format = "throttle_concurrency_client-%(client)s_period-%(period)s"
+
+    def allow_request(self, request, view):
+        if not (request.user.is_authenticated and hasattr(request, "_auth")):
+            return True
+        client = request._auth.client
+        if client.max_concurrent_requests is None:
+            return True
+
+        leases = getattr(request._request, "_durin_concurrency_leases", None)
+        if leases is None:
+            raise ImproperlyConfigured(
+                "`ClientConcurrencyThrottle` requires "
+                "`durin.middleware.ConcurrencyLimitMiddleware` in `MIDDLEWARE`."
+            )
+
+        lease_timeout = float(durin_settings.CONCURRENCY_LEASE_TIMEOUT)
+        period = int(time.time() // lease_timeout)
+        key = self.cache_format % {"client": client.pk, "period": period}
+        previous_key = self.cache_format % {"client": client.pk, "period": period - 1}
+        # counted until the end of the next period
+        timeout = int(lease_timeout * 2) + 1
+        if self.cache.add(key, 1, timeout):
+            count = 1
+        else:
+            try:
+                count = self.cache.incr(key)
+            except ValueError:
+                # the counter was evicted in the meantime
+                self.cache.add(key, 0, timeout)
+                count = self.cache.incr(key)
+        count += max(self.cache.get(previous_key, 0), 0)
+        if count > client.max_concurrent_requests:
+            self._release(key)
+            return False
+        leases.append(key)
+        return True
+
+    @classmethod
+    def _release(cls, key: str) -> None:
+        try:
+            count = cls.cache.decr(key)
+        except ValueError:
+            # the period of the request is over, it doesn't count anymore
+            return
+        if count < 0:
+            # released after the counter was evicted and recreated
+            cls.cache.delete(key)
+
+    @classmethod
+    def release(cls, leases: list) -> None:
+        """
+        Releases the slots held by a request.
+        """
+        for key in leases:
+            cls._release(key)
+
+
+class LoadMonitor:
+    """
+    Cheap sliding aggregate of the latency and error rate of recent requests,
+    shared by all processes through the cache.
+
+    Requests are counted in ``num_buckets`` buckets covering
+    ``ADAPTIVE_THROTTLE_WINDOW`` seconds, each one holding three counters
+    (requests, errors and total latency) updated with atomic ``cache.incr``.
+    They are recorded by :class:`durin.middleware.LoadMonitorMiddleware`.
+
+    Each process aggregates the requests it serves in memory and adds them
+    to the counters every ``flush_every`` requests or ``flush_interval`` seconds,
+    whichever comes first, so that requests don't cost any cache call.
+
+    .. versionadded:: 1.2.0
+    """
+
+    cache = durin_cache
+
+    cache_format = "durin_load_%(bucket)s_%(metric)s"
+
+    #: Number of buckets the window is split into.
+    num_buckets = 6
+
+    #: Minimum number of requests in the window before the service
+    #: can be considered degraded.
+    min_requests = 20
+
+    #: Seconds during which a computed degradation is reused by a process.
+    degradation_cache_timeout = 1
+
+    #: Number of requests recorded by a process before it flushes them.
+    flush_every = 100
+
+    #: Seconds after which a process flushes the requests it recorded
+    #: (on the next one).
+    flush_interval = 1
+
+    _degradation = (0, 1.0)
+
+    _lock = threading.Lock()
+
+    #: ``{bucket: [requests, errors, latency_ms]}`` not flushed yet.
+    _pending = {}
+    _pending_requests = 0
+    _flushed_at = 0
+
+    @classmethod
+    def _get_bucket_keys(cls, bucket: int) -> dict:
+        return {
+            metric: cls.cache_format % {"bucket": bucket, "metric": metric}
+            for metric in ("requests", "errors", "latency_ms")
+        }
+
+    @classmethod
+    def _get_current_bucket(cls) -> int:
+        window = int(durin_settings.ADAPTIVE_THROTTLE_WINDOW)
+        return int(time.time() * cls.num_buckets // window)
+
+    @classmethod
+    def record(cls, latency: float, error: bool) -> None:
+        """
+        Records a request which took ``latency`` seconds.
         """
-        Used for validating the :attr:`throttle_rate` field
-        on :class:`durin.models.Client`.
+        bucket = cls._get_current_bucket()
+        with cls._lock:
+            counts = cls._pending.setdefault(bucket, [0, 0, 0])
+            counts[0] += 1
+            counts[1] += int(error)
+            counts[2] += int(latency * 1000)
+            cls._pending_requests += 1
+            if (
+                cls._pending_requests < cls.flush_every
+                and time.monotonic() - cls._flushed_at < cls.flush_interval
+            ):
+                return
+            pending = cls._take_pending()
+        cls._write(pending)
 
-        *For internal use only.*
+    @classmethod
+    def flush(cls) -> None:
         """
-        TIME_PERIODS_MAP = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+        Adds the requests recorded by this process to the shared counters.
+        """
+        with cls._lock:
+            pending = cls._take_pending()
+        cls._write(pending)
+
+    @classmethod
+    def _take_pending(cls) -> dict:
+        pending = cls._pending
+        cls._pending = {}
+        cls._pending_requests = 0
+        cls._flushed_at = time.monotonic()
+        return pending
 
+    @classmethod
+    def _write(cls, pending: dict) -> None:
+        for bucket, (requests, errors, latency_ms) in pending.items():
+            keys = cls._get_bucket_keys(bucket)
+            cls._incr(keys["requests"], requests)
+            cls._incr(keys["latency_ms"], latency_ms)
+            if errors:
+                cls._incr(keys["errors"], errors)
+
+    @classmethod
+    def _incr(cls, key: str, delta: int) -> None:
         try:
-            num, period = rate.split("/")
-            return int(num), TIME_PERIODS_MAP[period]
-        except KeyError:
-            raise DjValidationError("invalid period '{0}'.".format(period))
-        except Exception as e:
-            raise DjValidationError(e)
+            cls.cache.incr(key, delta)
+        except ValueError:
+            # the bucket is only kept as long as the window covers it
+            timeout = int(durin_settings.ADAPTIVE_THROTTLE_WINDOW) * 2
+            if not cls.cache.add(key, delta, timeout):
+                cls.cache.incr(key, delta)
+
+    @classmethod
+    def get_stats(cls) -> tuple:
+        """
+        Returns the ``(num_requests, average_latency, error_rate)``
+        of the requests in the window, as flushed by all processes.
+        """
+        current = cls._get_current_bucket()
+        buckets = [cls._get_bucket_keys(current - i) for i in range(cls.num_buckets)]
+        values = cls.cache.get_many([key for keys in buckets for key in keys.values()])
+        totals = {
+            metric: sum(values.get(keys[metric], 0) for keys in buckets)
+            for metric in ("requests", "errors", "latency_ms")
+        }
+        num_requests = totals["requests"]
+        if not num_requests:
+            return (0, 0.0, 0.0)
+        return (
+            num_requests,
+            totals["latency_ms"] / 1000 / num_requests,
+            totals["errors"] / num_requests,
+        )
+
+    @classmethod
+    def get_degradation(cls) -> float:
+        """
+        How far the service is from its targets: the highest of
+        ``average_latency / ADAPTIVE_THROTTLE_LATENCY_TARGET`` and
+        ``error_rate / ADAPTIVE_THROTTLE_ERROR_RATE_TARGET``, or ``1.0``
+        if it's within them.
+        """
+        expires_at, degradation = cls._degradation
+        now = time.monotonic()
+        if now < expires_at:
+            return degradation
+        num_requests, latency, error_rate = cls.get_stats()
+        degradation = 1.0
+        if num_requests >= cls.min_requests:
+            degradation = max(
+                degradation,
+                latency / float(durin_settings.ADAPTIVE_THROTTLE_LATENCY_TARGET),
+                error_rate / float(durin_settings.ADAPTIVE_THROTTLE_ERROR_RATE_TARGET),
+            )
+        cls._degradation = (now + cls.degradation_cache_timeout, degradation)
+        return degradation
+
+
+class AdaptiveUserClientRateThrottle(UserClientRateThrottle):
+    """
+    Same as :class:`UserClientRateThrottle`, but scales the rates down
+    while the service is degraded (see :py:meth:`LoadMonitor.get_degradation`),
+    and back up as it recovers.
+
+    The rate of a client with ``priority`` *p* is divided by
+    ``degradation ** (1 / (p + 1))``. So clients with the default priority of ``0``
+    are scaled down the most, while higher priority ones are mostly spared.
+
+    Requires :class:`durin.middleware.LoadMonitorMiddleware` to record
+    the latency and errors of requests.
+
+    .. versionadded:: 1.2.0
+    """
+
+    def allow_request(self, request, view):
+        if request.user.is_authenticated and hasattr(request, "_auth"):
+            priority = request._auth.client.priority
+        else:
+            priority = 0
+        self.scale = LoadMonitor.get_degradation() ** (-1.0 / (priority + 1))
+        return super().allow_request(request, view)
+
+    def parse_rate(self, rate):
+        num_requests, duration = super().parse_rate(rate)
+        if num_requests is not None:
+            num_requests = max(1, int(num_requests * self.scale))
+        return (num_requests, duration)
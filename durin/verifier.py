@@ -0,0 +1,199 @@
+"""
+Durin provides a standalone token verifier for edge proxies, API gateways and
+sidecars, which only need to know whether a request carries a valid token.
+
+It applies the rules of ``VERIFIER_AUTHENTICATION_CLASS``
+(:class:`durin.auth.TokenAuthentication` by default, or
+:class:`durin.auth.CachedTokenAuthentication` to verify tokens from the cache):
+the token lookup, expiry, active user check and ``PRE_AUTH_THROTTLE_CLASS``,
+but without DRF's ``Request``, parsers, content negotiation or view dispatch.
+
+It comes as a Python function (:func:`verify_token`) and as plain WSGI and ASGI
+applications, which answer every request with an empty body and
+
+- ``200``, with the ``X-Durin-User`` (user's primary key) and ``X-Durin-Client``
+  (client's primary key) headers, if the ``Authorization`` header holds a valid token,
+- ``401`` otherwise, or ``429`` (with ``Retry-After``) if throttled.
+
+That's the contract of `nginx's auth_request
+<https://nginx.org/en/docs/http/ngx_http_auth_request_module.html>`__
+and similar subrequest-based authentication in other proxies.
+
+Example ``verifier_wsgi.py``::
+
+        import os
+
+        import django
+
+        os.environ.setdefault("DJANGO_SETTINGS_MODULE", "yourproject.settings")
+        django.setup()
+
+        from durin.verifier import TokenVerifierWSGIApp
+
+        application = TokenVerifierWSGIApp()
+
+Then serve it next to your project, e.g. ``gunicorn verifier_wsgi``,
+and point ``auth_request`` to it.
+"""
+
+import math
+
+from django.core import signals
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import exceptions
+
+from durin.settings import durin_settings
+
+# try to import asgiref (installed with Django 3.0+)
+sync_to_async = None
+
+try:
+    from asgiref.sync import sync_to_async
+except ImportError:
+    pass
+
+#: Response header holding the primary key of the token's user.
+USER_HEADER = "X-Durin-User"
+
+#: Response header holding the primary key of the token's client.
+CLIENT_HEADER = "X-Durin-Client"
+
+
+class VerifierRequest:
+    """
+    The bare minimum of a request needed by the authentication class,
+    i.e. the WSGI ``environ`` (or its equivalent) as ``META``.
+
+    .. versionadded:: 1.2.0
+    """
+
+    parser_context = None
+
+    def __init__(self, meta: dict):
+        self.META = meta
+
+
+def get_authentication_class():
+    return durin_settings.VERIFIER_AUTHENTICATION_CLASS
+
+
+def verify_token(token) -> tuple:
+    """
+    Verifies the given token (``str`` or ``bytes``, without the header prefix)
+    and returns the ``(user, auth_token)`` tuple.
+
+    :raises rest_framework.exceptions.AuthenticationFailed
+
+    .. versionadded:: 1.2.0
+    """
+    if isinstance(token, str):
+        token = token.encode("utf-8")
+    return get_authentication_class().authenticate_credentials(token)
+
+
+def verify_request_meta(meta: dict):
+    """
+    Verifies the ``Authorization`` header of a request given its ``META``
+    and returns the ``(user, auth_token)`` tuple,
+    or ``None`` if it doesn't carry a token.
+
+    :raises rest_framework.exceptions.AuthenticationFailed
+    :raises rest_framework.exceptions.Throttled
+
+    .. versionadded:: 1.2.0
+    """
+    return get_authentication_class()().authenticate(VerifierRequest(meta))
+
+
+def get_verification_response(meta: dict) -> tuple:
+    """
+    Returns the ``(status, headers)`` of the response to a request given its ``META``.
+
+    .. versionadded:: 1.2.0
+    """
+    try:
+        result = verify_request_meta(meta)
+    except exceptions.Throttled as e:
+        headers = []
+        if e.wait is not None:
+            headers.append(("Retry-After", str(math.ceil(e.wait))))
+        return "429 Too Many Requests", headers
+    except exceptions.AuthenticationFailed:
+        result = None
+    if result is None:
+        return "401 Unauthorized", [
+            ("WWW-Authenticate", durin_settings.AUTH_HEADER_PREFIX)
+        ]
+    user, auth_token = result
+    return "200 OK", [
+        (USER_HEADER, str(user.pk)),
+        (CLIENT_HEADER, str(auth_token.client_id)),
+    ]
+
+
+def _handle(meta: dict, sender) -> tuple:
+    # like Django's handlers, so that database connections are managed
+    signals.request_started.send(sender=sender, environ=meta)
+    try:
+        return get_verification_response(meta)
+    finally:
+        signals.request_finished.send(sender=sender)
+
+
+class TokenVerifierWSGIApp:
+    """
+    WSGI application verifying the token of each request, see :mod:`durin.verifier`.
+
+    .. versionadded:: 1.2.0
+    """
+
+    def __call__(self, environ, start_response):
+        status, headers = _handle(environ, self.__class__)
+        start_response(status, headers + [("Content-Length", "0")])
+        return [b""]
+
+
+class TokenVerifierASGIApp:
+    """
+    ASGI application verifying the token of each request, see :mod:`durin.verifier`.
+
+    The database lookup runs in a thread, through ``asgiref.sync.sync_to_async``.
+
+    .. versionadded:: 1.2.0
+    """
+
+    @staticmethod
+    def get_meta(scope: dict) -> dict:
+        meta = {
+            "REQUEST_METHOD": scope["method"],
+            "PATH_INFO": scope["path"],
+            "REMOTE_ADDR": (scope.get("client") or ("",))[0],
+        }
+        for name, value in scope["headers"]:
+            key = "HTTP_" + name.decode("latin1").upper().replace("-", "_")
+            meta[key] = value.decode("latin1")
+        return meta
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            raise ValueError(
+                "TokenVerifierASGIApp can't handle {0!r} connections.".format(
+                    scope["type"]
+                )
+            )
+        if sync_to_async is None:
+            raise ImproperlyConfigured("TokenVerifierASGIApp requires asgiref.")
+        status, headers = await sync_to_async(_handle, thread_sensitive=True)(
+            self.get_meta(scope), self.__class__
+        )
+        await send(
+            {
+                "type": "http.response.start",
+                "status": int(status.split(" ", 1)[0]),
+                "headers": [
+                    (name.lower().encode("latin1"), value.encode("latin1"))
+                    for name, value in headers + [("Content-Length", "0")]
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": b""})
@@ -1,17 +1,26 @@
+from collections import defaultdict
 from datetime import datetime
 
 from django.contrib.auth.signals import user_logged_in, user_logged_out
+from django.db import router
 from rest_framework import mixins, status
 from rest_framework.authtoken.serializers import AuthTokenSerializer
 from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
 from rest_framework.reverse import reverse
 from rest_framework.serializers import DateTimeField
 from rest_framework.views import APIView
 from rest_framework.viewsets import GenericViewSet
 
+from . import etags, sharding
+from .cache import cache
 from .models import AuthToken, Client
-from .serializers import APIAccessTokenSerializer, TokenSessionsSerializer
+from .serializers import (
+    APIAccessTokenSerializer,
+    TokenIntrospectionSerializer,
+    TokenSessionsSerializer,
+)
 from .settings import durin_settings
 
 
@@ -65,8 +74,10 @@ class LoginView(APIView):
         """
         try:
             # if a token for this user-client pair already exists,
-            # we can just return it
-            token = AuthToken.objects.get(user=request.user, client=client)
+            # we can just return it. It is looked up on the database used for
+            # writes so that a lagging read replica doesn't cause a duplicate.
+            using = router.db_for_write(AuthToken, instance=request.user)
+            token = AuthToken.objects.using(using).get(user=request.user, client=client)
             if durin_settings.REFRESH_TOKEN_ON_LOGIN:
                 self.renew_token(request=request, token=token)
         except AuthToken.DoesNotExist:
@@ -109,8 +120,26 @@ class LoginView(APIView):
             data["user"] = UserSerializer(request.user, context=self.get_context()).data
         return data
 
+    def get_login_throttle(self):
+        """
+        To change the throttle checked before validating the user credentials.
+        Defaults to an instance of ``LOGIN_THROTTLE_CLASS``, if set.
+        """
+        throttle_class = durin_settings.LOGIN_THROTTLE_CLASS
+        return throttle_class() if throttle_class is not None else None
+
     def post(self, request, *args, **kwargs):
-        request.user = self.validate_and_return_user(request)
+        login_throttle = self.get_login_throttle()
+        if login_throttle is not None:
+            login_throttle.check(request)
+        try:
+            request.user = self.validate_and_return_user(request)
+        except ValidationError:
+            if login_throttle is not None:
+                login_throttle.record_failure(request)
+            raise
+        if login_throttle is not None:
+            login_throttle.record_success(request)
         client = self.get_client_obj(request)
         token_obj = self.get_token_obj(request, client)
         user_logged_in.send(
@@ -217,12 +246,64 @@ class TokenSessionsViewSet(
         qs = super().get_queryset()
         # filter against authed user
         qs = qs.filter(user=self.request.user)
+        if sharding.is_enabled():
+            # tokens live on the user's shard but clients on the primary,
+            # so they can't be joined in the same query
+            qs = (
+                qs.using(sharding.get_shard_for_user(self.request.user.pk))
+                .select_related(None)
+                .prefetch_related("client")
+            )
         # exclude session for the APIAccess session
         # if `API_ACCESS_EXCLUDE_FROM_SESSIONS` setting is True
         if durin_settings.API_ACCESS_EXCLUDE_FROM_SESSIONS:
-            qs = qs.exclude(client__name=durin_settings.API_ACCESS_CLIENT_NAME)
+            client_name = durin_settings.API_ACCESS_CLIENT_NAME
+            if sharding.is_enabled():
+                qs = qs.exclude(
+                    client__in=list(Client.objects.filter(name=client_name))
+                )
+            else:
+                qs = qs.exclude(client__name=client_name)
         return qs
 
+    def get_etag_ident(self) -> str:
+        """
+        Identifies the representation of the list in its ``ETag``,
+        i.e. the token the request is authed with (see ``is_current``).
+        Overwrite if the list varies by anything else, e.g. pagination.
+
+        .. versionadded:: 1.2.0
+        """
+        return "sessions-{0}".format(self.request.auth.pk)
+
+    def list(self, request, *args, **kwargs):
+        """
+        Overwritten to answer conditional requests, see :mod:`durin.etags`.
+
+        .. versionadded:: 1.2.0
+        """
+        version = etags.get_user_version(request.user.pk)
+        ident = self.get_etag_ident()
+        etag = etags.get_matching_etag(request, version, ident)
+        if etag is not None:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        tokens = list(queryset if page is None else page)
+        serializer = self.get_serializer(tokens, many=True)
+        if page is None:
+            response = Response(serializer.data)
+        else:
+            response = self.get_paginated_response(serializer.data)
+        if version is not None:
+            deadline = min(
+                (token.expiry for token in tokens if not token.has_expired),
+                default=None,
+            )
+            response["ETag"] = etags.make_etag(version, ident, deadline)
+        return response
+
     def perform_destroy(self, instance):
         """
         Overwrite to prevent deletion of object
@@ -267,29 +348,192 @@ class APIAccessTokenView(APIView):
             },
         )
 
+    def get_client(self) -> Client:
+        """
+        Returns the API access :class:`durin.models.Client`, i.e. a lightweight
+        instance holding only its ``pk`` and ``name`` if its primary key is cached,
+        or ``None`` otherwise.
+
+        .. versionadded:: 1.2.0
+        """
+        pk = cache.get(Client.get_pk_cache_key(self.client_name))
+        if pk is None:
+            return None
+        return Client(pk=pk, name=self.client_name)
+
+    def set_client(self, client: Client) -> None:
+        """
+        Caches the primary key of the API access :class:`durin.models.Client`
+        for ``TOKEN_CACHE_TIMEOUT`` seconds.
+
+        It's invalidated when the client is saved or deleted. Changes which
+        bypass ``Client.save()`` and ``Client.delete()`` are detected by
+        :py:meth:`get_object` if the cached client no longer exists,
+        or otherwise picked up once the cache entry expires.
+
+        .. versionadded:: 1.2.0
+        """
+        cache.set(
+            Client.get_pk_cache_key(client.name),
+            client.pk,
+            int(durin_settings.TOKEN_CACHE_TIMEOUT),
+        )
+
     def get_object(self):
+        client = self.get_client()
         try:
-            instance = AuthToken.objects.get(
-                user__pk=self.request.user.pk,
-                client__name=self.client_name,
-            )
-        except AuthToken.DoesNotExist:
+            if client is not None:
+                try:
+                    return self._get_object(client)
+                except AuthToken.DoesNotExist:
+                    # the cached client may have been deleted (e.g. in bulk)
+                    # and recreated, look it up again
+                    if Client.objects.filter(pk=client.pk).exists():
+                        raise
+                    cache.delete(Client.get_pk_cache_key(self.client_name))
+            return self._get_object(None)
+        except (AuthToken.DoesNotExist, Client.DoesNotExist):
             raise NotFound()
 
+    def _get_object(self, client):
+        user_pk = self.request.user.pk
+        if client is None and not sharding.is_enabled():
+            instance = AuthToken.objects.select_related("client").get(
+                user__pk=user_pk,
+                client__name=self.client_name,
+            )
+            self.set_client(instance.client)
+            return instance
+        if client is None:
+            # clients can't be joined with tokens on the shards
+            client = Client.objects.get(name=self.client_name)
+            self.set_client(client)
+        # indexed lookup of the user-client pair, on the user's shard (if any)
+        instance = AuthToken.objects.db_manager(
+            sharding.get_shard_for_user(user_pk)
+        ).get(user_id=user_pk, client_id=client.pk)
+        instance.client = client
         return instance
 
     def get(self, request, *args, **kwargs):
+        # answer conditional requests, see :mod:`durin.etags`
+        version = etags.get_user_version(request.user.pk)
+        etag = etags.get_matching_etag(request, version, "apiaccess")
+        if etag is not None:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
         instance = self.get_object()
         serializer = self.get_serializer(instance)
-        return Response(serializer.data)
+        response = Response(serializer.data)
+        if version is not None:
+            deadline = None if instance.has_expired else instance.expiry
+            response["ETag"] = etags.make_etag(version, "apiaccess", deadline)
+        return response
 
     def post(self, request):
+        # the full client is needed for the token's TTL
+        client = Client.objects.get(name=self.client_name)
+        self.set_client(client)
         serializer = self.get_serializer(data={})
         serializer.is_valid(raise_exception=True)
-        serializer.save()
+        serializer.save(client=client)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def delete(self, request):
         instance = self.get_object()
         instance.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class TokenIntrospectionView(APIView):
+    """Durin's TokenIntrospectionView.\n
+    This view accepts only a post request with a list of (at most
+    ``INTROSPECTION_MAX_TOKENS``) tokens, i.e. ``{"tokens": [...]}``,
+    and resolves them all in a single query (one per shard if
+    :mod:`durin.sharding` is enabled) so that API gateways and internal services
+    can validate tokens in batches.
+
+    It responds with a JSON object containing a ``tokens`` list, in the same order,
+    of ``{"token", "active", "user", "client", "expiry"}`` objects. ``active`` is
+    ``True`` if the token exists, hasn't expired and its user is active.
+    Unknown tokens are reported as ``{"token", "active": false}`` only.
+
+    Expired tokens aren't deleted by this view.
+
+    Only admin users (``is_staff``) may use it by default. Set ``permission_classes``
+    in a subclass, e.g. to a :class:`durin.permissions.AllowSpecificClients`
+    subclass, to allow the tokens of your internal services' clients instead.
+
+    It isn't routed by ``durin.urls``, see :doc:`urls`.
+
+    .. versionadded:: 1.2.0
+    """
+
+    permission_classes = (IsAdminUser,)
+
+    @staticmethod
+    def format_expiry_datetime(expiry: "datetime") -> str:
+        """
+        To format the expiry ``datetime`` object at your convenience.
+        """
+        datetime_format = durin_settings.EXPIRY_DATETIME_FORMAT
+        return DateTimeField(format=datetime_format).to_representation(expiry)
+
+    @staticmethod
+    def get_auth_tokens(tokens: list) -> dict:
+        """
+        Returns a dict of the :class:`durin.models.AuthToken` instances
+        (with their user and client) found for the given tokens, keyed by token.
+        """
+        fields = ("token", "expiry", "user", "client")
+        if not sharding.is_enabled():
+            queryset = (
+                AuthToken.objects.filter(token__in=tokens)
+                .select_related("user", "client")
+                .only(*fields, "user__is_active", "client__name")
+            )
+            return {auth_token.token: auth_token for auth_token in queryset}
+
+        tokens_by_shard = defaultdict(list)
+        for token in tokens:
+            shard = sharding.get_shard_for_token(token)
+            if shard is not None:
+                tokens_by_shard[shard].append(token)
+        auth_tokens = {}
+        for shard, shard_tokens in tokens_by_shard.items():
+            # related rows live on the primary, so they can't be joined
+            queryset = (
+                AuthToken.objects.using(shard)
+                .filter(token__in=shard_tokens)
+                .only(*fields)
+                .prefetch_related("user", "client")
+            )
+            auth_tokens.update(
+                (auth_token.token, auth_token) for auth_token in queryset
+            )
+        return auth_tokens
+
+    def get_token_data(self, auth_token: "AuthToken") -> dict:
+        """
+        Override this to return a customized object per token.
+        """
+        return {
+            "token": auth_token.token,
+            "active": auth_token.user.is_active and not auth_token.has_expired,
+            "user": auth_token.user_id,
+            "client": auth_token.client.name,
+            "expiry": self.format_expiry_datetime(auth_token.expiry),
+        }
+
+    def post(self, request, *args, **kwargs):
+        serializer = TokenIntrospectionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        tokens = serializer.validated_data["tokens"]
+        auth_tokens = self.get_auth_tokens(list(set(tokens)))
+        data = [
+            self.get_token_data(auth_tokens[token])
+            if token in auth_tokens
+            else {"token": token, "active": False}
+            for token in tokens
+        ]
+        return Response({"tokens": data}, status=status.HTTP_200_OK)
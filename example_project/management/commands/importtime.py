@@ -0,0 +1,131 @@
+"""
+Import-time benchmark of durin's modules.
+
+Imports durin's modules in fresh interpreters started with
+``python -X importtime`` (after ``django.setup()``, like a worker boot)
+and reports the median time spent importing durin, including
+the modules it is the first to import (e.g. optional dependencies).
+
+Usage::
+
+    $ python manage.py importtime --repeat 10 --budget 100
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+#: Modules imported after ``django.setup()`` (which already imports ``durin.models``).
+DEFAULT_MODULES = (
+    "durin.auth",
+    "durin.serializers",
+    "durin.views",
+    "durin.urls",
+)
+
+
+def parse_importtime(output):
+    """
+    Parses the ``-X importtime`` output into a list of
+    ``(module, self_us, cumulative_us, level)`` tuples, in import order.
+    """
+    entries = []
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = line.split(":", 1)[1].split("|")
+        if not self_us.strip().isdigit():
+            # header
+            continue
+        level = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((name.strip(), int(self_us), int(cumulative_us), level))
+    return entries
+
+
+def measure_import_times(modules=DEFAULT_MODULES):
+    """
+    Runs ``django.setup()`` and imports ``modules`` in a fresh interpreter,
+    returns the parsed ``-X importtime`` output of the whole process.
+    """
+    env = dict(os.environ)
+    env.setdefault("DJANGO_SETTINGS_MODULE", "example_project.settings")
+    code = "import django; django.setup(); " + "; ".join(
+        "import {0}".format(module) for module in modules
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        env=env,
+        universal_newlines=True,
+        check=True,
+    )
+    return parse_importtime(result.stderr)
+
+
+def get_durin_times(entries):
+    """
+    Returns ``{module: cumulative_us}`` of the outermost durin modules, i.e.
+    the time spent importing durin, including the modules it is the first to import.
+    """
+    times = {}
+    parents = []
+    # -X importtime lists the modules after their own imports
+    for name, _, cumulative_us, level in reversed(entries):
+        while parents and parents[-1][1] >= level:
+            parents.pop()
+        is_durin = name == "durin" or name.startswith("durin.")
+        if is_durin and not any(parent.startswith("durin") for parent, _ in parents):
+            times[name] = cumulative_us
+        parents.append((name, level))
+    return times
+
+
+class Command(BaseCommand):
+    help = "Reports the import time of durin's modules."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "modules",
+            nargs="*",
+            default=DEFAULT_MODULES,
+            help="Modules to import (default: {0}).".format(", ".join(DEFAULT_MODULES)),
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=5,
+            help="Number of fresh interpreters to take the median over.",
+        )
+        parser.add_argument(
+            "--budget",
+            type=float,
+            default=None,
+            help="Fail if importing durin takes more milliseconds.",
+        )
+
+    def handle(self, *args, **options):
+        runs = [
+            get_durin_times(measure_import_times(options["modules"]))
+            for _ in range(max(options["repeat"], 1))
+        ]
+        times = {
+            name: statistics.median(run.get(name, 0) for run in runs)
+            for name in set().union(*runs)
+        }
+        for name, cumulative_us in sorted(
+            times.items(), key=lambda item: item[1], reverse=True
+        ):
+            self.stdout.write("{0:>10.2f} ms  {1}".format(cumulative_us / 1000, name))
+
+        total_ms = statistics.median(sum(run.values()) for run in runs) / 1000
+        self.stdout.write("{0:>10.2f} ms  total".format(total_ms))
+        if options["budget"] is not None and total_ms > options["budget"]:
+            raise CommandError(
+                "Importing durin took {0:.2f} ms, "
+                "over the budget of {1:.2f} ms.".format(total_ms, options["budget"])
+            )
+        self.stdout.write(self.style.SUCCESS("OK"))
@@ -0,0 +1,272 @@
+"""
+End-to-end load test of durin's auth stack as served by ``example_project``.
+
+Boots the project in-process against a throwaway database, then drives
+a mix of logins, authenticated requests, refreshes and logouts
+from concurrent workers (one user each) and reports, per endpoint,
+the throughput, latency percentiles and database queries per request.
+
+Usage::
+
+    $ python manage.py loadtest --concurrency 8 --duration 30
+"""
+
+import bisect
+import itertools
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from durin.models import Client
+
+#: ``(action, weight)`` pairs of the default traffic mix.
+DEFAULT_MIX = (
+    ("login", 1),
+    ("root", 10),
+    ("cached", 10),
+    ("throttled", 3),
+    ("refresh", 1),
+    ("logout", 1),
+)
+
+PASSWORD = "loadtest-password"
+CLIENT_NAME = "loadtest-client"
+
+
+def percentile(sorted_values, pct):
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+class QueryCounter:
+    """
+    ``connection.execute_wrapper`` which counts executed queries.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Worker(threading.Thread):
+    """
+    A virtual user making weighted random requests until ``deadline``.
+    """
+
+    def __init__(self, username, mix, deadline, seed):
+        super().__init__(daemon=True)
+        self.username = username
+        self.actions = [action for action, weight in mix if weight > 0]
+        self.cum_weights = list(
+            itertools.accumulate(weight for _, weight in mix if weight > 0)
+        )
+        self.deadline = deadline
+        self.random = random.Random(seed)
+        self.client = APIClient()
+        self.token = None
+        #: action -> list of ``(latency_seconds, num_queries, status_code)``
+        self.samples = defaultdict(list)
+
+    def choose_action(self) -> str:
+        point = self.random.random() * self.cum_weights[-1]
+        return self.actions[bisect.bisect(self.cum_weights, point)]
+
+    def login(self):
+        resp = self.client.post(
+            reverse("durin_login"),
+            {"username": self.username, "password": PASSWORD, "client": CLIENT_NAME},
+            format="json",
+        )
+        if resp.status_code == 200:
+            self.token = resp.data["token"]
+            self.client.credentials(HTTP_AUTHORIZATION="Token %s" % self.token)
+        return resp
+
+    def logout(self):
+        resp = self.client.post(reverse("durin_logout"))
+        self.token = None
+        self.client.credentials()
+        return resp
+
+    def request(self, action):
+        if action == "login":
+            return self.login()
+        if action == "logout":
+            return self.logout()
+        if action == "refresh":
+            return self.client.post(reverse("durin_refresh"))
+        url_name = {
+            "root": "api-root",
+            "cached": "cached-auth-api",
+            "throttled": "throttled-api",
+        }[action]
+        return self.client.get(reverse(url_name))
+
+    def run(self):
+        try:
+            while time.perf_counter() < self.deadline:
+                action = self.choose_action()
+                if self.token is None and action != "login":
+                    action = "login"
+                counter = QueryCounter()
+                with connection.execute_wrapper(counter):
+                    start = time.perf_counter()
+                    resp = self.request(action)
+                    latency = time.perf_counter() - start
+                self.samples[action].append((latency, counter.count, resp.status_code))
+        finally:
+            connection.close()
+
+
+class Command(BaseCommand):
+    help = (
+        "Load tests the example_project's durin endpoints in-process "
+        "against a throwaway database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=4,
+            help="Number of concurrent workers (one user each).",
+        )
+        parser.add_argument(
+            "--duration",
+            type=float,
+            default=10.0,
+            help="Seconds to generate load for.",
+        )
+        parser.add_argument(
+            "--seed", type=int, default=0, help="Seed for the traffic mix."
+        )
+        for action, weight in DEFAULT_MIX:
+            parser.add_argument(
+                "--weight-{0}".format(action),
+                type=int,
+                default=weight,
+                help="Relative weight of '{0}' requests.".format(action),
+            )
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        # expected 4xx responses (e.g. throttled requests) would flood the output
+        logging.getLogger("django.request").setLevel(logging.ERROR)
+        db_file = tempfile.NamedTemporaryFile(suffix=".sqlite3", delete=False).name
+        old_name = self.setup_database(db_file)
+        try:
+            self.setup_data(options["concurrency"])
+            mix = [
+                (action, options["weight_{0}".format(action)])
+                for action, _ in DEFAULT_MIX
+            ]
+            workers, elapsed = self.run_workers(mix, options)
+            self.report(workers, elapsed)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            if os.path.exists(db_file):
+                os.unlink(db_file)
+
+    @staticmethod
+    def setup_database(db_file) -> str:
+        """
+        Creates and migrates a file-based database shared by all worker threads
+        (an in-memory SQLite database can't be written to concurrently).
+        """
+        connection.settings_dict.setdefault("TEST", {})
+        connection.settings_dict["TEST"]["NAME"] = db_file
+        return connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+
+    @staticmethod
+    def setup_data(num_users):
+        Client.objects.create(name=CLIENT_NAME)
+        User = get_user_model()
+        for i in range(num_users):
+            User.objects.create_user("loadtest-{0}".format(i), password=PASSWORD)
+
+    @staticmethod
+    def run_workers(mix, options):
+        concurrency = options["concurrency"]
+        start = time.perf_counter()
+        deadline = start + options["duration"]
+        workers = [
+            Worker("loadtest-{0}".format(i), mix, deadline, options["seed"] + i)
+            for i in range(concurrency)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return workers, time.perf_counter() - start
+
+    def report(self, workers, elapsed):
+        samples = defaultdict(list)
+        for worker in workers:
+            for action, action_samples in worker.samples.items():
+                samples[action].extend(action_samples)
+
+        header = "{0:<10} {1:>8} {2:>9} {3:>9} {4:>9} {5:>9} {6:>9}  {7}".format(
+            "endpoint",
+            "requests",
+            "req/s",
+            "p50 ms",
+            "p95 ms",
+            "p99 ms",
+            "queries",
+            "status codes",
+        )
+        self.stdout.write(header)
+        self.stdout.write("-" * len(header))
+        total = 0
+        for action, _ in DEFAULT_MIX:
+            if not samples[action]:
+                continue
+            latencies = sorted(latency * 1000 for latency, _, _ in samples[action])
+            queries = sum(count for _, count, _ in samples[action])
+            statuses = Counter(status for _, _, status in samples[action])
+            total += len(latencies)
+            self.stdout.write(
+                "{0:<10} {1:>8} {2:>9.1f} {3:>9.2f} {4:>9.2f} {5:>9.2f} "
+                "{6:>9.2f}  {7}".format(
+                    action,
+                    len(latencies),
+                    len(latencies) / elapsed,
+                    percentile(latencies, 50),
+                    percentile(latencies, 95),
+                    percentile(latencies, 99),
+                    queries / len(latencies),
+                    ", ".join(
+                        "{0}: {1}".format(status, count)
+                        for status, count in sorted(statuses.items())
+                    ),
+                )
+            )
+        self.stdout.write("-" * len(header))
+        self.stdout.write(
+            self.style.SUCCESS(
+                "{0} requests in {1:.1f}s ({2:.1f} req/s) with {3} workers".format(
+                    total, elapsed, total / elapsed, len(workers)
+                )
+            )
+        )
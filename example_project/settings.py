@@ -15,7 +15,7 @@ INSTALLED_APPS = (
     # extra
     "rest_framework",
     # project apps
-    "durin",
+    "durin.app.DurinConfig",
     "example_project",
 )
 
@@ -25,7 +25,7 @@ REST_FRAMEWORK = {
     "DEFAULT_RENDERER_CLASSES": ["rest_framework.renderers.JSONRenderer"],
     "DEFAULT_AUTHENTICATION_CLASSES": ["durin.auth.TokenAuthentication"],
     "DEFAULT_PERMISSION_CLASSES": ["rest_framework.permissions.IsAuthenticated"],
-    "DEFAULT_THROTTLE_RATES": {"user_per_client": "2/m"},
+    "DEFAULT_THROTTLE_RATES": {"user_per_client": "2/m", "pre_auth_token": "3/m"},
 }
 
 TEST_CLIENT_NAME = "web-browser-client-test"
@@ -67,7 +67,21 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": os.path.join(BASE_DIR, "db.sqlite3"),
-    }
+    },
+    # used by tests of ``durin.routers``
+    "replica": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": os.path.join(BASE_DIR, "db_replica.sqlite3"),
+    },
+    # used by tests of ``durin.sharding``
+    "shard1": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": os.path.join(BASE_DIR, "db_shard1.sqlite3"),
+    },
+    "shard2": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": os.path.join(BASE_DIR, "db_shard2.sqlite3"),
+    },
 }
 
 LANGUAGE_CODE = "en-us"
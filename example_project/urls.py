@@ -2,6 +2,8 @@ from django.contrib import admin
 from django.urls import include, path, re_path
 from django.views.generic.base import RedirectView
 
+from durin.views import TokenIntrospectionView
+
 from .views import (
     CachedRootView,
     NoWebClientView,
@@ -14,6 +16,12 @@ urlpatterns = [
     path("", RedirectView.as_view(url="admin/", permanent=False)),
     path("admin/", admin.site.urls, name="admin"),
     re_path(r"^api/", include("durin.urls")),
+    # opt-in, for internal services
+    path(
+        "api/introspect/",
+        TokenIntrospectionView.as_view(),
+        name="durin_introspect",
+    ),
     re_path(r"^api/$", RootView.as_view(), name="api-root"),
     re_path(r"^api/cached$", CachedRootView.as_view(), name="cached-auth-api"),
     re_path(r"^api/throttled$", ThrottledView.as_view(), name="throttled-api"),
@@ -1,5 +1,8 @@
+from importlib import reload
+
 from django.contrib.auth import get_user_model
 from django.core.cache import cache as default_cache
+from django.test import override_settings
 from rest_framework.test import APITestCase
 
 from durin.models import AuthToken, Client
@@ -37,6 +40,21 @@ class CustomTestCase(APITestCase):
 
         self.client_names = ["web", "mobile", "cli"]
 
+    def override_settings_and_reload(self, *modules, **settings) -> None:
+        """
+        Overrides the given settings until the end of the test, reloading the
+        given modules (which keep the ``durin_settings`` they imported) in order,
+        now and once the settings are restored.
+        """
+        overridden = override_settings(**settings)
+        overridden.enable()
+        # cleanups run in reverse order
+        for module in reversed(modules):
+            self.addCleanup(reload, module)
+        self.addCleanup(overridden.disable)
+        for module in modules:
+            reload(module)
+
     def _create_clients(self) -> None:
         Client.objects.all().delete()
         self.assertEqual(Client.objects.count(), 0)
@@ -1,17 +1,30 @@
+import threading
+import time
+from datetime import timedelta
 from importlib import reload
+from unittest import mock
 
+from django.core.cache import cache
 from django.db import reset_queries
+from django.http import HttpResponse
 from django.test import override_settings
 from django.urls import reverse
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
 from rest_framework.test import APIRequestFactory
 
 from durin import auth
+from durin.middleware import TokenAuthenticationMiddleware
 from durin.models import AuthToken, Client
 from durin.settings import durin_settings
 
 from . import CustomTestCase
 
 root_url = reverse("api-root")
+cached_auth_url = reverse("cached-auth-api")
+login_url = reverse("durin_login")
+refresh_url = reverse("durin_refresh")
 
 new_settings = durin_settings.defaults.copy()
 
@@ -47,6 +60,8 @@ class AuthTestCase(CustomTestCase):
             ):
                 resp = self.client.get(root_url)
                 self.assertEqual(resp.status_code, 200)
+        new_settings["AUTHTOKEN_SELECT_RELATED_LIST"] = ["user"]
+        reload(auth)
 
     def test_update_token_key(self):
         self.assertEqual(AuthToken.objects.count(), 1)
@@ -62,3 +77,240 @@ class AuthTestCase(CustomTestCase):
             auth_token.token,
         )
         self.assertEqual(self.user, auth_user)
+
+    def test_token_cache_warm_up_on_issuance(self):
+        new_settings["TOKEN_CACHE_WARM_UP"] = True
+        with override_settings(REST_DURIN=new_settings):
+            reload(auth)
+            with self.captureOnCommitCallbacks(execute=True):
+                resp = self.client.post(login_url, self.creds2, format="json")
+            self.assertEqual(resp.status_code, 200)
+            self.client.credentials(
+                HTTP_AUTHORIZATION=("Token %s" % resp.data["token"])
+            )
+            with self.assertNumQueries(0, msg="cache was written at login"):
+                resp = self.client.get(cached_auth_url)
+                self.assertEqual(resp.status_code, 200)
+        new_settings["TOKEN_CACHE_WARM_UP"] = False
+        reload(auth)
+
+    def test_token_cache_warm_up_on_renewal(self):
+        new_settings["TOKEN_CACHE_WARM_UP"] = True
+        with override_settings(REST_DURIN=new_settings):
+            reload(auth)
+            with self.captureOnCommitCallbacks(execute=True):
+                resp = self.client.post(refresh_url, {}, format="json")
+            self.assertEqual(resp.status_code, 200)
+            with self.assertNumQueries(0, msg="cache was written at renewal"):
+                resp = self.client.get(cached_auth_url)
+                self.assertEqual(resp.status_code, 200)
+            (_, auth_token) = auth.CachedTokenAuthentication.authenticate_credentials(
+                self.token_instance.token.encode()
+            )
+            self.token_instance.refresh_from_db()
+            self.assertEqual(self.token_instance.expiry, auth_token.expiry)
+        new_settings["TOKEN_CACHE_WARM_UP"] = False
+        reload(auth)
+
+    def test_token_cache_warm_up_respects_expiry(self):
+        new_settings["TOKEN_CACHE_WARM_UP"] = True
+        with override_settings(REST_DURIN=new_settings):
+            reload(auth)
+            with self.captureOnCommitCallbacks(execute=True):
+                instance = AuthToken.objects.create(
+                    self.user2, self.authclient, delta_ttl=timedelta(seconds=0)
+                )
+            self.client.credentials(HTTP_AUTHORIZATION=("Token %s" % instance.token))
+            resp = self.client.get(cached_auth_url)
+            self.assertEqual(resp.status_code, 401, msg="expired token wasn't cached")
+        new_settings["TOKEN_CACHE_WARM_UP"] = False
+        reload(auth)
+
+    def test_token_cache_warm_up_after_commit(self):
+        new_settings["TOKEN_CACHE_WARM_UP"] = True
+        with override_settings(REST_DURIN=new_settings):
+            reload(auth)
+            with self.captureOnCommitCallbacks() as callbacks:
+                instance = AuthToken.objects.create(self.user2, self.authclient)
+            cache_key = self._get_cache_key(instance.token)
+            # so a rolled back token is never cached
+            self.assertIsNone(cache.get(cache_key), msg="not committed yet")
+            for callback in callbacks:
+                callback()
+            self.assertIsNotNone(cache.get(cache_key))
+        new_settings["TOKEN_CACHE_WARM_UP"] = False
+        reload(auth)
+
+    def _get_cache_key(self, token):
+        return auth.CachedTokenAuthentication.get_cache_key(token.encode())
+
+    def test_token_cache_key_hides_token(self):
+        cache_key = self._get_cache_key(self.token_instance.token)
+        self.assertNotIn(self.token_instance.token, cache_key)
+        other_token = AuthToken.objects.create(self.user2, self.authclient)
+        self.assertNotEqual(cache_key, self._get_cache_key(other_token.token))
+
+    def test_token_cache_stores_compact_record(self):
+        resp = self.client.get(cached_auth_url)
+        self.assertEqual(resp.status_code, 200)
+        record = cache.get(self._get_cache_key(self.token_instance.token))
+        self.assertIsInstance(record, tuple)
+        self.assertEqual(auth.CachedTokenAuthentication.cache_record_version, record[0])
+        with self.assertNumQueries(0, msg="user and token are rebuilt from record"):
+            (
+                user,
+                auth_token,
+            ) = auth.CachedTokenAuthentication.authenticate_credentials(
+                self.token_instance.token.encode()
+            )
+            self.assertEqual(self.user.pk, user.pk)
+            self.assertEqual(self.user.username, user.username)
+            self.assertTrue(user.is_active)
+            self.assertEqual(self.token_instance, auth_token)
+            self.assertEqual(self.token_instance.expiry, auth_token.expiry)
+            self.assertEqual(self.authclient.pk, auth_token.client_id)
+            self.assertIs(user, auth_token.user)
+
+    def _cache_expired_record(self):
+        """
+        Caches the record of the token as if it had expired since.
+        """
+        expired = AuthToken.objects.get(pk=self.token_instance.pk)
+        expired.expiry = timezone.now() - timedelta(seconds=1)
+        record = auth.CachedTokenAuthentication.to_cache_record(self.user, expired)
+        cache.set(self._get_cache_key(self.token_instance.token), record)
+
+    def test_token_cache_rejects_expired_record(self):
+        AuthToken.objects.filter(pk=self.token_instance.pk).update(
+            expiry=timezone.now() - timedelta(seconds=1)
+        )
+        self._cache_expired_record()
+        resp = self.client.get(cached_auth_url)
+        self.assertEqual(resp.status_code, 401)
+        self.assertEqual(resp.data, {"detail": "The given token has expired."})
+        self.assertFalse(AuthToken.objects.filter(pk=self.token_instance.pk).exists())
+        self.assertIsNone(cache.get(self._get_cache_key(self.token_instance.token)))
+
+    def test_token_cache_expired_record_of_renewed_token(self):
+        self._cache_expired_record()
+        resp = self.client.get(cached_auth_url)
+        self.assertEqual(resp.status_code, 200, msg="renewed in the database")
+        (_, auth_token) = auth.CachedTokenAuthentication.from_cache_record(
+            cache.get(self._get_cache_key(self.token_instance.token))
+        )
+        self.assertEqual(self.token_instance.expiry, auth_token.expiry)
+
+    def test_token_cache_timeout_is_capped_at_expiry(self):
+        instance = AuthToken.objects.create(
+            self.user2, self.authclient, delta_ttl=timedelta(seconds=10)
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=("Token %s" % instance.token))
+        with mock.patch.object(auth.cache, "set") as cache_set:
+            resp = self.client.get(cached_auth_url)
+        self.assertEqual(resp.status_code, 200)
+        timeout = cache_set.call_args[0][2]
+        self.assertLessEqual(timeout, 10)
+        self.assertLess(timeout, int(durin_settings.TOKEN_CACHE_TIMEOUT))
+
+    def test_token_cache_record_of_other_version_is_recomputed(self):
+        cache_key = self._get_cache_key(self.token_instance.token)
+        cache.set(cache_key, (0, "stale"))
+        with self.assertNumQueries(1):
+            resp = self.client.get(cached_auth_url)
+            self.assertEqual(resp.status_code, 200)
+        record = cache.get(cache_key)
+        self.assertEqual(auth.CachedTokenAuthentication.cache_record_version, record[0])
+
+    def test_token_cache_user_fields(self):
+        new_settings["TOKEN_CACHE_USER_FIELDS"] = ["email"]
+        with override_settings(REST_DURIN=new_settings):
+            reload(auth)
+            self.client.get(cached_auth_url)
+            with self.assertNumQueries(0):
+                (user, _) = auth.CachedTokenAuthentication.authenticate_credentials(
+                    self.token_instance.token.encode()
+                )
+                self.assertEqual(self.user.email, user.email)
+        new_settings["TOKEN_CACHE_USER_FIELDS"] = ()
+        reload(auth)
+
+    def test_token_cache_serves_stale_record_while_locked(self):
+        token = self.token_instance.token.encode()
+        cache_key = self._get_cache_key(self.token_instance.token)
+        self.client.get(cached_auth_url)
+        record = cache.get(cache_key)
+        stale_record = (record[0], time.time() - 1) + record[2:]
+        cache.set(cache_key, stale_record)
+        # another request is already refreshing it
+        cache.add(cache_key + ".lock", True)
+        with self.assertNumQueries(0, msg="stale record is served"):
+            auth.CachedTokenAuthentication.authenticate_credentials(token)
+        self.assertEqual(stale_record, cache.get(cache_key))
+
+        cache.delete(cache_key + ".lock")
+        with self.assertNumQueries(1, msg="stale record is refreshed"):
+            auth.CachedTokenAuthentication.authenticate_credentials(token)
+        self.assertGreater(cache.get(cache_key)[1], time.time())
+        self.assertIsNone(cache.get(cache_key + ".lock"), msg="lock was released")
+
+    def test_token_cache_miss_waits_for_lock_holder(self):
+        token = self.token_instance.token.encode()
+        cache_key = self._get_cache_key(self.token_instance.token)
+        record = auth.CachedTokenAuthentication.to_cache_record(
+            self.user, self.token_instance
+        )
+        # another request is computing the record
+        cache.add(cache_key + ".lock", True)
+        timer = threading.Timer(0.2, cache.set, args=(cache_key, record))
+        timer.start()
+        self.addCleanup(timer.cancel)
+        with self.assertNumQueries(0, msg="record of the lock holder is used"):
+            (user, _) = auth.CachedTokenAuthentication.authenticate_credentials(token)
+        self.assertEqual(self.user.pk, user.pk)
+
+    def test_token_is_authenticated_once_per_request(self):
+        rf = APIRequestFactory()
+        request = rf.get(
+            "/", HTTP_AUTHORIZATION="Token {}".format(self.token_instance.token)
+        )
+        with self.assertNumQueries(1):
+            (user, auth_token) = auth.TokenAuthentication().authenticate(request)
+            # e.g. by another authentication class or a nested view
+            result = auth.CachedTokenAuthentication().authenticate(Request(request))
+        self.assertEqual((user, auth_token), result)
+
+        request = rf.get("/", HTTP_AUTHORIZATION="Token invalid")
+        with self.assertNumQueries(1):
+            for _ in range(2):
+                with self.assertRaises(AuthenticationFailed):
+                    auth.TokenAuthentication().authenticate(request)
+
+    def test_token_authentication_middleware(self):
+        rf = APIRequestFactory()
+
+        def view(request):
+            self.assertEqual(self.user.pk, request.user.pk)
+            self.assertEqual(self.token_instance.pk, request.auth.pk)
+            # and then DRF
+            (user, _) = auth.TokenAuthentication().authenticate(Request(request))
+            self.assertEqual(self.user.pk, user.pk)
+            return HttpResponse()
+
+        request = rf.get(
+            "/", HTTP_AUTHORIZATION="Token {}".format(self.token_instance.token)
+        )
+        with self.assertNumQueries(1):
+            TokenAuthenticationMiddleware(view)(request)
+
+        def anonymous_view(request):
+            self.assertFalse(request.user.is_authenticated)
+            self.assertFalse(request.auth)
+            return HttpResponse()
+
+        request = rf.get("/", HTTP_AUTHORIZATION="Token invalid")
+        TokenAuthenticationMiddleware(anonymous_view)(request)
+
+        request = rf.get("/")
+        request.user = self.user2
+        TokenAuthenticationMiddleware(lambda request: HttpResponse())(request)
+        self.assertEqual(self.user2, request.user, msg="other requests are left as is")
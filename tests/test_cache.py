@@ -0,0 +1,97 @@
+from unittest import mock
+
+from django.urls import reverse
+
+from durin import auth, cache, settings
+from durin.models import AuthToken
+from durin.settings import durin_settings
+
+from . import CustomTestCase
+
+cached_auth_url = reverse("cached-auth-api")
+throttled_view_url = reverse("throttled-api")
+
+new_settings = durin_settings.defaults.copy()
+new_settings["CACHE_CIRCUIT_BREAKER"] = True
+new_settings["CACHE_FAILURE_THRESHOLD"] = 2
+new_settings["CACHE_RECOVERY_TIMEOUT"] = 0
+
+
+class BrokenCache:
+    def __getattr__(self, name):
+        def method(*args, **kwargs):
+            raise ConnectionError("cache is down")
+
+        return method
+
+
+class CircuitBreakerCacheTestCase(CustomTestCase):
+    def setUp(self):
+        self.override_settings_and_reload(auth, REST_DURIN=new_settings)
+        # ``durin.cache`` isn't reloaded, as its ``cache`` is shared by other modules
+        patcher = mock.patch.object(cache, "durin_settings", settings.durin_settings)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        super().setUp()
+        self.breaker = cache.cache
+        self.breaker.reset()
+        self.addCleanup(self.breaker.reset)
+        self.token = AuthToken.objects.create(self.user, self.authclient)
+        self.client.credentials(HTTP_AUTHORIZATION=("Token %s" % self.token.token))
+
+    def _break_cache(self):
+        patcher = mock.patch.object(cache, "caches", {"default": BrokenCache()})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # don't flood the output with the tracebacks of the failed calls
+        logger_patcher = mock.patch.object(cache.logger, "warning")
+        logger_patcher.start()
+        self.addCleanup(logger_patcher.stop)
+        return patcher
+
+    def test_opens_after_failures_and_falls_back_to_db(self):
+        self._break_cache()
+        with mock.patch.object(self.breaker, "_start_probe"):
+            for _ in range(3):
+                resp = self.client.get(cached_auth_url)
+                self.assertEqual(200, resp.status_code, msg="fell back to db")
+            self.assertTrue(self.breaker.is_open)
+
+    def test_throttling_fails_open(self):
+        self._break_cache()
+        with mock.patch.object(self.breaker, "_start_probe"):
+            for _ in range(5):
+                resp = self.client.get(throttled_view_url)
+                self.assertEqual(200, resp.status_code)
+
+    def test_slow_calls_count_as_failures(self):
+        # the settings were already read by the cache calls of ``setUp``
+        with mock.patch.object(
+            cache.durin_settings, "CACHE_LATENCY_BUDGET", -1
+        ), mock.patch.object(self.breaker, "_start_probe"), self.assertLogs(
+            "durin.cache", "WARNING"
+        ) as logs:
+            self.breaker.get("key")
+            self.assertFalse(self.breaker.is_open)
+            self.breaker.get("key")
+            self.assertTrue(self.breaker.is_open)
+        self.assertIn(
+            "cache 'default' bypassed by circuit breaker", "\n".join(logs.output)
+        )
+
+    def test_probe_closes_circuit_once_cache_recovers(self):
+        patcher = self._break_cache()
+        self.breaker.get("key")
+        self.breaker.get("key")
+        self.breaker._probe()
+        self.assertIsNotNone(self.breaker.opened_at, msg="cache is still down")
+
+        patcher.stop()
+        self.breaker._probe()
+        self.assertFalse(self.breaker.is_open)
+
+    def test_missing_key_is_not_a_failure(self):
+        for _ in range(3):
+            with self.assertRaises(ValueError):
+                self.breaker.incr("missing-key")
+        self.assertFalse(self.breaker.is_open)
@@ -1,10 +1,22 @@
+import csv
+import json
+import os
+import subprocess
+import sys
+from datetime import timedelta
 from io import StringIO
+from unittest import mock
 
+from django.conf import settings
 from django.core import management
 from django.core.management import CommandError
-from django.test import TestCase
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
 
-from durin.models import Client
+from durin.management.commands import authtoken_covering_index as covering_index
+from durin.models import AuthToken, Client
+
+from . import CustomTestCase
 
 
 class ClientCommandTestCase(TestCase):
@@ -55,3 +67,190 @@ class ClientCommandTestCase(TestCase):
             ),
         ):
             self.call_command("web", token_ttl="invalid")
+
+
+class ExportTokensCommandTestCase(CustomTestCase):
+    def setUp(self):
+        super().setUp()
+        self.token1 = AuthToken.objects.create(self.user, self.authclient)
+        self.token2 = AuthToken.objects.create(
+            self.user2, Client.objects.create(name="exportclient")
+        )
+        self.token3 = self._create_authtoken(client_name="expiredclient")
+        self.token3.expiry = timezone.now() - timedelta(days=1)
+        self.token3.save()
+
+    @staticmethod
+    def call_command(*args, **kwargs):
+        out = StringIO()
+        err = StringIO()
+        management.call_command(
+            "export_tokens", *args, stdout=out, stderr=err, **kwargs
+        )
+        return out.getvalue(), err.getvalue()
+
+    def test_export_csv(self):
+        with self.assertNumQueries(2):
+            out, err = self.call_command(chunk_size=2)
+        rows = list(csv.reader(StringIO(out)))
+        self.assertEqual(["id", "user_id", "client", "created", "expiry"], rows[0])
+        self.assertEqual(
+            [
+                [
+                    str(token.pk),
+                    str(token.user_id),
+                    token.client.name,
+                    token.created.isoformat(),
+                    token.expiry.isoformat(),
+                ]
+                for token in (self.token1, self.token2, self.token3)
+            ],
+            rows[1:],
+        )
+        self.assertNotIn(self.token1.token, out)
+        self.assertEqual("Exported 3 token(s).\n", err)
+
+    def test_export_ndjson(self):
+        out, _ = self.call_command(format="ndjson")
+        lines = out.splitlines()
+        self.assertEqual(3, len(lines))
+        self.assertEqual(
+            {
+                "id": self.token2.pk,
+                "user_id": self.user2.pk,
+                "client": "exportclient",
+                "created": self.token2.created.isoformat(),
+                "expiry": self.token2.expiry.isoformat(),
+            },
+            json.loads(lines[1]),
+        )
+
+    def test_export_filters(self):
+        out, _ = self.call_command("--client", "exportclient", format="ndjson")
+        self.assertEqual(
+            [self.token2.pk], [json.loads(line)["id"] for line in out.splitlines()]
+        )
+
+        out, _ = self.call_command(status="active", format="ndjson")
+        self.assertEqual(
+            [self.token1.pk, self.token2.pk],
+            [json.loads(line)["id"] for line in out.splitlines()],
+        )
+        out, _ = self.call_command(status="expired", format="ndjson")
+        self.assertEqual(
+            [self.token3.pk], [json.loads(line)["id"] for line in out.splitlines()]
+        )
+
+        tomorrow = (timezone.now() + timedelta(days=1)).date().isoformat()
+        out, err = self.call_command("--created-after", tomorrow)
+        self.assertEqual("Exported 0 token(s).\n", err)
+        out, err = self.call_command(
+            "--created-before", tomorrow, "--created-after", "2000-01-01T00:00:00"
+        )
+        self.assertEqual("Exported 3 token(s).\n", err)
+
+    def test_export_invalid_options(self):
+        with self.assertRaisesMessage(CommandError, "Unknown client(s): nope"):
+            self.call_command("--client", "nope")
+        with self.assertRaisesMessage(CommandError, "invalid date: 'yesterday'"):
+            self.call_command("--created-after", "yesterday")
+        with self.assertRaises(CommandError):
+            self.call_command(chunk_size=0)
+
+    def test_export_invalid_date_from_command_line(self):
+        stderr = StringIO()
+        with mock.patch("sys.stderr", stderr), self.assertRaises(SystemExit) as cm:
+            management.ManagementUtility(
+                ["manage.py", "export_tokens", "--created-after", "foo"]
+            ).execute()
+        self.assertEqual(2, cm.exception.code)
+        self.assertIn("usage:", stderr.getvalue())
+        self.assertIn("invalid date: 'foo'", stderr.getvalue())
+
+
+class CoveringIndexCommandTestCase(TestCase):
+    @staticmethod
+    def call_command(*args, **kwargs):
+        out = StringIO()
+        management.call_command(
+            "authtoken_covering_index", *args, stdout=out, stderr=StringIO(), **kwargs
+        )
+        return out.getvalue()
+
+    def test_sql(self):
+        self.assertIn(
+            'ON "durin_authtoken" ("token") '
+            'INCLUDE ("id", "user_id", "client_id", "created", "expiry");',
+            self.call_command("--sql"),
+        )
+        self.assertEqual(
+            'DROP INDEX CONCURRENTLY IF EXISTS "durin_authtoken_token_covering";\n',
+            self.call_command("--sql", "--drop"),
+        )
+
+    def test_requires_postgresql(self):
+        with self.assertRaisesMessage(CommandError, "PostgreSQL 11+"):
+            self.call_command()
+
+    def test_includes_all_columns(self):
+        # the token lookups select all the columns of the table
+        self.assertCountEqual(
+            [field.column for field in AuthToken._meta.concrete_fields],
+            self._get_index_columns(),
+        )
+
+    @staticmethod
+    def _get_index_columns():
+        return ["token"] + [
+            AuthToken._meta.get_field(name).column
+            for name in covering_index.INCLUDED_FIELDS
+        ]
+
+    def _call_on_postgresql(self, indisvalid):
+        connection = mock.MagicMock(vendor="postgresql", pg_version=150000)
+        connection.ops.quote_name = lambda name: '"{0}"'.format(name)
+        cursor = connection.cursor.return_value.__enter__.return_value
+        cursor.fetchone.return_value = None if indisvalid is None else (indisvalid,)
+        with mock.patch.object(covering_index, "connections", {"default": connection}):
+            self.call_command()
+        return [call.args[0].split(" ")[0:3] for call in cursor.execute.call_args_list]
+
+    def test_rebuilds_invalid_index(self):
+        self.assertEqual(
+            [["SELECT", "i.indisvalid", "FROM"], ["DROP", "INDEX", "CONCURRENTLY"]]
+            + [["CREATE", "INDEX", "CONCURRENTLY"]],
+            self._call_on_postgresql(indisvalid=False),
+        )
+
+    def test_keeps_valid_index(self):
+        for indisvalid in (True, None):
+            self.assertEqual(
+                [
+                    ["SELECT", "i.indisvalid", "FROM"],
+                    ["CREATE", "INDEX", "CONCURRENTLY"],
+                ],
+                self._call_on_postgresql(indisvalid=indisvalid),
+            )
+
+
+class LoadtestCommandTestCase(SimpleTestCase):
+    def test_smoke(self):
+        # run in a subprocess, the command sets up its own throwaway database
+        # which can't replace the in-memory test database of this process
+        manage_py = os.path.join(settings.BASE_DIR, "manage.py")
+        result = subprocess.run(
+            [sys.executable, manage_py, "loadtest"]
+            + ["--duration", "0.5", "--concurrency", "1"],
+            capture_output=True,
+            text=True,
+            timeout=60,
+        )
+        self.assertEqual(0, result.returncode, result.stderr)
+        lines = result.stdout.splitlines()
+        self.assertEqual(
+            ["endpoint", "requests", "req/s", "p50", "ms"], lines[0].split()[:5]
+        )
+        self.assertIn("login", [line.split(" ")[0] for line in lines[2:-2]])
+        self.assertRegex(
+            lines[-1], r"^\d+ requests in [\d.]+s \([\d.]+ req/s\) with 1 workers$"
+        )
@@ -0,0 +1,142 @@
+from datetime import timedelta
+from importlib import reload
+
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIRequestFactory
+
+from durin import etags, views
+from durin.models import AuthToken, Client
+from durin.settings import durin_settings
+
+from . import CustomTestCase
+
+login_url = reverse("durin_login")
+logoutall_url = reverse("durin_logoutall")
+refresh_url = reverse("durin_refresh")
+sessions_list_uri = reverse("durin_tokensessions-list")
+apiaccess_uri = reverse("durin_apiaccess")
+
+new_settings = durin_settings.defaults.copy()
+new_settings["CONDITIONAL_GET"] = True
+new_settings["API_ACCESS_CLIENT_NAME"] = "etagsapiaccesstestcase_client"
+
+
+class ConditionalGetTestCase(CustomTestCase):
+    def setUp(self):
+        super().setUp()
+        self.override_settings_and_reload(etags, views, REST_DURIN=new_settings)
+        self.token = self._create_authtoken()
+        self.client.credentials(HTTP_AUTHORIZATION=("Token %s" % self.token.token))
+        Client.objects.create(name=new_settings["API_ACCESS_CLIENT_NAME"])
+
+    def _get_etag(self, uri):
+        resp = self.client.get(uri)
+        self.assertEqual(status.HTTP_200_OK, resp.status_code)
+        self.assertIn("ETag", resp)
+        return resp["ETag"]
+
+    def _assertNotModified(self, uri, etag):
+        with self.assertNumQueries(1, msg="only the token lookup"):
+            resp = self.client.get(uri, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(status.HTTP_304_NOT_MODIFIED, resp.status_code)
+        self.assertEqual(etag.replace("W/", ""), resp["ETag"])
+
+    def _assertModified(self, uri, etag):
+        resp = self.client.get(uri, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(status.HTTP_200_OK, resp.status_code)
+        self.assertNotEqual(etag, resp["ETag"])
+
+    def test_sessions_list_304(self):
+        etag = self._get_etag(sessions_list_uri)
+        self._assertNotModified(sessions_list_uri, etag)
+        self._assertNotModified(sessions_list_uri, "W/%s" % etag)
+        self._assertModified(sessions_list_uri, '"other"')
+
+    def test_sessions_list_etag_changes_on_create_renew_and_delete(self):
+        etag = self._get_etag(sessions_list_uri)
+        with self.captureOnCommitCallbacks(execute=True):
+            other = self._create_authtoken(client_name="etags_other_client")
+        self._assertModified(sessions_list_uri, etag)
+
+        etag = self._get_etag(sessions_list_uri)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(refresh_url)
+        self._assertModified(sessions_list_uri, etag)
+
+        etag = self._get_etag(sessions_list_uri)
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.delete(
+                reverse("durin_tokensessions-detail", args=[other.pk])
+            )
+        self.assertEqual(status.HTTP_204_NO_CONTENT, resp.status_code)
+        self._assertModified(sessions_list_uri, etag)
+
+    def test_sessions_list_etag_differs_per_token(self):
+        etag = self._get_etag(sessions_list_uri)
+        other = self._create_authtoken(client_name="etags_other_client")
+        self.client.credentials(HTTP_AUTHORIZATION=("Token %s" % other.token))
+        self._assertModified(sessions_list_uri, etag)
+
+    def test_version_is_replaced_on_queryset_delete(self):
+        self._create_authtoken(user=self.user2)
+        version = etags.get_user_version(self.user.pk)
+        version2 = etags.get_user_version(self.user2.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.post(logoutall_url)
+        self.assertEqual(status.HTTP_204_NO_CONTENT, resp.status_code)
+        self.assertNotEqual(version, etags.get_user_version(self.user.pk))
+        self.assertEqual(version2, etags.get_user_version(self.user2.pk))
+
+    def test_version_is_replaced_on_commit(self):
+        version = etags.get_user_version(self.user.pk)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.token.renew_token()
+        self.assertEqual(version, etags.get_user_version(self.user.pk))
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(version, etags.get_user_version(self.user.pk))
+
+    def test_apiaccess_get_304(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(201, self.client.post(apiaccess_uri).status_code)
+        etag = self._get_etag(apiaccess_uri)
+        self._assertNotModified(apiaccess_uri, etag)
+        # the sessions list has its own etags
+        self._assertModified(sessions_list_uri, etag)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(204, self.client.delete(apiaccess_uri).status_code)
+        resp = self.client.get(apiaccess_uri, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(status.HTTP_404_NOT_FOUND, resp.status_code)
+
+    def test_expired_etag(self):
+        version = etags.get_user_version(self.user.pk)
+        request = APIRequestFactory().get(
+            "/",
+            HTTP_IF_NONE_MATCH=", ".join(
+                (
+                    etags.make_etag(version, "a", timezone.now() - timedelta(1)),
+                    etags.make_etag(version, "b", timezone.now() + timedelta(1)),
+                    etags.make_etag(version, "c"),
+                )
+            ),
+        )
+        self.assertIsNone(etags.get_matching_etag(request, version, "a"))
+        self.assertIsNotNone(etags.get_matching_etag(request, version, "b"))
+        self.assertIsNotNone(etags.get_matching_etag(request, version, "c"))
+        self.assertIsNone(etags.get_matching_etag(request, None, "c"))
+
+    def test_disabled(self):
+        disabled_settings = new_settings.copy()
+        disabled_settings["CONDITIONAL_GET"] = False
+        with override_settings(REST_DURIN=disabled_settings):
+            reload(etags)
+            resp = self.client.get(sessions_list_uri)
+            self.assertEqual(status.HTTP_200_OK, resp.status_code)
+            self.assertNotIn("ETag", resp)
+            self.assertIsNone(etags.get_user_version(self.user.pk))
+            with self.assertNumQueries(1):
+                AuthToken.objects.filter(user=self.user).delete()
@@ -0,0 +1,55 @@
+import os
+import sys
+import unittest
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+from example_project.management.commands.importtime import (
+    get_durin_times,
+    measure_import_times,
+    parse_importtime,
+)
+
+IMPORTTIME_OUTPUT = """\
+import time: self [us] | cumulative | imported package
+import time:       100 |        100 |     django.core.signals
+import time:       300 |        400 |   durin.settings
+import time:        50 |         50 |       humanize.time
+import time:       200 |        250 |     humanize
+import time:      1000 |       1250 |   durin.models
+import time:        10 |       1660 | durin.auth
+import time:       500 |        500 | rest_framework
+"""
+
+
+@unittest.skipUnless(sys.version_info >= (3, 7), "-X importtime requires Python 3.7")
+class ImportTimeTestCase(SimpleTestCase):
+    #: Generous budget (in milliseconds) to catch heavy imports creeping back in.
+    import_time_budget = 500
+
+    #: Modules which must be imported lazily, if at all.
+    lazy_modules = ("humanize", "django.test", "durin.throttling")
+
+    def test_parse_importtime(self):
+        entries = parse_importtime(IMPORTTIME_OUTPUT)
+        self.assertEqual(7, len(entries))
+        self.assertEqual(("durin.settings", 300, 400, 1), entries[1])
+        self.assertEqual(("durin.auth", 10, 1660, 0), entries[5])
+        self.assertEqual({"durin.auth": 1660}, get_durin_times(entries))
+
+    def test_lazy_imports(self):
+        imported = {name for name, _, _, _ in measure_import_times()}
+        self.assertIn("durin.auth", imported)
+        for module in self.lazy_modules:
+            self.assertNotIn(module, imported)
+
+    @unittest.skipUnless(
+        os.environ.get("DURIN_TEST_IMPORT_TIME"),
+        "wall-clock timing, set DURIN_TEST_IMPORT_TIME=1 to run it",
+    )
+    def test_import_time_budget(self):
+        out = StringIO()
+        call_command("importtime", repeat=5, budget=self.import_time_budget, stdout=out)
+        self.assertIn("OK", out.getvalue())
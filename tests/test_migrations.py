@@ -0,0 +1,32 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connections
+from django.test import TransactionTestCase
+
+
+class MigrationsTestCase(TransactionTestCase):
+    databases = {"default", "replica"}
+
+    def test_no_missing_migrations(self):
+        out = StringIO()
+        call_command("makemigrations", "durin", "--check", "--dry-run", stdout=out)
+        self.assertIn("No changes detected", out.getvalue())
+
+    def test_migrate_backwards_and_forwards(self):
+        def get_columns():
+            connection = connections["replica"]
+            with connection.cursor() as cursor:
+                return [
+                    column.name
+                    for column in connection.introspection.get_table_description(
+                        cursor, "durin_client"
+                    )
+                ]
+
+        kwargs = {"database": "replica", "verbosity": 0}
+        self.addCleanup(call_command, "migrate", "durin", **kwargs)
+        call_command("migrate", "durin", "0003", **kwargs)
+        self.assertNotIn("priority", get_columns())
+        call_command("migrate", "durin", **kwargs)
+        self.assertIn("token_ttl_jitter_percent", get_columns())
@@ -1,7 +1,13 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError as DjValidationError
 from django.test import TestCase
+from django.utils import timezone
+
+from durin.models import AuthToken, Client
 
-from durin.models import Client
+User = get_user_model()
 
 
 class ClientTestCase(TestCase):
@@ -43,3 +49,42 @@ class ClientTestCase(TestCase):
             )
             testclient2.full_clean()
             testclient2.delete()
+
+    def test_token_ttl_without_jitter(self):
+        testclient = Client(name="test_token_ttl", token_ttl=timedelta(days=1))
+        self.assertEqual(timedelta(days=1), testclient.get_token_ttl())
+
+    def test_token_ttl_jitter(self):
+        testclient = Client(
+            name="test_token_ttl_jitter",
+            token_ttl=timedelta(days=1),
+            token_ttl_jitter=timedelta(hours=1),
+            token_ttl_jitter_percent=10,
+        )
+        ttls = {testclient.get_token_ttl() for _ in range(20)}
+        self.assertGreater(len(ttls), 1, msg="expiries are spread")
+        for ttl in ttls:
+            # the larger spread (10% of a day) is used
+            self.assertLessEqual(ttl, timedelta(days=1))
+            self.assertGreaterEqual(ttl, timedelta(days=1) * 0.9)
+
+    def test_token_ttl_jitter_percent_validation(self):
+        testclient = Client(name="test_token_ttl_jitter", token_ttl_jitter_percent=101)
+        with self.assertRaises(DjValidationError):
+            testclient.full_clean()
+
+    def test_authtoken_expiry_is_jittered(self):
+        user = User.objects.create_user("test_authtoken_expiry_is_jittered")
+        testclient = Client.objects.create(
+            name="test_authtoken_expiry_is_jittered",
+            token_ttl=timedelta(days=1),
+            token_ttl_jitter=timedelta(hours=12),
+        )
+        before = timezone.now()
+        token = AuthToken.objects.create(user, testclient)
+        self.assertLessEqual(token.expiry, timezone.now() + timedelta(days=1))
+        self.assertGreaterEqual(token.expiry, before + timedelta(hours=12))
+
+        token.renew_token()
+        self.assertLessEqual(token.expiry, timezone.now() + timedelta(days=1))
+        self.assertGreaterEqual(token.expiry, before + timedelta(hours=12))
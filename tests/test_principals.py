@@ -0,0 +1,141 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.signals import user_logged_out
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
+
+from durin import auth, views
+from durin.models import AuthToken, Client
+from durin.principals import AuthTokenPrincipal, UserPrincipal
+from durin.settings import durin_settings
+from example_project.permissions import TEST_CLIENT_NAME
+
+from . import CustomTestCase
+
+User = get_user_model()
+
+root_url = reverse("api-root")
+throttled_url = reverse("throttled-api")
+onlywebclient_url = reverse("onlywebclient-api")
+refresh_url = reverse("durin_refresh")
+logout_url = reverse("durin_logout")
+logoutall_url = reverse("durin_logoutall")
+
+
+class LightweightPrincipalTestCase(CustomTestCase):
+    def setUp(self):
+        super().setUp()
+        new_settings = durin_settings.defaults.copy()
+        new_settings["LIGHTWEIGHT_AUTH_PRINCIPAL"] = True
+        self.override_settings_and_reload(auth, REST_DURIN=new_settings)
+        self.token_instance = AuthToken.objects.create(self.user, self.authclient)
+        self.client.credentials(
+            HTTP_AUTHORIZATION=("Token %s" % self.token_instance.token)
+        )
+
+    def test_authenticate_credentials(self):
+        with self.assertNumQueries(1):
+            user, auth_token = auth.TokenAuthentication.authenticate_credentials(
+                self.token_instance.token.encode()
+            )
+            self.assertIsInstance(auth_token, AuthTokenPrincipal)
+            self.assertIsInstance(user, UserPrincipal)
+            self.assertEqual(self.user.pk, user.pk)
+            self.assertTrue(user.is_active)
+            self.assertEqual(self.authclient.pk, auth_token.client_id)
+            self.assertEqual(self.authclient.name, auth_token.client.name)
+            self.assertEqual(self.token_instance.expiry, auth_token.expiry)
+        # behave like the model instances
+        self.assertIsInstance(user, User)
+        self.assertIsInstance(auth_token, AuthToken)
+        self.assertEqual(self.user, user)
+        self.assertEqual(self.token_instance, auth_token)
+
+    def test_lazy_attribute_access(self):
+        user, auth_token = auth.TokenAuthentication.authenticate_credentials(
+            self.token_instance.token.encode()
+        )
+        with self.assertNumQueries(1):
+            self.assertEqual(self.user.username, user.username)
+            self.assertEqual(self.user.email, user.email)
+        with self.assertNumQueries(1):
+            self.assertEqual(str(self.token_instance), str(auth_token))
+
+    def test_view_1_sql_query(self):
+        with self.assertNumQueries(1):
+            resp = self.client.get(root_url)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+
+    def test_throttled_view_1_sql_query(self):
+        with self.assertNumQueries(1):
+            resp = self.client.get(throttled_url)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+
+    def test_permission_view(self):
+        self.client.credentials(
+            HTTP_AUTHORIZATION=(
+                "Token %s"
+                % AuthToken.objects.create(
+                    self.user, Client.objects.create(name=TEST_CLIENT_NAME)
+                ).token
+            )
+        )
+        with self.assertNumQueries(1):
+            resp = self.client.get(onlywebclient_url)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+
+    def test_refresh_view(self):
+        resp = self.client.post(refresh_url)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.token_instance.refresh_from_db()
+        self.assertEqual(
+            views.RefreshView.format_expiry_datetime(self.token_instance.expiry),
+            resp.data["expiry"],
+        )
+
+    def test_logout_view(self):
+        received = []
+
+        def receiver(sender, **kwargs):
+            received.append(sender)
+
+        user_logged_out.connect(receiver)
+        self.addCleanup(user_logged_out.disconnect, receiver)
+        resp = self.client.post(logout_url)
+        self.assertEqual(resp.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(AuthToken.objects.exists())
+        self.assertEqual([User], received)
+
+    def test_logoutall_view(self):
+        AuthToken.objects.create(self.user, Client.objects.create(name="other"))
+        AuthToken.objects.create(self.user2, self.authclient)
+        resp = self.client.post(logoutall_url)
+        self.assertEqual(resp.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(AuthToken.objects.filter(user=self.user).exists())
+        self.assertTrue(AuthToken.objects.filter(user=self.user2).exists())
+
+    def test_expired_token(self):
+        self.token_instance.expiry = self.token_instance.created
+        self.token_instance.save()
+        resp = self.client.get(root_url)
+        self.assertEqual(resp.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertFalse(AuthToken.objects.exists())
+
+    def test_inactive_user(self):
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            auth.TokenAuthentication.authenticate_credentials(
+                self.token_instance.token.encode()
+            )
+
+    def test_invalid_token(self):
+        self.client.credentials(HTTP_AUTHORIZATION="Token invalid")
+        resp = self.client.get(root_url)
+        self.assertEqual(resp.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_cached_authentication_ignores_setting(self):
+        _, auth_token = auth.CachedTokenAuthentication.authenticate_credentials(
+            self.token_instance.token.encode()
+        )
+        self.assertNotIsInstance(auth_token, AuthTokenPrincipal)
@@ -0,0 +1,167 @@
+"""
+Query budgets of durin's endpoints.
+
+Each test asserts the exact number of SQL queries a request costs, for every
+``AUTHTOKEN_SELECT_RELATED_LIST`` configuration. A change that adds a query
+to one of these paths has to update the budget here.
+"""
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from durin import auth, views
+from durin.models import AuthToken, Client
+from durin.settings import durin_settings
+
+from . import CustomTestCase
+
+root_url = reverse("api-root")
+cached_auth_url = reverse("cached-auth-api")
+throttled_view_url = reverse("throttled-api")
+login_url = reverse("durin_login")
+refresh_url = reverse("durin_refresh")
+logoutall_url = reverse("durin_logoutall")
+sessions_list_uri = reverse("durin_tokensessions-list")
+apiaccess_uri = reverse("durin_apiaccess")
+
+apiaccess_client_name = "querybudget_apiaccess_client"
+
+
+class QueryBudgetMixin:
+    #: value of the ``AUTHTOKEN_SELECT_RELATED_LIST`` setting
+    select_related_list = ["user"]
+    #: number of queries to authenticate a request
+    auth_queries = 1
+    #: number of extra queries of accessing ``request.auth.client``
+    client_queries = 1
+
+    def setUp(self):
+        super().setUp()
+        new_settings = durin_settings.defaults.copy()
+        new_settings["AUTHTOKEN_SELECT_RELATED_LIST"] = self.select_related_list
+        new_settings["API_ACCESS_CLIENT_NAME"] = apiaccess_client_name
+        self.override_settings_and_reload(auth, views, REST_DURIN=new_settings)
+        self.token_instance = AuthToken.objects.create(self.user, self.authclient)
+        self.client.credentials(
+            HTTP_AUTHORIZATION=("Token %s" % self.token_instance.token)
+        )
+
+    def test_token_authentication(self):
+        with self.assertNumQueries(self.auth_queries):
+            resp = self.client.get(root_url)
+        self.assertEqual(resp.status_code, 200)
+
+    def test_token_authentication_with_throttle(self):
+        with self.assertNumQueries(self.auth_queries + self.client_queries):
+            resp = self.client.get(throttled_view_url)
+        self.assertEqual(resp.status_code, 200)
+
+    def test_cached_token_authentication_miss(self):
+        with self.assertNumQueries(self.auth_queries):
+            resp = self.client.get(cached_auth_url)
+        self.assertEqual(resp.status_code, 200)
+
+    def test_cached_token_authentication_hit(self):
+        self.client.get(cached_auth_url)
+        with self.assertNumQueries(0):
+            resp = self.client.get(cached_auth_url)
+        self.assertEqual(resp.status_code, 200)
+
+    def test_authtoken_repr(self):
+        token = AuthToken.objects.get(pk=self.token_instance.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                "({0}, {1}/{2})".format(token.token, self.user.pk, self.authclient.pk),
+                repr(token),
+            )
+        token = auth.TokenAuthentication.get_auth_token(token.token)
+        with self.assertNumQueries(0):
+            repr(token)
+
+    def test_login_new_token(self):
+        self.client.credentials()
+        # user, client, existing token, insert token, update last_login
+        with self.assertNumQueries(5):
+            resp = self.client.post(login_url, self.creds2, format="json")
+        self.assertEqual(resp.status_code, 200)
+
+    def test_login_existing_token(self):
+        self.client.credentials()
+        # user, client, existing token, update last_login
+        with self.assertNumQueries(4):
+            resp = self.client.post(login_url, self.creds, format="json")
+        self.assertEqual(resp.status_code, 200)
+
+    def test_refresh(self):
+        # auth, client for the ttl, update expiry
+        with self.assertNumQueries(self.auth_queries + self.client_queries + 1):
+            resp = self.client.post(refresh_url, {}, format="json")
+        self.assertEqual(resp.status_code, 200)
+
+    def test_logoutall(self):
+        AuthToken.objects.create(self.user, Client.objects.create(name="other"))
+        # auth, delete tokens
+        with self.assertNumQueries(self.auth_queries + 1):
+            resp = self.client.post(logoutall_url, {}, format="json")
+        self.assertEqual(resp.status_code, 204)
+        self.assertFalse(AuthToken.objects.filter(user=self.user).exists())
+
+    def test_sessions_list(self):
+        for name in ("web", "mobile", "cli"):
+            AuthToken.objects.create(self.user, Client.objects.create(name=name))
+        # auth, tokens joined with their clients
+        with self.assertNumQueries(self.auth_queries + 1):
+            resp = self.client.get(sessions_list_uri)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(resp.data), 4)
+
+    def test_apiaccess(self):
+        Client.objects.create(name=apiaccess_client_name)
+        with self.subTest("POST"):
+            with CaptureQueriesContext(connection) as context:
+                resp = self.client.post(apiaccess_uri)
+            self.assertEqual(resp.status_code, 201)
+            # the insert only needs a savepoint since the test runs in a transaction
+            queries = [
+                query
+                for query in context.captured_queries
+                if "SAVEPOINT" not in query["sql"]
+            ]
+            self.assertEqual(self.auth_queries + 2, len(queries), msg=queries)
+        with self.subTest("POST again"):
+            resp = self.client.post(apiaccess_uri)
+            self.assertEqual(resp.status_code, 400)
+        with self.subTest("GET"):
+            with self.assertNumQueries(self.auth_queries + 1):
+                resp = self.client.get(apiaccess_uri)
+            self.assertEqual(resp.status_code, 200)
+        with self.subTest("GET without cached client"):
+            cache.clear()
+            with self.assertNumQueries(self.auth_queries + 1):
+                resp = self.client.get(apiaccess_uri)
+            self.assertEqual(resp.status_code, 200)
+            self.assertEqual(apiaccess_client_name, resp.data["client"])
+        with self.subTest("DELETE"):
+            with self.assertNumQueries(self.auth_queries + 2):
+                resp = self.client.delete(apiaccess_uri)
+            self.assertEqual(resp.status_code, 204)
+
+
+class SelectUserQueryBudgetTestCase(QueryBudgetMixin, CustomTestCase):
+    select_related_list = ["user"]
+    auth_queries = 1
+    client_queries = 1
+
+
+class SelectUserAndClientQueryBudgetTestCase(QueryBudgetMixin, CustomTestCase):
+    select_related_list = ["user", "client"]
+    auth_queries = 1
+    client_queries = 0
+
+
+class NoSelectRelatedQueryBudgetTestCase(QueryBudgetMixin, CustomTestCase):
+    select_related_list = False
+    auth_queries = 2
+    client_queries = 1
@@ -0,0 +1,54 @@
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from durin import auth, routers
+from durin.models import AuthToken, Client
+from durin.settings import durin_settings
+
+from . import CustomTestCase
+
+root_url = reverse("api-root")
+sessions_list_uri = reverse("durin_tokensessions-list")
+
+new_settings = durin_settings.defaults.copy()
+new_settings["READ_REPLICA_DATABASES"] = ["replica"]
+
+
+class ReplicaRouterTestCase(CustomTestCase):
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        self.override_settings_and_reload(
+            routers,
+            auth,
+            REST_DURIN=new_settings,
+            DATABASE_ROUTERS=["durin.routers.DurinReplicaRouter"],
+        )
+        super().setUp()
+        # token is only written to the primary
+        self.token = AuthToken.objects.create(self.user, self.authclient)
+        self.client.credentials(HTTP_AUTHORIZATION=("Token %s" % self.token.token))
+
+    def test_routes_durin_reads_to_replica(self):
+        router = routers.DurinReplicaRouter()
+        self.assertEqual("replica", router.db_for_read(AuthToken))
+        self.assertEqual("replica", router.db_for_read(Client))
+        self.assertIsNone(router.db_for_read(get_user_model()))
+
+    def test_routes_durin_writes_to_primary(self):
+        router = routers.DurinReplicaRouter()
+        self.assertEqual("default", router.db_for_write(AuthToken))
+        self.assertEqual("default", router.db_for_write(Client))
+        self.assertIsNone(router.db_for_write(get_user_model()))
+        self.assertFalse(AuthToken.objects.using("replica").exists())
+
+    def test_auth_falls_back_to_primary_on_replica_miss(self):
+        with self.assertNumQueries(1, using="replica"):
+            resp = self.client.get(root_url)
+        self.assertEqual(200, resp.status_code, msg="found on the primary")
+
+    def test_sessions_list_is_read_from_replica(self):
+        with self.assertNumQueries(2, using="replica"):
+            resp = self.client.get(sessions_list_uri)
+        self.assertEqual(200, resp.status_code)
+        self.assertEqual([], resp.json(), msg="replica hasn't caught up yet")
@@ -0,0 +1,246 @@
+import json
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core import management
+from django.db import connections
+from django.db.migrations.loader import MigrationLoader
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+
+from durin import sharding, views
+from durin.models import AuthToken, Client
+from durin.operations import DropShardForeignKeys, drop_shard_foreign_keys
+from durin.settings import durin_settings
+
+from . import CustomTestCase
+
+User = get_user_model()
+
+login_url = reverse("durin_login")
+logoutall_url = reverse("durin_logoutall")
+refresh_url = reverse("durin_refresh")
+sessions_list_uri = reverse("durin_tokensessions-list")
+apiaccess_uri = reverse("durin_apiaccess")
+introspect_uri = reverse("durin_introspect")
+root_url = reverse("api-root")
+admin_changelist_url = reverse("admin:durin_authtoken_changelist")
+
+SHARDS = ["shard1", "shard2"]
+
+new_settings = durin_settings.defaults.copy()
+new_settings["AUTHTOKEN_SHARD_DATABASES"] = SHARDS
+new_settings["API_ACCESS_CLIENT_NAME"] = "shardingapiaccesstestcase_client"
+
+
+def get_foreign_keys(using: str) -> list:
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(
+            cursor, AuthToken._meta.db_table
+        )
+    return sorted(
+        constraint["foreign_key"][0]
+        for constraint in constraints.values()
+        if constraint["foreign_key"]
+    )
+
+
+class ShardingTestCase(CustomTestCase):
+    databases = {"default", *SHARDS}
+
+    @classmethod
+    def setUpClass(cls):
+        # the test databases were migrated without ``AUTHTOKEN_SHARD_DATABASES``,
+        # so the shards still have the foreign key constraints.
+        # Drop them before the test case's transactions are opened.
+        with override_settings(REST_DURIN=new_settings):
+            for shard in SHARDS:
+                if get_foreign_keys(shard):
+                    drop_shard_foreign_keys(shard)
+        super().setUpClass()
+
+    def setUp(self):
+        self.override_settings_and_reload(
+            sharding,
+            views,
+            REST_DURIN=new_settings,
+            DATABASE_ROUTERS=["durin.sharding.AuthTokenShardRouter"],
+        )
+        super().setUp()
+
+    def _login(self, creds):
+        resp = self.client.post(login_url, creds, format="json")
+        self.assertEqual(200, resp.status_code, msg=resp.data)
+        self.client.credentials(HTTP_AUTHORIZATION=("Token %s" % resp.data["token"]))
+        return resp.data["token"]
+
+    def test_foreign_keys_are_dropped_on_shards_only(self):
+        self.assertEqual(["auth_user", "durin_client"], get_foreign_keys("default"))
+        for shard in SHARDS:
+            self.assertEqual([], get_foreign_keys(shard))
+
+    def test_shard_is_deterministic_per_user(self):
+        shard = sharding.get_shard_for_user(self.user.pk)
+        self.assertIn(shard, SHARDS)
+        self.assertEqual(shard, sharding.get_shard_for_user(self.user.pk))
+        self.assertNotEqual(shard, sharding.get_shard_for_user(self.user2.pk))
+
+    def test_token_is_stored_on_encoded_shard(self):
+        for creds, user in ((self.creds, self.user), (self.creds2, self.user2)):
+            token = self._login(creds)
+            shard = sharding.get_shard_for_user(user.pk)
+            self.assertEqual(shard, sharding.get_shard_for_token(token))
+            self.assertTrue(AuthToken.objects.using(shard).filter(token=token).exists())
+            self.assertEqual(durin_settings.TOKEN_CHARACTER_LENGTH, len(token))
+        self.assertFalse(AuthToken.objects.using("default").exists())
+
+    def test_login_returns_existing_token(self):
+        token = self._login(self.creds)
+        self.assertEqual(token, self._login(self.creds))
+
+    def test_authenticated_requests(self):
+        self._login(self.creds)
+        resp = self.client.get(root_url)
+        self.assertEqual(200, resp.status_code)
+        resp = self.client.post(refresh_url, {}, format="json")
+        self.assertEqual(200, resp.status_code)
+
+    def test_invalid_shard_prefix_returns_401(self):
+        token = self._login(self.creds)
+        self.client.credentials(HTTP_AUTHORIZATION=("Token ff%s" % token[2:]))
+        resp = self.client.get(root_url)
+        self.assertEqual(401, resp.status_code)
+        self.assertEqual({"detail": "Invalid token."}, resp.data)
+
+    def test_logout_all_deletes_tokens_on_shard(self):
+        self._login(self.creds)
+        self._create_authtoken(client_name="test_logout_all_deletes_tokens")
+        self._create_authtoken(user=self.user2)
+        shard = sharding.get_shard_for_user(self.user.pk)
+        self.assertEqual(2, AuthToken.objects.using(shard).count())
+
+        resp = self.client.post(logoutall_url, {}, format="json")
+        self.assertEqual(204, resp.status_code)
+        self.assertEqual(0, AuthToken.objects.using(shard).count())
+        shard2 = sharding.get_shard_for_user(self.user2.pk)
+        self.assertEqual(1, AuthToken.objects.using(shard2).count())
+
+    def test_introspect_tokens_on_shards(self):
+        self.user.is_staff = True
+        self.user.save()
+        self._login(self.creds)
+        token = self._create_authtoken(client_name="test_introspect_tokens_on_shards")
+        token2 = self._create_authtoken(user=self.user2)
+        tokens = [token.token, token2.token, "zz" + token.token[2:]]
+
+        resp = self.client.post(introspect_uri, {"tokens": tokens}, format="json")
+        self.assertEqual(200, resp.status_code)
+        self.assertEqual(
+            [
+                (True, self.user.pk, "test_introspect_tokens_on_shards"),
+                (True, self.user2.pk, "customtestcase_client"),
+            ],
+            [(t["active"], t["user"], t["client"]) for t in resp.data["tokens"][:2]],
+        )
+        self.assertEqual({"token": tokens[2], "active": False}, resp.data["tokens"][2])
+
+    def test_export_tokens_from_shards(self):
+        token = self._create_authtoken()
+        token2 = self._create_authtoken(user=self.user2)
+        out = StringIO()
+        management.call_command(
+            "export_tokens", format="ndjson", stdout=out, stderr=StringIO()
+        )
+        self.assertCountEqual(
+            [(token.pk, self.user.pk), (token2.pk, self.user2.pk)],
+            [
+                (row["id"], row["user_id"])
+                for row in map(json.loads, out.getvalue().splitlines())
+            ],
+        )
+
+    def test_sessions_list_and_delete(self):
+        self._login(self.creds)
+        other = self._create_authtoken(client_name="test_sessions_list_and_delete")
+
+        resp = self.client.get(sessions_list_uri)
+        self.assertEqual(200, resp.status_code)
+        self.assertCountEqual(
+            [self.authclient.name, "test_sessions_list_and_delete"],
+            [session["client"] for session in resp.json()],
+        )
+
+        uri = reverse("durin_tokensessions-detail", args=[other.pk])
+        resp = self.client.delete(uri)
+        self.assertEqual(204, resp.status_code)
+        shard = sharding.get_shard_for_user(self.user.pk)
+        self.assertEqual(1, AuthToken.objects.using(shard).count())
+
+    def test_apiaccess_post_and_get(self):
+        Client.objects.create(name=new_settings["API_ACCESS_CLIENT_NAME"])
+        self._login(self.creds)
+
+        resp = self.client.post(apiaccess_uri)
+        self.assertEqual(201, resp.status_code)
+        resp = self.client.post(apiaccess_uri)
+        self.assertEqual(400, resp.status_code, msg="already issued")
+        resp = self.client.get(apiaccess_uri)
+        self.assertEqual(200, resp.status_code)
+
+    def test_admin_lists_tokens_of_selected_shard(self):
+        admin = User.objects.create_superuser("admin", "admin@example.com", "pass")
+        token1 = self._create_authtoken(user=self.user)
+        token2 = self._create_authtoken(user=self.user2)
+        self.client.force_login(admin)
+
+        for token in (token1, token2):
+            shard = sharding.get_shard_for_token(token.token)
+            resp = self.client.get(admin_changelist_url, {"shard": shard})
+            self.assertEqual(200, resp.status_code)
+            self.assertEqual([token], list(resp.context["cl"].result_list))
+
+
+class DropShardForeignKeysTestCase(TransactionTestCase):
+    databases = {"replica", *SHARDS}
+
+    def _run(self, using: str, backwards=False):
+        connection = connections[using]
+        state = MigrationLoader(connection).project_state()
+        operation = DropShardForeignKeys()
+        with override_settings(REST_DURIN=new_settings):
+            with connection.schema_editor() as schema_editor:
+                if backwards:
+                    operation.database_backwards("durin", schema_editor, state, state)
+                else:
+                    operation.database_forwards("durin", schema_editor, state, state)
+
+    def test_forwards_and_backwards(self):
+        shard = SHARDS[0]
+        self._run(shard)
+        self.assertEqual([], get_foreign_keys(shard))
+        self._run(shard, backwards=True)
+        self.assertEqual(["auth_user", "durin_client"], get_foreign_keys(shard))
+        self._run(shard)
+        self.assertEqual([], get_foreign_keys(shard))
+
+    def test_noop_if_already_dropped(self):
+        shard = SHARDS[0]
+        self._run(shard)
+        self._run(shard)
+        self.assertEqual([], get_foreign_keys(shard))
+
+    def test_migrations_rebuilding_table_keep_them_dropped(self):
+        shard = SHARDS[0]
+        kwargs = {"database": shard, "verbosity": 0}
+        self._run(shard)
+        with override_settings(REST_DURIN=new_settings):
+            # 0009 and 0010 rebuild the table on SQLite
+            management.call_command("migrate", "durin", "0008", **kwargs)
+            self.assertEqual([], get_foreign_keys(shard))
+            management.call_command("migrate", "durin", **kwargs)
+            self.assertEqual([], get_foreign_keys(shard))
+
+    def test_noop_on_other_databases(self):
+        self._run("replica")
+        self.assertEqual(["auth_user", "durin_client"], get_foreign_keys("replica"))
@@ -0,0 +1,97 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.apps import apps
+from django.core.cache import cache as default_cache
+from django.test import override_settings
+from django.utils import timezone
+
+from durin import settings, sweeper
+from durin.cache import cache
+from durin.models import AuthToken
+from durin.signals import token_expired
+
+from . import CustomTestCase
+
+
+class ExpiredTokenSweeperTestCase(CustomTestCase):
+    def setUp(self):
+        super().setUp()
+        new_settings = settings.durin_settings.defaults.copy()
+        new_settings["EXPIRED_TOKEN_SWEEP_BATCH_SIZE"] = 2
+        self.override_settings_and_reload(sweeper, REST_DURIN=new_settings)
+        self.sweeper = sweeper.ExpiredTokenSweeper()
+        self.sweeper.batch_pause = 0
+        self.valid_token = AuthToken.objects.create(self.user, self.authclient)
+        self.expired_pks = []
+        for name in ("web", "mobile", "cli"):
+            token = self._create_authtoken(self.user, name)
+            token.expiry = timezone.now() - timedelta(seconds=1)
+            token.save(update_fields=["expiry"])
+            self.expired_pks.append(token.pk)
+
+    def test_run_once_deletes_expired_tokens_in_batches(self):
+        # 2 batches of (select, delete)
+        with self.assertNumQueries(4):
+            self.assertEqual(3, self.sweeper.run_once())
+        self.assertFalse(AuthToken.objects.filter(pk__in=self.expired_pks).exists())
+        self.assertTrue(AuthToken.objects.filter(pk=self.valid_token.pk).exists())
+
+    def test_single_sweeper_is_elected(self):
+        other = sweeper.ExpiredTokenSweeper()
+        self.assertEqual(3, self.sweeper.run_once())
+        self.assertFalse(other.elect())
+        self.assertEqual(0, other.run_once())
+        # the lock expires after the interval
+        default_cache.delete(sweeper.ExpiredTokenSweeper.lock_key)
+        self.assertTrue(other.elect())
+
+    def test_not_elected_while_circuit_is_open(self):
+        with mock.patch.object(
+            type(cache), "is_open", new_callable=mock.PropertyMock, return_value=True
+        ):
+            self.assertFalse(self.sweeper.elect())
+            self.assertEqual(0, self.sweeper.run_once())
+        self.assertEqual(3, AuthToken.objects.filter(pk__in=self.expired_pks).count())
+
+    def test_token_expired_signal(self):
+        receiver = mock.Mock()
+        token_expired.connect(receiver)
+        self.addCleanup(token_expired.disconnect, receiver)
+        self.sweeper.run_once()
+        self.assertEqual(3, receiver.call_count)
+        receiver.assert_called_with(
+            signal=token_expired,
+            sender=sweeper.ExpiredTokenSweeper,
+            username=self.user.get_username(),
+            source="sweeper",
+        )
+
+    def test_interval_is_jittered(self):
+        intervals = {self.sweeper.get_interval() for _ in range(20)}
+        self.assertGreater(len(intervals), 1)
+        for interval in intervals:
+            self.assertGreaterEqual(interval, 300 * 0.9)
+            self.assertLessEqual(interval, 300 * 1.1)
+
+    def test_start_and_stop(self):
+        with mock.patch.object(self.sweeper, "get_interval", return_value=0.01):
+            with mock.patch.object(self.sweeper, "run_once") as run_once:
+                self.sweeper.start()
+                self.sweeper.start()
+                self.assertTrue(self.sweeper._thread.daemon)
+                self.sweeper._stopped.wait(0.2)
+                self.sweeper.stop(timeout=1)
+        self.assertIsNone(self.sweeper._thread)
+        self.assertGreater(run_once.call_count, 0)
+
+    def test_started_by_app_config(self):
+        app_config = apps.get_app_config("durin")
+        with mock.patch.object(sweeper.sweeper, "start") as start:
+            app_config.ready()
+            start.assert_not_called()
+            new_settings = settings.durin_settings.defaults.copy()
+            new_settings["EXPIRED_TOKEN_SWEEPER"] = True
+            with override_settings(REST_DURIN=new_settings):
+                app_config.ready()
+            start.assert_called_once_with()
@@ -0,0 +1,446 @@
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache as default_cache
+from django.core.exceptions import ImproperlyConfigured
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.exceptions import Throttled
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory, force_authenticate
+from rest_framework.views import APIView
+
+from durin import auth, throttling, views
+from durin.middleware import ConcurrencyLimitMiddleware, LoadMonitorMiddleware
+from durin.models import AuthToken
+from durin.settings import durin_settings
+
+from . import CustomTestCase
+
+root_url = reverse("api-root")
+throttled_view_url = reverse("throttled-api")
+login_url = reverse("durin_login")
+
+new_settings = durin_settings.defaults.copy()
+new_settings["PRE_AUTH_THROTTLE_CLASS"] = "durin.throttling.PreAuthTokenRateThrottle"
+
+
+class PreAuthTokenRateThrottleTestCase(CustomTestCase):
+    """
+    Rate in example_project is: {"pre_auth_token": "3/m"}
+    """
+
+    def setUp(self):
+        self.override_settings_and_reload(throttling, auth, REST_DURIN=new_settings)
+        super().setUp()
+
+    def test_throttles_token_before_db_lookup(self):
+        self.client.credentials(HTTP_AUTHORIZATION="Token invalid-token")
+        for _ in range(3):
+            resp = self.client.get(root_url)
+            self.assertEqual(resp.status_code, 401)
+        with self.assertNumQueries(0, msg="token isn't looked up"):
+            resp = self.client.get(root_url)
+        self.assertEqual(resp.status_code, 429)
+        self.assertIn("Retry-After", resp)
+
+    def test_throttles_per_token(self):
+        instance = AuthToken.objects.create(self.user, self.authclient)
+        self.client.credentials(HTTP_AUTHORIZATION="Token %s" % instance.token)
+        for _ in range(3):
+            resp = self.client.get(root_url)
+            self.assertEqual(resp.status_code, 200)
+        resp = self.client.get(root_url)
+        self.assertEqual(resp.status_code, 429)
+
+        other = AuthToken.objects.create(self.user2, self.authclient)
+        self.client.credentials(HTTP_AUTHORIZATION="Token %s" % other.token)
+        resp = self.client.get(root_url)
+        self.assertEqual(resp.status_code, 200, msg="other token isn't throttled")
+
+    def test_throttles_anonymous_by_ip(self):
+        for _ in range(3):
+            resp = self.client.get(root_url)
+            self.assertEqual(resp.status_code, 401)
+        resp = self.client.get(root_url)
+        self.assertEqual(resp.status_code, 429)
+        resp = self.client.get(root_url, REMOTE_ADDR="10.0.0.1")
+        self.assertEqual(resp.status_code, 401, msg="other IP isn't throttled")
+
+
+class CountingCache:
+    """
+    Proxy of the default cache which counts the calls made to it.
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def __getattr__(self, name):
+        attr = getattr(default_cache, name)
+        self.calls.append(name)
+        return attr
+
+
+class TestCompositeRateThrottle(throttling.CompositeRateThrottle):
+    THROTTLE_RATES = {"user_per_client": "3/m", "client": "4/m", "uploads": "2/m"}
+
+
+class CompositeThrottledView(APIView):
+    throttle_classes = (TestCompositeRateThrottle,)
+
+    def get(self, request):
+        return Response("composite throttled")
+
+
+class UploadsView(CompositeThrottledView):
+    throttle_scope = "uploads"
+
+
+class CompositeRateThrottleTestCase(CustomTestCase):
+    def setUp(self):
+        super().setUp()
+        self.token = AuthToken.objects.create(self.user, self.authclient)
+        self.token2 = AuthToken.objects.create(self.user2, self.authclient)
+        self.factory = APIRequestFactory()
+
+    def _get(self, view_class, token):
+        request = self.factory.get("/")
+        force_authenticate(request, user=token.user, token=token)
+        return view_class.as_view()(request)
+
+    def test_user_per_client_policy(self):
+        for _ in range(3):
+            self.assertEqual(
+                200, self._get(CompositeThrottledView, self.token).status_code
+            )
+        resp = self._get(CompositeThrottledView, self.token)
+        self.assertEqual(429, resp.status_code)
+        self.assertIn("Retry-After", resp)
+
+    def test_client_policy(self):
+        for _ in range(3):
+            self.assertEqual(
+                200, self._get(CompositeThrottledView, self.token).status_code
+            )
+        resp = self._get(CompositeThrottledView, self.token2)
+        self.assertEqual(200, resp.status_code)
+        resp = self._get(CompositeThrottledView, self.token2)
+        self.assertEqual(429, resp.status_code, msg="client's rate is exceeded")
+
+    def test_view_scope_policy(self):
+        for _ in range(2):
+            self.assertEqual(200, self._get(UploadsView, self.token).status_code)
+        self.assertEqual(429, self._get(UploadsView, self.token).status_code)
+        self.assertEqual(200, self._get(CompositeThrottledView, self.token).status_code)
+
+    def test_single_cache_round_trip(self):
+        counting_cache = CountingCache()
+        with mock.patch.object(TestCompositeRateThrottle, "cache", counting_cache):
+            self._get(UploadsView, self.token)
+        self.assertEqual(["get_many", "set_many"], counting_cache.calls)
+
+
+class ConcurrencyLimitedView(APIView):
+    throttle_classes = (throttling.ClientConcurrencyThrottle,)
+
+    def get(self, request):
+        return Response("concurrency limited")
+
+
+class ClientConcurrencyThrottleTestCase(CustomTestCase):
+    def setUp(self):
+        super().setUp()
+        self.authclient.max_concurrent_requests = 2
+        self.authclient.save()
+        self.token = AuthToken.objects.create(self.user, self.authclient)
+        self.factory = APIRequestFactory()
+
+    def _request(self):
+        request = self.factory.get("/")
+        force_authenticate(request, user=self.token.user, token=self.token)
+        return request
+
+    def _get_in_flight(self):
+        """
+        Returns the request which holds its slot, as it never completes.
+        """
+        request = self._request()
+        request._durin_concurrency_leases = []
+        return request, ConcurrencyLimitedView.as_view()(request)
+
+    def test_excess_requests_fail_fast(self):
+        request1, resp = self._get_in_flight()
+        self.assertEqual(200, resp.status_code)
+        _, resp = self._get_in_flight()
+        self.assertEqual(200, resp.status_code)
+        _, resp = self._get_in_flight()
+        self.assertEqual(429, resp.status_code)
+
+        throttling.ClientConcurrencyThrottle.release(request1._durin_concurrency_leases)
+        _, resp = self._get_in_flight()
+        self.assertEqual(200, resp.status_code, msg="a slot was released")
+
+    def test_cache_calls_dont_depend_on_limit(self):
+        self._get_in_flight()
+        for limit in (2, 100):
+            self.authclient.max_concurrent_requests = limit
+            self.authclient.save()
+            counting_cache = CountingCache()
+            with mock.patch.object(
+                throttling.ClientConcurrencyThrottle, "cache", counting_cache
+            ):
+                request, resp = self._get_in_flight()
+            self.assertEqual(200, resp.status_code)
+            # a new period may have begun in the meantime
+            self.assertIn(
+                counting_cache.calls, (["add", "incr", "get"], ["add", "get"])
+            )
+            throttling.ClientConcurrencyThrottle.release(
+                request._durin_concurrency_leases
+            )
+
+    def test_leaked_slots_expire_while_requests_keep_arriving(self):
+        lease_settings = durin_settings.defaults.copy()
+        lease_settings["CONCURRENCY_LEASE_TIMEOUT"] = 1
+        self.override_settings_and_reload(throttling, REST_DURIN=lease_settings)
+        # the requests in flight are never released, e.g. the worker crashed
+        self._get_in_flight()
+        self._get_in_flight()
+        start = time.monotonic()
+        rejected = 0
+        while time.monotonic() - start < 3:
+            _, resp = self._get_in_flight()
+            if resp.status_code == 200:
+                break
+            rejected += 1
+            time.sleep(0.05)
+        self.assertEqual(200, resp.status_code, msg="leaked slots expired")
+        self.assertGreater(rejected, 0)
+        self.assertLessEqual(time.monotonic() - start, 2.5)
+
+    def test_release_after_expiry(self):
+        request, _ = self._get_in_flight()
+        key = request._durin_concurrency_leases[0]
+        default_cache.delete(key)
+        throttling.ClientConcurrencyThrottle.release(request._durin_concurrency_leases)
+        self.assertIsNone(default_cache.get(key))
+
+    def test_unlimited_client(self):
+        self.authclient.max_concurrent_requests = None
+        self.authclient.save()
+        for _ in range(5):
+            _, resp = self._get_in_flight()
+            self.assertEqual(200, resp.status_code)
+
+    def test_middleware_releases_slots(self):
+        middleware = ConcurrencyLimitMiddleware(ConcurrencyLimitedView.as_view())
+        for _ in range(5):
+            resp = middleware(self._request())
+            self.assertEqual(200, resp.status_code)
+
+    def test_requires_middleware(self):
+        with self.assertRaises(ImproperlyConfigured):
+            ConcurrencyLimitedView.as_view()(self._request())
+
+
+class AdaptiveThrottledView(APIView):
+    throttle_classes = (throttling.AdaptiveUserClientRateThrottle,)
+
+    def get(self, request):
+        return Response("adaptive throttled")
+
+
+class AdaptiveUserClientRateThrottleTestCase(CustomTestCase):
+    """
+    Default rate in example_project is: {"user_per_client": "2/m"}
+    """
+
+    def setUp(self):
+        super().setUp()
+        throttling.LoadMonitor._degradation = (0, 1.0)
+        self.addCleanup(setattr, throttling.LoadMonitor, "_degradation", (0, 1.0))
+        # drop the requests recorded in memory by other tests
+        throttling.LoadMonitor._take_pending()
+        self.authclient.throttle_rate = "8/m"
+        self.authclient.save()
+        self.token = AuthToken.objects.create(self.user, self.authclient)
+        self.factory = APIRequestFactory()
+
+    def _count_allowed(self):
+        allowed = 0
+        for _ in range(10):
+            request = self.factory.get("/")
+            force_authenticate(request, user=self.token.user, token=self.token)
+            if AdaptiveThrottledView.as_view()(request).status_code == 200:
+                allowed += 1
+        return allowed
+
+    def _record(self, num_requests, latency, error=False):
+        for _ in range(num_requests):
+            throttling.LoadMonitor.record(latency, error)
+        throttling.LoadMonitor.flush()
+
+    def test_load_monitor_flushes_in_batches(self):
+        counting_cache = CountingCache()
+        with mock.patch.object(throttling.LoadMonitor, "cache", counting_cache):
+            for _ in range(throttling.LoadMonitor.flush_every - 1):
+                throttling.LoadMonitor.record(0.1, False)
+            self.assertEqual([], counting_cache.calls)
+            self.assertEqual(0, throttling.LoadMonitor.get_stats()[0])
+            throttling.LoadMonitor.record(0.1, True)
+        # the first ``incr`` of each counter misses, so it's ``add``-ed
+        self.assertEqual(
+            ["get_many", "incr", "add", "incr", "add", "incr", "add"],
+            counting_cache.calls,
+        )
+        num_requests, latency, error_rate = throttling.LoadMonitor.get_stats()
+        self.assertEqual(throttling.LoadMonitor.flush_every, num_requests)
+        self.assertAlmostEqual(0.1, latency, places=2)
+        self.assertEqual(1 / throttling.LoadMonitor.flush_every, error_rate)
+
+    def test_load_monitor_flushes_after_interval(self):
+        throttling.LoadMonitor.record(0.1, False)
+        self.assertEqual(0, throttling.LoadMonitor.get_stats()[0])
+        with mock.patch.object(throttling.LoadMonitor, "flush_interval", 0):
+            throttling.LoadMonitor.record(0.1, False)
+        self.assertEqual(2, throttling.LoadMonitor.get_stats()[0])
+
+    def test_load_monitor_stats(self):
+        self._record(3, 0.1)
+        self._record(1, 0.5, error=True)
+        num_requests, latency, error_rate = throttling.LoadMonitor.get_stats()
+        self.assertEqual(4, num_requests)
+        self.assertAlmostEqual(0.2, latency, places=2)
+        self.assertEqual(0.25, error_rate)
+
+    def test_healthy_service_keeps_rate(self):
+        self._record(20, 0.1)
+        self.assertEqual(1.0, throttling.LoadMonitor.get_degradation())
+        self.assertEqual(8, self._count_allowed())
+
+    def test_degraded_service_scales_rate_by_priority(self):
+        # average latency is 4 times the target of 0.5 seconds
+        self._record(20, 2.0)
+        self.assertEqual(4.0, throttling.LoadMonitor.get_degradation())
+        self.assertEqual(2, self._count_allowed(), msg="8 / 4")
+
+        default_cache.clear()
+        self.authclient.priority = 1
+        self.authclient.save()
+        self.token.refresh_from_db()
+        self.assertEqual(4, self._count_allowed(), msg="8 / sqrt(4)")
+
+    def test_errors_degrade_service(self):
+        # error rate is 2 times the target of 5%
+        self._record(18, 0.1)
+        self._record(2, 0.1, error=True)
+        self.assertAlmostEqual(2.0, throttling.LoadMonitor.get_degradation())
+
+    def test_middleware_records_requests(self):
+        middleware = LoadMonitorMiddleware(AdaptiveThrottledView.as_view())
+        request = self.factory.get("/")
+        force_authenticate(request, user=self.token.user, token=self.token)
+        self.assertEqual(200, middleware(request).status_code)
+        throttling.LoadMonitor.flush()
+        self.assertEqual(1, throttling.LoadMonitor.get_stats()[0])
+
+
+@override_settings(
+    MIDDLEWARE=settings.MIDDLEWARE + ["durin.middleware.RateLimitHeadersMiddleware"]
+)
+class RateLimitHeadersMiddlewareTestCase(CustomTestCase):
+    """
+    Default rate in example_project is: {"user_per_client": "2/m"}
+    """
+
+    def setUp(self):
+        super().setUp()
+        token = AuthToken.objects.create(self.user, self.authclient)
+        self.client.credentials(HTTP_AUTHORIZATION="Token %s" % token.token)
+
+    def test_headers_from_throttle_state(self):
+        resp = self.client.get(throttled_view_url)
+        self.assertEqual(200, resp.status_code)
+        self.assertEqual("2", resp["RateLimit-Limit"])
+        self.assertEqual("1", resp["RateLimit-Remaining"])
+        self.assertEqual("60", resp["RateLimit-Reset"])
+
+        resp = self.client.get(throttled_view_url)
+        self.assertEqual("0", resp["RateLimit-Remaining"])
+
+        resp = self.client.get(throttled_view_url)
+        self.assertEqual(429, resp.status_code)
+        self.assertEqual("0", resp["RateLimit-Remaining"])
+        self.assertLessEqual(int(resp["RateLimit-Reset"]), 60)
+
+    def test_no_headers_without_throttle(self):
+        resp = self.client.get(root_url)
+        self.assertEqual(200, resp.status_code)
+        self.assertNotIn("RateLimit-Limit", resp)
+
+
+login_settings = durin_settings.defaults.copy()
+login_settings["LOGIN_THROTTLE_CLASS"] = "durin.throttling.LoginThrottle"
+login_settings["LOGIN_THROTTLE_FAILURES"] = 2
+
+
+class LoginThrottleTestCase(CustomTestCase):
+    def setUp(self):
+        self.override_settings_and_reload(throttling, views, REST_DURIN=login_settings)
+        super().setUp()
+        self.wrong_creds = dict(self.creds, password="wrong")
+
+    def _login(self, creds, **extra):
+        return self.client.post(login_url, creds, format="json", **extra)
+
+    def test_lockout_before_credential_validation(self):
+        for _ in range(2):
+            self.assertEqual(400, self._login(self.wrong_creds).status_code)
+        with mock.patch(
+            "durin.views.AuthTokenSerializer", side_effect=AssertionError
+        ), self.assertNumQueries(0, msg="credentials aren't validated"):
+            resp = self._login(self.creds)
+        self.assertEqual(429, resp.status_code)
+        self.assertEqual("60", resp["Retry-After"])
+
+        # other usernames from other IPs aren't locked out
+        resp = self._login(self.creds2, REMOTE_ADDR="10.0.0.1")
+        self.assertEqual(200, resp.status_code)
+
+    def test_lockout_is_exponential(self):
+        throttle = throttling.LoginThrottle()
+        request = Request(APIRequestFactory().post(login_url))
+        request._full_data = self.wrong_creds
+        throttle.record_failure(request)
+        throttle.check(request)
+        for lockout in (60, 120, 240):
+            throttle.record_failure(request)
+            with self.assertRaises(Throttled) as cm:
+                throttle.check(request)
+            self.assertAlmostEqual(lockout, cm.exception.wait, delta=1)
+
+    def test_lockout_per_ip(self):
+        for i in range(2):
+            creds = dict(self.wrong_creds, username="user{0}".format(i))
+            self.assertEqual(400, self._login(creds).status_code)
+        resp = self._login(self.creds)
+        self.assertEqual(429, resp.status_code, msg="IP is locked out")
+
+    def test_lockout_with_rotating_clients(self):
+        for i in range(2):
+            creds = dict(self.wrong_creds, client="randomclient{0}".format(i))
+            self.assertEqual(400, self._login(creds).status_code)
+        creds = dict(self.wrong_creds, client="randomclient2")
+        self.assertEqual(429, self._login(creds).status_code)
+        # from another IP, the username is still locked out
+        resp = self._login(self.creds, REMOTE_ADDR="10.0.0.1")
+        self.assertEqual(429, resp.status_code)
+
+    def test_success_resets_failures(self):
+        self.assertEqual(400, self._login(self.wrong_creds).status_code)
+        self.assertEqual(200, self._login(self.creds).status_code)
+        resp = self._login(dict(self.wrong_creds), REMOTE_ADDR="10.0.0.1")
+        self.assertEqual(400, resp.status_code, msg="not locked out yet")
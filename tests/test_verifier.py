@@ -0,0 +1,125 @@
+from asgiref.sync import async_to_sync
+from django.core import signals
+from django.db import close_old_connections
+from rest_framework import exceptions
+
+from durin import auth, verifier
+from durin.models import AuthToken
+from durin.settings import durin_settings
+
+from . import CustomTestCase
+
+
+class TokenVerifierTestCase(CustomTestCase):
+    def setUp(self):
+        super().setUp()
+        # like django's test client, keep the connection of the test transaction
+        signals.request_started.disconnect(close_old_connections)
+        signals.request_finished.disconnect(close_old_connections)
+        self.addCleanup(signals.request_started.connect, close_old_connections)
+        self.addCleanup(signals.request_finished.connect, close_old_connections)
+        self.token_instance = AuthToken.objects.create(self.user, self.authclient)
+        self.meta = {"HTTP_AUTHORIZATION": "Token %s" % self.token_instance.token}
+
+    def _override_settings(self, **kwargs):
+        new_settings = durin_settings.defaults.copy()
+        new_settings.update(kwargs)
+        self.override_settings_and_reload(auth, verifier, REST_DURIN=new_settings)
+
+    def _call_wsgi_app(self, environ):
+        response = {}
+
+        def start_response(status, headers):
+            response["status"] = status
+            response["headers"] = dict(headers)
+
+        body = verifier.TokenVerifierWSGIApp()(environ, start_response)
+        self.assertEqual([b""], body)
+        return response["status"], response["headers"]
+
+    def test_verify_token(self):
+        with self.assertNumQueries(1):
+            user, auth_token = verifier.verify_token(self.token_instance.token)
+        self.assertEqual(self.user, user)
+        self.assertEqual(self.token_instance.pk, auth_token.pk)
+
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            verifier.verify_token("invalid")
+
+    def test_verify_expired_token(self):
+        self.token_instance.expiry = self.token_instance.created
+        self.token_instance.save()
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            verifier.verify_token(self.token_instance.token)
+        self.assertFalse(AuthToken.objects.filter(pk=self.token_instance.pk).exists())
+
+    def test_verify_token_of_inactive_user(self):
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            verifier.verify_token(self.token_instance.token.encode())
+
+    def test_verify_token_from_cache(self):
+        self._override_settings(
+            VERIFIER_AUTHENTICATION_CLASS="durin.auth.CachedTokenAuthentication"
+        )
+        verifier.verify_token(self.token_instance.token)
+        with self.assertNumQueries(0):
+            user, auth_token = verifier.verify_token(self.token_instance.token)
+        self.assertEqual(self.user.pk, user.pk)
+
+    def test_wsgi_app(self):
+        status, headers = self._call_wsgi_app(self.meta)
+        self.assertEqual("200 OK", status)
+        self.assertEqual(str(self.user.pk), headers["X-Durin-User"])
+        self.assertEqual(str(self.authclient.pk), headers["X-Durin-Client"])
+        self.assertEqual("0", headers["Content-Length"])
+
+    def test_wsgi_app_401(self):
+        for environ in ({}, {"HTTP_AUTHORIZATION": "Token invalid"}):
+            status, headers = self._call_wsgi_app(environ)
+            self.assertEqual("401 Unauthorized", status)
+            self.assertEqual("Token", headers["WWW-Authenticate"])
+            self.assertNotIn("X-Durin-User", headers)
+
+    def test_wsgi_app_429(self):
+        self._override_settings(
+            PRE_AUTH_THROTTLE_CLASS="durin.throttling.PreAuthTokenRateThrottle"
+        )
+        environ = dict(self.meta, REMOTE_ADDR="127.0.0.1")
+        # rate in example_project is: {"pre_auth_token": "3/m"}
+        for _ in range(3):
+            self.assertEqual("200 OK", self._call_wsgi_app(environ)[0])
+        status, headers = self._call_wsgi_app(environ)
+        self.assertEqual("429 Too Many Requests", status)
+        self.assertIn("Retry-After", headers)
+
+    def test_asgi_app(self):
+        scope = {
+            "type": "http",
+            "method": "GET",
+            "path": "/verify",
+            "client": ("127.0.0.1", 1234),
+            "headers": [
+                (b"authorization", self.meta["HTTP_AUTHORIZATION"].encode()),
+            ],
+        }
+        messages = []
+
+        async def receive():
+            return {"type": "http.request"}
+
+        async def send(message):
+            messages.append(message)
+
+        async_to_sync(verifier.TokenVerifierASGIApp())(scope, receive, send)
+        self.assertEqual(200, messages[0]["status"])
+        self.assertIn(
+            (b"x-durin-user", str(self.user.pk).encode()), messages[0]["headers"]
+        )
+        self.assertEqual({"type": "http.response.body", "body": b""}, messages[1])
+
+        messages.clear()
+        scope["headers"] = []
+        async_to_sync(verifier.TokenVerifierASGIApp())(scope, receive, send)
+        self.assertEqual(401, messages[0]["status"])
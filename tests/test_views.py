@@ -2,12 +2,15 @@ import time
 from datetime import timedelta
 from importlib import reload
 
+from django.db import connection
 from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.serializers import DateTimeField
 
 from durin import serializers, views
+from durin.cache import cache
 from durin.models import AuthToken, Client
 from durin.serializers import UserSerializer
 from durin.settings import durin_settings
@@ -21,6 +24,7 @@ logoutall_url = reverse("durin_logoutall")
 refresh_url = reverse("durin_refresh")
 sessions_list_uri = reverse("durin_tokensessions-list")
 apiaccess_uri = reverse("durin_apiaccess")
+introspect_uri = reverse("durin_introspect")
 
 root_url = reverse("api-root")
 cached_auth_url = reverse("cached-auth-api")
@@ -515,6 +519,54 @@ class SessionAndAPIAccessViewsTestCase(CustomTestCase):
         with self.assertRaises(AuthToken.DoesNotExist, msg="token was deleted"):
             AuthToken.objects.get(token=apiaccesstoken.token)
 
+    def test_apiaccess_get_with_cached_client(self):
+        self._create_authtoken(client_name=new_settings["API_ACCESS_CLIENT_NAME"])
+        self.assertEqual(200, self.client.get(apiaccess_uri).status_code)
+        # the client's primary key is cached, so the token isn't joined with it
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(apiaccess_uri)
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(
+            new_settings["API_ACCESS_CLIENT_NAME"], response.json()["client"]
+        )
+        self.assertNotIn("JOIN", context.captured_queries[-1]["sql"])
+
+        # saving or deleting the client drops the cached primary key
+        self.apiaccess_client.delete()
+        self.assertEqual(404, self.client.get(apiaccess_uri).status_code)
+        Client.objects.create(name=new_settings["API_ACCESS_CLIENT_NAME"])
+        self.assertEqual(201, self.client.post(apiaccess_uri).status_code)
+        self.assertEqual(200, self.client.get(apiaccess_uri).status_code)
+
+    def test_apiaccess_get_after_client_renamed(self):
+        self._create_authtoken(client_name=new_settings["API_ACCESS_CLIENT_NAME"])
+        self.assertEqual(200, self.client.get(apiaccess_uri).status_code)
+        # the primary key cached under the previous name is dropped too
+        client = Client.objects.get(name=new_settings["API_ACCESS_CLIENT_NAME"])
+        client.name = "renamed"
+        client.save()
+        self.assertEqual(404, self.client.get(apiaccess_uri).status_code)
+        Client.objects.create(name=new_settings["API_ACCESS_CLIENT_NAME"])
+        self.assertEqual(201, self.client.post(apiaccess_uri).status_code)
+        response = self.client.get(apiaccess_uri)
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(
+            new_settings["API_ACCESS_CLIENT_NAME"], response.json()["client"]
+        )
+
+    def test_apiaccess_get_after_client_bulk_deleted(self):
+        self._create_authtoken(client_name=new_settings["API_ACCESS_CLIENT_NAME"])
+        self.assertEqual(200, self.client.get(apiaccess_uri).status_code)
+        # bypasses ``Client.delete()``, so the primary key stays cached
+        Client.objects.filter(name=new_settings["API_ACCESS_CLIENT_NAME"]).delete()
+        client = Client.objects.create(name=new_settings["API_ACCESS_CLIENT_NAME"])
+        AuthToken.objects.create(self.user, client)
+        response = self.client.get(apiaccess_uri)
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(
+            client.pk, cache.get(Client.get_pk_cache_key(client.name)), msg="re-cached"
+        )
+
     def test_apiaccess_delete_404(self):
         # request to delete apiaccess token when it doesn't exist
         response = self.client.delete(apiaccess_uri)
@@ -541,8 +593,8 @@ class ExampleProjectViewsTestCase(CustomTestCase):
         resp2 = self.client.get(cached_auth_url)
         self.assertEqual(
             resp2.status_code,
-            200,
-            "token state was cached even though token has expired.",
+            401,
+            "cached token state isn't served past the token's expiry.",
         )
 
     def test_throttled_api_default_rate_429(self):
@@ -596,3 +648,82 @@ class ExampleProjectViewsTestCase(CustomTestCase):
             status.HTTP_401_UNAUTHORIZED,
             msg="No token was set",
         )
+
+
+class TokenIntrospectionViewTestCase(CustomTestCase):
+    def setUp(self):
+        super().setUp()
+        # the gateway authenticates as an admin user
+        self.user.is_staff = True
+        self.user.save()
+        gateway_token = self._create_authtoken(self.user, "gateway")
+        self.client.credentials(HTTP_AUTHORIZATION=("Token %s" % gateway_token.token))
+        self.token = AuthToken.objects.create(self.user2, self.authclient)
+        self.expired_token = self._create_authtoken(self.user2, "expired")
+        self.expired_token.expiry = self.expired_token.created
+        self.expired_token.save()
+
+    def test_introspect_tokens(self):
+        tokens = [self.token.token, "unknown", self.expired_token.token]
+        format_expiry = views.TokenIntrospectionView.format_expiry_datetime
+        # auth, tokens joined with their users and clients
+        with self.assertNumQueries(2):
+            resp = self.client.post(introspect_uri, {"tokens": tokens}, format="json")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(
+            [
+                {
+                    "token": self.token.token,
+                    "active": True,
+                    "user": self.user2.pk,
+                    "client": self.authclient.name,
+                    "expiry": format_expiry(self.token.expiry),
+                },
+                {"token": "unknown", "active": False},
+                {
+                    "token": self.expired_token.token,
+                    "active": False,
+                    "user": self.user2.pk,
+                    "client": "expired",
+                    "expiry": format_expiry(self.expired_token.expiry),
+                },
+            ],
+            resp.data["tokens"],
+        )
+        self.assertTrue(
+            AuthToken.objects.filter(pk=self.expired_token.pk).exists(),
+            msg="expired tokens aren't deleted",
+        )
+
+    def test_introspect_token_of_inactive_user(self):
+        self.user2.is_active = False
+        self.user2.save()
+        resp = self.client.post(
+            introspect_uri, {"tokens": [self.token.token]}, format="json"
+        )
+        self.assertEqual(resp.status_code, 200)
+        self.assertFalse(resp.data["tokens"][0]["active"])
+
+    def test_introspect_too_many_tokens_400(self):
+        max_tokens = durin_settings.INTROSPECTION_MAX_TOKENS
+        resp = self.client.post(
+            introspect_uri, {"tokens": ["a"] * (max_tokens + 1)}, format="json"
+        )
+        self.assertEqual(resp.status_code, 400)
+        resp = self.client.post(introspect_uri, {"tokens": []}, format="json")
+        self.assertEqual(resp.status_code, 400)
+
+    def test_introspect_by_non_admin_403(self):
+        token = self._create_authtoken(self.user2, "gateway")
+        self.client.credentials(HTTP_AUTHORIZATION=("Token %s" % token.token))
+        resp = self.client.post(
+            introspect_uri, {"tokens": [self.token.token]}, format="json"
+        )
+        self.assertEqual(resp.status_code, 403)
+
+    def test_introspect_not_routed_by_default(self):
+        from durin.urls import urlpatterns
+
+        names = {getattr(pattern, "name", None) for pattern in urlpatterns}
+        self.assertIn("durin_apiaccess", names)
+        self.assertNotIn("durin_introspect", names)